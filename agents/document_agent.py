@@ -1,6 +1,17 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from models.state import AgentState
-from utils.llm_helper import llm_helper
+from models.events import LogEvent
+from utils.event_log import log_event
+from utils.llm_helper import llm_helper, StructuredOutputError
+from utils.prompts import render_prompt
+from utils.tracing import traced
+from utils.progress import emit_progress
+from models.events import EventType
+from utils.document_build import DocumentBuild
+from utils.hashing import stable_hash
+from utils.blob_store import intern_text, resolve_text, resolve_refs
+from utils.extractive import compress_text, query_keywords, EXECUTIVE_SUMMARY_CONTEXT_TOKENS
+from config.settings import settings
 import json
 from datetime import datetime
 import os
@@ -14,18 +25,16 @@ def document_agent(state: AgentState) -> AgentState:
     summary = state.get("summary", "")
     llm_responses = state.get("llm_responses", {})
     
-    # AI-powered document structuring
-    system_prompt = """You are an expert document architect and technical writer. 
-    Create a comprehensive document structure and organization plan for the multi-agent analysis results.
-    
-    Your task is to:
-    1. Analyze all the results and create a logical document hierarchy
-    2. Suggest appropriate document types and formats
-    3. Recommend content organization strategies
-    4. Provide executive summary recommendations
-    5. Suggest visualization and presentation formats
+    # Inputs exclude anything a previous document build wrote; interned texts are resolved
+    results = resolve_refs(state, {key: value for key, value in results.items() if key != "documents"})
+    llm_responses = resolve_refs(state, {key: value for key, value in llm_responses.items() if key != "documents"})
+    summary = resolve_text(state, summary)
     
-    Focus on creating professional, well-structured documentation that would be suitable for business or research purposes."""
+    # Incremental builds reuse outputs whose inputs are unchanged
+    output_dir = None
+    if settings.INCREMENTAL_DOCUMENTS:
+        output_dir = os.path.join(settings.DOCUMENT_BUILD_DIR, stable_hash(query)[:12])
+    build = DocumentBuild(output_dir, incremental=settings.INCREMENTAL_DOCUMENTS)
     
     # Prepare context for AI document planning
     document_context = {
@@ -36,74 +45,108 @@ def document_agent(state: AgentState) -> AgentState:
         "analysis_depth": "comprehensive" if len(llm_responses) > 3 else "basic"
     }
     
-    user_prompt = f"""Document Organization Request:
-    
-    Analysis Context: {document_context}
-    
-    Available Content Sections:
-    {json.dumps(list(results.keys()), indent=2)}
-    
-    Please provide:
-    1. Recommended document structure and hierarchy
-    2. Content organization strategy
-    3. Executive summary approach
-    4. Key sections to highlight
-    5. Professional formatting recommendations"""
+    # AI-powered document structuring
+    system_prompt, user_prompt = render_prompt(
+        "document_planning",
+        document_context=document_context,
+        sections=json.dumps(list(results.keys()), indent=2)
+    )
     
-    document_planning_response = llm_helper.generate_response(system_prompt, user_prompt)
+    document_planning_response = build.llm_output(
+        "document_planning",
+        document_context,
+        lambda: llm_helper.generate_budgeted_response(state, "documents", system_prompt, user_prompt)
+    )
     
     # Create structured documents using AI guidance
     documents = []
     
     # 1. Executive Summary Document
-    executive_summary = create_executive_summary(query, results, summary, llm_responses)
+    executive_summary = build.document(
+        "executive_summary",
+        [query, list(results.keys()), summary],
+        lambda: create_executive_summary(query, results, summary, llm_responses, state)
+    )
     documents.append(executive_summary)
     
     # 2. Comprehensive Analysis Report
-    main_report = create_main_report(query, results, summary, llm_responses, document_planning_response)
+    main_report = build.document(
+        "main_report",
+        [query, summary, llm_responses, document_planning_response],
+        lambda: create_main_report(query, results, summary, llm_responses, document_planning_response)
+    )
     documents.append(main_report)
     
     # 3. Individual Specialist Reports
     for specialist, data in results.items():
         if specialist not in ["summary", "documents", "repair"]:
-            specialist_doc = create_specialist_report(specialist, data, llm_responses.get(specialist, ""))
+            specialist_doc = build.document(
+                f"{specialist}_specialist_report",
+                [specialist, without_timestamp(data), llm_responses.get(specialist, "")],
+                lambda: create_specialist_report(specialist, data, llm_responses.get(specialist, ""))
+            )
             documents.append(specialist_doc)
     
     # 4. Technical Data Export
     technical_export = create_technical_export(state)
     documents.append(technical_export)
+    build.changed.add(technical_export["type"])
     
     # 5. Quality Assurance Report
     if "repair" in results:
-        qa_report = create_qa_report(results["repair"])
+        qa_report = build.document(
+            "quality_assurance_report",
+            without_timestamp(results["repair"]),
+            lambda: create_qa_report(results["repair"])
+        )
         documents.append(qa_report)
     
     # 6. Methodology and Process Documentation
-    methodology_doc = create_methodology_document(state)
+    methodology_doc = build.document(
+        "methodology_document",
+        [state.get("iteration_count", 0), len(state.get("results", {})), state.get("repair_status", {}).get("quality_score")],
+        lambda: create_methodology_document(state)
+    )
     documents.append(methodology_doc)
     
     # AI-powered document metadata generation
-    metadata_prompt = f"""Generate comprehensive metadata for this document collection:
-    Query: {query}
-    Total Documents: {len(documents)}
-    Document Types: {[doc['type'] for doc in documents]}
-    
-    Provide JSON metadata including tags, categories, and search keywords."""
-    
-    metadata_response = llm_helper.generate_response(
-        "You are a metadata specialist. Generate comprehensive document metadata in JSON format.",
-        metadata_prompt
+    metadata_system_prompt, metadata_prompt = render_prompt(
+        "document_metadata",
+        query=query,
+        total_documents=len(documents),
+        document_types=[doc['type'] for doc in documents]
     )
     
+    try:
+        metadata_response = build.llm_output(
+            "document_metadata",
+            metadata_prompt,
+            lambda: json.dumps(llm_helper.generate_structured(
+                "document_metadata",
+                metadata_system_prompt,
+                metadata_prompt,
+                state,
+                "documents"
+            ))
+        )
+    except StructuredOutputError as e:
+        print(f"⚠️ Document Agent: Invalid metadata ({e}) - saving documents without it")
+        metadata_response = "{}"
+    
     # Update state with document results
+    document_planning_response = intern_text(state, document_planning_response)
     document_summary = {
         "ai_document_planning": document_planning_response,
-        "ai_metadata": metadata_response,
+        "ai_metadata": json.loads(metadata_response),
         "total_documents": len(documents),
         "document_types": [doc["type"] for doc in documents],
         "processing_status": "completed",
         "organization_strategy": "ai_optimized_hierarchy",
         "export_formats": ["json", "markdown", "structured_text"],
+        "incremental_build": build.incremental,
+        "documents_regenerated": sorted(build.changed),
+        "documents_reused": sorted(build.reused),
+        "llm_calls_reused": build.llm_calls_reused,
         "timestamp": datetime.now().isoformat()
     }
     
@@ -111,39 +154,41 @@ def document_agent(state: AgentState) -> AgentState:
     state["results"]["documents"] = document_summary
     state["llm_responses"] = state.get("llm_responses", {})
     state["llm_responses"]["documents"] = document_planning_response
-    state["messages"].append(f"Document Agent: {len(documents)} AI-structured documents created")
+    log_event(state, LogEvent.AGENT_COMPLETED, {"agent": "documents", "documents": len(documents)})
     state["workflow_complete"] = True
     state["next_agent"] = None
     
     # Save documents to files
-    save_documents_to_files(documents, query)
+    if build.incremental:
+        save_documents_to_files(documents, query, output_dir=output_dir, changed=build.changed)
+        build.save(keep={doc["type"] for doc in documents})
+        print(f"♻️ Document Agent: {len(build.reused)} documents and {build.llm_calls_reused} LLM outputs reused from previous build")
+    else:
+        save_documents_to_files(documents, query, run_id=state.get("run_id"))
     
     print(f"✅ Document Agent: {len(documents)} professional documents generated and saved")
     return state
 
-def create_executive_summary(query: str, results: Dict[str, Any], summary: str, llm_responses: Dict[str, str]) -> Dict[str, Any]:
+def without_timestamp(data: Any) -> Any:
+    """Result data without its volatile timestamp, for input hashing"""
+    if isinstance(data, dict):
+        return {key: value for key, value in data.items() if key != "timestamp"}
+    return data
+
+def create_executive_summary(query: str, results: Dict[str, Any], summary: str, llm_responses: Dict[str, str], state: Optional[AgentState] = None) -> Dict[str, Any]:
     """Create executive summary document"""
     
-    # AI-generated executive summary
-    system_prompt = """You are an executive summary specialist. Create a concise, high-level executive summary 
-    that captures the key insights, findings, and recommendations from the multi-agent analysis.
-    
-    Format it for C-level executives and decision-makers. Focus on actionable insights and strategic implications."""
+    # Key sentences of the summary rather than its first 500 characters
+    keywords = query_keywords(state) if state is not None else query.split()
+    summary_context = compress_text(summary, EXECUTIVE_SUMMARY_CONTEXT_TOKENS, keywords)
     
-    user_prompt = f"""Create an executive summary for:
-    Query: {query}
-    
-    Key Results Available: {list(results.keys())}
-    Comprehensive Summary: {summary[:500]}...
-    
-    Include:
-    1. Key findings (3-5 bullet points)
-    2. Strategic implications
-    3. Recommended actions
-    4. Risk considerations
-    5. Next steps"""
+    # AI-generated executive summary
+    system_prompt, user_prompt = render_prompt("executive_summary", query=query, results=list(results.keys()), summary=summary_context)
     
-    executive_content = llm_helper.generate_response(system_prompt, user_prompt)
+    if state is not None:
+        executive_content = llm_helper.generate_budgeted_response(state, "documents", system_prompt, user_prompt)
+    else:
+        executive_content = llm_helper.generate_response(system_prompt, user_prompt)
     
     return {
         "type": "executive_summary",
@@ -264,6 +309,8 @@ def create_technical_export(state: AgentState) -> Dict[str, Any]:
         if key not in ["llm_responses"]:  # Exclude large text responses
             export_state[key] = value
     
+    # Interned texts stay references; the results file's top-level blob table resolves them
+    
     return {
         "type": "technical_export",
         "title": "Technical Data Export",
@@ -377,18 +424,28 @@ def create_methodology_document(state: AgentState) -> Dict[str, Any]:
         }
     }
 
-def save_documents_to_files(documents: List[Dict[str, Any]], query: str):
-    """Save generated documents to files"""
+@traced("save_documents_to_files")
+def save_documents_to_files(documents: List[Dict[str, Any]], query: str, output_dir: Optional[str] = None,
+                            changed: Optional[set] = None, run_id: Optional[str] = None):
+    """Save generated documents to files
+    
+    With an explicit output_dir, file names are stable and only documents
+    listed in changed (all when None) are rewritten. Otherwise each run
+    gets a directory of its own, named by timestamp and run_id.
+    """
     
     # Create output directory
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    output_dir = f"analysis_output_{timestamp}"
+    stable_names = output_dir is not None
+    if not stable_names:
+        # Runs finishing in the same second must not share a directory
+        output_dir = f"analysis_output_{timestamp}_{run_id}" if run_id else f"analysis_output_{timestamp}"
     os.makedirs(output_dir, exist_ok=True)
     
     # Save each document
     for i, doc in enumerate(documents):
         doc_type = doc.get("type", f"document_{i}")
-        filename = f"{doc_type}_{timestamp}"
+        filename = doc_type if stable_names else f"{doc_type}_{timestamp}"
         
         # Determine file extension
         if doc.get("format") == "json":
@@ -400,10 +457,14 @@ def save_documents_to_files(documents: List[Dict[str, Any]], query: str):
         
         filepath = os.path.join(output_dir, filename)
         
+        if changed is not None and doc_type not in changed and os.path.exists(filepath):
+            continue
+        
         try:
             with open(filepath, 'w', encoding='utf-8') as f:
                 f.write(doc["content"])
             print(f"📄 Saved: {filepath}")
+            emit_progress(EventType.DOCUMENT_SAVED, path=filepath, document_type=doc_type)
         except Exception as e:
             print(f"❌ Error saving {filepath}: {e}")
     
@@ -418,3 +479,4 @@ def save_documents_to_files(documents: List[Dict[str, Any]], query: str):
         f.write(index_content)
     
     print(f"📁 All documents saved to: {output_dir}/")
+    emit_progress(EventType.DOCUMENT_SAVED, path=index_path, document_type="index")
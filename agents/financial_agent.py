@@ -1,33 +1,43 @@
 from typing import Dict, Any
 from models.state import AgentState
+from models.events import LogEvent
+from utils.event_log import log_event
 from utils.llm_helper import llm_helper
+from utils.prompts import render_prompt
+from utils.handoffs import received_handoff
+from utils.similarity_index import use_prior_output
+from utils.blob_store import intern_text, resolve_text
+from utils.extractive import compress_text, query_keywords, SPECIALIST_CONTEXT_TOKENS
 
 def financial_agent(state: AgentState) -> AgentState:
     """AI-powered financial analyst"""
     print("💰 Financial Agent: AI financial analysis in progress...")
+    handoff = received_handoff(state, "team4")
+    if handoff:
+        print(f"💰 Financial Agent: Handed off directly by research (domain: {handoff['domain']})")
     
     query = state.get("query", "")
     research_data = state.get("research_data", {})
     
-    # AI-powered financial analysis
-    system_prompt = """You are a financial AI analyst with expertise in markets, investments, economic trends, and financial planning.
-    Provide comprehensive financial analysis based on the query and research context.
-    
-    Include risk assessments, market insights, and actionable recommendations."""
+    # Only the research sentences most relevant to the query go into the prompt
+    research_context = compress_text(
+        resolve_text(state, research_data.get('ai_research', '')),
+        SPECIALIST_CONTEXT_TOKENS,
+        query_keywords(state)
+    )
     
-    user_prompt = f"""Financial Analysis Request:
-    Query: {query}
-    Research Context: {research_data.get('ai_research', '')}
+    # AI-powered financial analysis
+    system_prompt, user_prompt = render_prompt("financial", query=query, research_context=research_context)
     
-    Please provide:
-    1. Financial market analysis
-    2. Economic trends and indicators
-    3. Risk assessment and factors
-    4. Investment implications
-    5. Market opportunities and threats
-    6. Strategic recommendations"""
+    # Reuse, or build on, the output of a similar prior run
+    reuse_mode, prior_text, user_prompt = use_prior_output(state, "financial", user_prompt)
     
-    financial_response = llm_helper.generate_response(system_prompt, user_prompt)
+    if reuse_mode == "reuse":
+        print("♻️ Financial Agent: Reusing financial analysis from a similar prior run")
+        financial_response = prior_text
+    else:
+        financial_response = llm_helper.generate_budgeted_response(state, "financial", system_prompt, user_prompt)
+        financial_response = intern_text(state, financial_response)
     
     financial_data = {
         "analysis_type": "ai_powered_financial_research",
@@ -47,7 +57,7 @@ def financial_agent(state: AgentState) -> AgentState:
     state["results"]["financial"] = financial_data
     state["llm_responses"] = state.get("llm_responses", {})
     state["llm_responses"]["financial"] = financial_response
-    state["messages"].append("Financial Agent: AI financial analysis completed")
+    log_event(state, LogEvent.AGENT_COMPLETED, {"agent": "financial"})
     state["next_agent"] = "supervisor"
     
     print("✅ Financial Agent: AI financial analysis completed")
@@ -1,34 +1,43 @@
 from typing import Dict, Any
 from models.state import AgentState
+from models.events import LogEvent
+from utils.event_log import log_event
 from utils.llm_helper import llm_helper
+from utils.prompts import render_prompt
+from utils.handoffs import received_handoff
+from utils.similarity_index import use_prior_output
+from utils.blob_store import intern_text, resolve_text
+from utils.extractive import compress_text, query_keywords, SPECIALIST_CONTEXT_TOKENS
 
 def medical_agent(state: AgentState) -> AgentState:
     """AI-powered medical specialist"""
     print("🏥 Medical Agent: AI medical analysis in progress...")
+    handoff = received_handoff(state, "team3")
+    if handoff:
+        print(f"🏥 Medical Agent: Handed off directly by research (domain: {handoff['domain']})")
     
     query = state.get("query", "")
     research_data = state.get("research_data", {})
     
-    # AI-powered medical analysis
-    system_prompt = """You are a medical AI specialist with expertise in healthcare, pharmaceuticals, and medical research.
-    Analyze the given query and research context to provide expert medical insights.
-    
-    Important: Always include appropriate disclaimers about consulting healthcare professionals.
-    Focus on factual, evidence-based information."""
+    # Only the research sentences most relevant to the query go into the prompt
+    research_context = compress_text(
+        resolve_text(state, research_data.get('ai_research', '')),
+        SPECIALIST_CONTEXT_TOKENS,
+        query_keywords(state)
+    )
     
-    user_prompt = f"""Medical Analysis Request:
-    Query: {query}
-    Research Context: {research_data.get('ai_research', '')}
+    # AI-powered medical analysis
+    system_prompt, user_prompt = render_prompt("medical", query=query, research_context=research_context)
     
-    Please provide:
-    1. Medical/pharmaceutical analysis
-    2. Key medical concepts and terminology
-    3. Clinical relevance and implications
-    4. Safety considerations
-    5. Regulatory and compliance aspects
-    6. Recommendations for further medical consultation"""
+    # Reuse, or build on, the output of a similar prior run
+    reuse_mode, prior_text, user_prompt = use_prior_output(state, "medical", user_prompt)
     
-    medical_response = llm_helper.generate_response(system_prompt, user_prompt)
+    if reuse_mode == "reuse":
+        print("♻️ Medical Agent: Reusing medical analysis from a similar prior run")
+        medical_response = prior_text
+    else:
+        medical_response = llm_helper.generate_budgeted_response(state, "medical", system_prompt, user_prompt)
+        medical_response = intern_text(state, medical_response)
     
     medical_findings = {
         "domain": "medical/pharmaceutical",
@@ -53,7 +62,7 @@ def medical_agent(state: AgentState) -> AgentState:
     state["results"]["medical"] = medical_findings
     state["llm_responses"] = state.get("llm_responses", {})
     state["llm_responses"]["medical"] = medical_response
-    state["messages"].append("Medical Agent: AI medical analysis completed")
+    log_event(state, LogEvent.AGENT_COMPLETED, {"agent": "medical"})
     state["next_agent"] = "supervisor"
     
     print("✅ Medical Agent: AI medical analysis completed")
@@ -0,0 +1,175 @@
+from typing import Dict, Any, List
+from models.state import AgentState
+from utils.event_log import log_event
+from utils.llm_helper import llm_helper, StructuredOutputError
+from utils.prompts import render_prompt
+from utils.token_budget import budget_exhausted, record_token_usage
+from utils.visit_ledger import TEAM_RESULT_KEYS
+from utils.deadline import skip_for_deadline, record_deadline_skip
+from utils.progress import emit_progress
+from models.events import EventType, LogEvent
+from config.settings import settings
+
+# Team each suggested agent type maps to
+AGENT_TEAMS = {
+    "research": "team1",
+    "repair": "team2",
+    "quality": "team2",
+    "medical": "team3",
+    "pharmaceutical": "team3",
+    "financial": "team4",
+    "finance": "team4",
+    "summary": "team5",
+    "document": "team6",
+    "documents": "team6"
+}
+
+# Stages that still run once the token budget is spent
+WRAP_UP_TEAMS = ["team5", "team6"]
+
+# Stage order every plan follows
+STAGE_ORDER = [["team1"], ["team3", "team4"], ["team2"], ["team5"], ["team6"]]
+
+def planner_agent(state: AgentState) -> AgentState:
+    """Plan the whole run once, and replan when repair finds significant issues"""
+    plan = state.get("execution_plan") or {}
+
+    if plan.get("steps"):
+        print("🗺️ Planner: Replanning after quality review...")
+        remediation = remediation_steps(state)
+        cursor = plan["cursor"]
+        plan["steps"] = plan["steps"][:cursor] + remediation + plan["steps"][cursor:]
+        plan["replans"] += 1
+        plan["remediation"] = remediation
+        log_event(state, LogEvent.PLAN_REVISED, {"remediation": remediation, "replans": plan["replans"]})
+        print(f"🗺️ Planner: Remediation steps - {remediation or 'none'}")
+        skip_exhausted_steps(state)
+        return state
+
+    print("🗺️ Planner: Building execution plan...")
+    query = state.get("query", "")
+    if not state.get("query_analysis"):
+        state["query_analysis"] = llm_helper.analyze_query(query)
+        record_token_usage(state, "research", **llm_helper.last_usage)
+
+    if settings.PLANNER_MODE == "llm":
+        stages = build_llm_plan(state)
+    else:
+        stages = build_local_plan(state["query_analysis"])
+
+    state["execution_plan"] = {
+        "mode": settings.PLANNER_MODE,
+        "stages": stages,
+        "steps": [team for stage in stages for team in stage],
+        "cursor": 0,
+        "replans": 0,
+        "max_replans": 1
+    }
+    flow = " → ".join("{" + ", ".join(stage) + "}" if len(stage) > 1 else stage[0] for stage in stages)
+    log_event(state, LogEvent.PLAN_CREATED, {"mode": settings.PLANNER_MODE, "stages": stages})
+    print(f"🗺️ Planner: Execution plan - {flow}")
+    return state
+
+def build_local_plan(query_analysis: Dict[str, Any]) -> List[List[str]]:
+    """Execution stages from query analysis without an LLM call"""
+    domain = query_analysis.get("domain", "general").lower()
+    suggested = query_analysis.get("suggested_agents", [])
+    if isinstance(suggested, str):
+        suggested = [suggested]
+
+    teams = {"team1", "team2", "team5", "team6"}
+    for agent in suggested:
+        team = AGENT_TEAMS.get(str(agent).lower().strip())
+        if team:
+            teams.add(team)
+    if "medical" in domain or "pharma" in domain:
+        teams.add("team3")
+    if "financial" in domain or "finance" in domain:
+        teams.add("team4")
+
+    return order_stages(teams)
+
+def build_llm_plan(state: AgentState) -> List[List[str]]:
+    """Execution stages chosen by a single LLM call, falling back to the local plan"""
+    system_prompt, user_prompt = render_prompt("planner", query=state.get('query', ''), query_analysis=state.get('query_analysis', {}))
+
+    try:
+        teams = set(llm_helper.generate_structured("execution_plan", system_prompt, user_prompt, state, "supervisor")["teams"])
+    except StructuredOutputError as e:
+        print(f"⚠️ Planner: Invalid LLM plan ({e}) - using local plan")
+        return build_local_plan(state.get("query_analysis", {}))
+
+    teams.update(["team1", "team5", "team6"])
+    return order_stages(teams)
+
+def order_stages(teams) -> List[List[str]]:
+    """Arrange teams into the standard stage order"""
+    stages = []
+    for stage in STAGE_ORDER:
+        selected = [team for team in stage if team in teams]
+        if selected:
+            stages.append(selected)
+    return stages
+
+def remediation_steps(state: AgentState) -> List[str]:
+    """Teams to re-run for the issues repair reported"""
+    steps = []
+    for issue in state.get("repair_status", {}).get("quality_issues", []):
+        if issue == "missing_medical_analysis":
+            team = "team3"
+        elif issue == "missing_financial_analysis":
+            team = "team4"
+        elif issue.endswith("_low_confidence"):
+            result_key = issue[:-len("_low_confidence")]
+            team = next((t for t, key in TEAM_RESULT_KEYS.items() if key == result_key), None)
+        else:
+            team = None
+
+        if team and team not in WRAP_UP_TEAMS and team not in steps:
+            steps.append(team)
+    return steps
+
+def skip_exhausted_steps(state: AgentState):
+    """Move the cursor past steps the token budget or deadline no longer allows"""
+    plan = state["execution_plan"]
+    while plan["cursor"] < len(plan["steps"]):
+        team = plan["steps"][plan["cursor"]]
+        if team in WRAP_UP_TEAMS:
+            break
+        if budget_exhausted(state):
+            print(f"🗺️ Planner: Token budget exhausted - skipping {team}")
+        elif skip_for_deadline(state, team):
+            record_deadline_skip(state, team)
+            print(f"🗺️ Planner: Deadline approaching - skipping {team}")
+        else:
+            break
+        plan.setdefault("skipped", []).append(team)
+        plan["cursor"] += 1
+
+def advance_plan(state: AgentState):
+    """Mark the current plan step done after a team ran"""
+    plan = state["execution_plan"]
+    plan["last_completed"] = plan["steps"][plan["cursor"]]
+    plan["cursor"] += 1
+    state["iteration_count"] = state.get("iteration_count", 0) + 1
+    skip_exhausted_steps(state)
+    emit_progress(EventType.ROUTING_DECISION, next_agent=next_planned_step(state))
+
+def next_planned_step(state: AgentState) -> str:
+    """Next node of the plan: a team, the planner (to replan) or 'end'"""
+    plan = state.get("execution_plan", {})
+    if state.get("workflow_complete", False):
+        return "end"
+
+    steps = plan.get("steps", [])
+    cursor = plan.get("cursor", 0)
+
+    # Replan only when repair just reported significant issues
+    if plan.get("last_completed") == "team2":
+        status = state.get("repair_status", {}).get("status")
+        if status == "significant_issues_found" and plan.get("replans", 0) < plan.get("max_replans", 1):
+            return "planner"
+
+    if cursor >= len(steps):
+        return "end"
+    return steps[cursor]
@@ -1,6 +1,10 @@
 from typing import Dict, Any
 from models.state import AgentState
+from models.events import LogEvent
+from utils.event_log import log_event
 from utils.llm_helper import llm_helper
+from utils.prompts import render_prompt
+from utils.blob_store import intern_text
 
 def repair_agent(state: AgentState) -> AgentState:
     """AI-powered repair and quality assurance agent"""
@@ -10,16 +14,6 @@ def repair_agent(state: AgentState) -> AgentState:
     results = state.get("results", {})
     llm_responses = state.get("llm_responses", {})
     
-    # AI-powered quality assessment
-    system_prompt = """You are an AI quality assurance specialist. Analyze the current workflow state and results to identify:
-    1. Potential errors or inconsistencies
-    2. Missing information or gaps
-    3. Quality issues in the analysis
-    4. Recommendations for improvements
-    5. Overall confidence assessment
-    
-    Provide specific, actionable feedback for each identified issue."""
-    
     # Prepare context for AI analysis
     analysis_context = {
         "query": query,
@@ -38,19 +32,11 @@ def repair_agent(state: AgentState) -> AgentState:
                 "key_metrics": list(value.keys())[:5]  # First 5 keys for overview
             }
     
-    user_prompt = f"""Quality Assessment Request:
-    
-    Workflow Context: {analysis_context}
-    Results Overview: {quality_check_data}
-    
-    Please assess:
-    1. Are there any logical inconsistencies?
-    2. Is the analysis complete for the given query?
-    3. Are confidence scores reasonable?
-    4. What improvements could be made?
-    5. Overall quality rating (1-10)"""
+    # AI-powered quality assessment
+    system_prompt, user_prompt = render_prompt("repair", analysis_context=analysis_context, quality_check_data=quality_check_data)
     
-    repair_response = llm_helper.generate_response(system_prompt, user_prompt)
+    repair_response = llm_helper.generate_budgeted_response(state, "repair", system_prompt, user_prompt)
+    repair_response = intern_text(state, repair_response)
     
     # Analyze for specific repair actions
     repair_actions = []
@@ -112,7 +98,7 @@ def repair_agent(state: AgentState) -> AgentState:
     state["results"]["repair"] = repair_status
     state["llm_responses"] = state.get("llm_responses", {})
     state["llm_responses"]["repair"] = repair_response
-    state["messages"].append(f"Repair Agent: {overall_assessment}")
+    log_event(state, LogEvent.AGENT_COMPLETED, {"agent": "repair", "status": status, "assessment": overall_assessment})
     state["next_agent"] = "supervisor"
     
     print(f"✅ Repair Agent: {status} - Quality score: {repair_status['quality_score']}/10")
@@ -1,6 +1,14 @@
 from typing import Dict, Any
 from models.state import AgentState
+from models.events import LogEvent
+from utils.event_log import log_event
 from utils.llm_helper import llm_helper
+from utils.prompts import render_prompt
+from utils.handoffs import propose_handoff
+from utils.similarity_index import use_prior_output
+from utils.token_budget import record_token_usage
+from utils.blob_store import intern_text
+from utils.prefetch import take_prefetched
 import time
 
 def research_agent(state: AgentState) -> AgentState:
@@ -13,26 +21,28 @@ def research_agent(state: AgentState) -> AgentState:
     if not state.get("query_analysis"):
         query_analysis = llm_helper.analyze_query(query)
         state["query_analysis"] = query_analysis
+        record_token_usage(state, "research", **llm_helper.last_usage)
     else:
         query_analysis = state["query_analysis"]
     
     # AI-powered research
-    system_prompt = """You are an expert research analyst. Conduct comprehensive research on the given query.
-    Provide detailed findings, identify key areas for investigation, and suggest follow-up actions.
-    Format your response as a structured analysis with clear sections."""
+    system_prompt, user_prompt = research_prompts(query, query_analysis)
     
-    user_prompt = f"""Conduct research on: {query}
+    # Reuse, or build on, the output of a similar prior run
+    reuse_mode, prior_text, user_prompt = use_prior_output(state, "research", user_prompt)
     
-    Query analysis context: {query_analysis}
-    
-    Provide:
-    1. Key research findings
-    2. Important insights
-    3. Areas requiring specialist attention
-    4. Confidence assessment
-    5. Recommendations for next steps"""
-    
-    research_response = llm_helper.generate_response(system_prompt, user_prompt)
+    # Research prefetched while the user was confirming the query
+    prefetched = take_prefetched(state, "research")
+    if prefetched:
+        print("⚡ Research Agent: Using research prefetched during query confirmation")
+        research_response = intern_text(state, prefetched["text"])
+        record_token_usage(state, "research", **prefetched["usage"])
+    elif reuse_mode == "reuse":
+        print("♻️ Research Agent: Reusing research analysis from a similar prior run")
+        research_response = prior_text
+    else:
+        research_response = llm_helper.generate_budgeted_response(state, "research", system_prompt, user_prompt)
+        research_response = intern_text(state, research_response)
     
     # Structure the research results
     research_results = {
@@ -54,16 +64,21 @@ def research_agent(state: AgentState) -> AgentState:
     state["results"]["research"] = research_results
     state["llm_responses"] = state.get("llm_responses", {})
     state["llm_responses"]["research"] = research_response
-    state["messages"].append("Research Agent: AI-powered research completed")
+    log_event(state, LogEvent.AGENT_COMPLETED, {"agent": "research"})
     
-    # AI-powered next step decision
+    # AI-powered next step decision, handed straight to the specialist
     domain = query_analysis.get("domain", "general")
+    handoff = {"domain": domain, "keywords": query_analysis.get("keywords", [])}
     if "medical" in domain.lower() or "pharma" in domain.lower():
-        state["next_agent"] = "team3"
+        propose_handoff(state, "team1", "team3", research_results["confidence_score"], handoff)
     elif "financial" in domain.lower() or "finance" in domain.lower():
-        state["next_agent"] = "team4"
+        propose_handoff(state, "team1", "team4", research_results["confidence_score"], handoff)
     else:
         state["next_agent"] = "supervisor"
     
     print("✅ Research Agent: AI analysis completed")
     return state
+
+def research_prompts(query: str, query_analysis: Dict[str, Any]):
+    """System and user prompt of the research call"""
+    return render_prompt("research", query=query, query_analysis=query_analysis)
@@ -1,6 +1,11 @@
 from typing import Dict, Any
 from models.state import AgentState
+from models.events import LogEvent
+from utils.event_log import log_event
 from utils.llm_helper import llm_helper
+from utils.prompts import render_prompt
+from utils.handoffs import propose_handoff
+from utils.blob_store import intern_text, resolve_text
 
 def summary_agent(state: AgentState) -> AgentState:
     """AI-powered summary and synthesis agent"""
@@ -13,32 +18,20 @@ def summary_agent(state: AgentState) -> AgentState:
     # Compile all AI responses for synthesis
     all_analyses = []
     for agent, response in llm_responses.items():
-        all_analyses.append(f"{agent.upper()} ANALYSIS:\n{response}\n")
+        all_analyses.append(f"{agent.upper()} ANALYSIS:\n{resolve_text(state, response)}\n")
     
     # AI-powered comprehensive summary
-    system_prompt = """You are an expert synthesis analyst. Create a comprehensive, well-structured summary 
-    that integrates all the specialist analyses into a coherent, actionable report.
-    
-    Structure your summary with:
-    1. Executive Summary
-    2. Key Findings by Domain
-    3. Cross-Domain Insights
-    4. Recommendations
-    5. Conclusion
-    
-    Make it professional, clear, and actionable."""
-    
-    user_prompt = f"""Create a comprehensive summary for the query: "{query}"
-    
-    Specialist Analyses to Synthesize:
-    {chr(10).join(all_analyses)}
-    
-    Additional Context:
-    - Total agents involved: {len(results)}
-    - Query complexity: {state.get('query_analysis', {}).get('complexity', 'medium')}
-    - Domain focus: {state.get('query_analysis', {}).get('domain', 'general')}"""
-    
-    comprehensive_summary = llm_helper.generate_response(system_prompt, user_prompt)
+    system_prompt, user_prompt = render_prompt(
+        "summary",
+        query=query,
+        analyses="\n".join(all_analyses),
+        total_agents=len(results),
+        complexity=state.get('query_analysis', {}).get('complexity', 'medium'),
+        domain=state.get('query_analysis', {}).get('domain', 'general')
+    )
+    
+    comprehensive_summary = llm_helper.generate_budgeted_response(state, "summary", system_prompt, user_prompt)
+    comprehensive_summary = intern_text(state, comprehensive_summary)
     
     state["summary"] = comprehensive_summary
     state["results"]["summary"] = {
@@ -47,8 +40,9 @@ def summary_agent(state: AgentState) -> AgentState:
         "agents_synthesized": list(llm_responses.keys())
     }
     state["llm_responses"]["summary"] = comprehensive_summary
-    state["messages"].append("Summary Agent: AI-powered synthesis completed")
-    state["next_agent"] = "supervisor"
+    log_event(state, LogEvent.AGENT_COMPLETED, {"agent": "summary"})
+    # Documents always follow the summary
+    propose_handoff(state, "team5", "team6", 1.0, {"agents_synthesized": state["results"]["summary"]["agents_synthesized"]})
     
     print("✅ Summary Agent: AI synthesis completed")
     return state
@@ -1,6 +1,13 @@
 from typing import Dict, Any
 from models.state import AgentState
-from utils.llm_helper import llm_helper
+from utils.event_log import log_event
+from utils.llm_helper import llm_helper, StructuredOutputError
+from utils.prompts import render_prompt
+from utils.token_budget import ensure_token_budget, budget_exhausted
+from utils.progress import emit_progress
+from models.events import EventType, LogEvent
+from utils.visit_ledger import check_route, record_visit, record_blocked, TEAM_RESULT_KEYS
+from utils.deadline import deadline_pressure, skip_for_deadline, record_deadline_skip
 
 def supervisor_agent(state: AgentState) -> AgentState:
     """AI-powered supervisor coordinating all teams"""
@@ -25,6 +32,28 @@ def supervisor_agent(state: AgentState) -> AgentState:
         state["next_agent"] = None
         return state
     
+    # End gracefully once the token budget is spent
+    ensure_token_budget(state)
+    if budget_exhausted(state):
+        next_agent = wrap_up_route(results)
+        print(f"👑 Supervisor: Token budget exhausted - wrapping up via {next_agent}")
+        log_event(state, LogEvent.ROUTING_DECISION, {"next_agent": next_agent, "reason": "token_budget_exhausted"})
+        return apply_route(state, next_agent)
+    
+    # Under deadline pressure, go straight to wrap-up or route locally without an LLM round trip
+    pressure = deadline_pressure(state)
+    if pressure == "critical":
+        next_agent = wrap_up_route(results)
+        state["deadline"]["wrap_up_forced"] = True
+        print(f"👑 Supervisor: Deadline nearly reached - wrapping up via {next_agent}")
+        log_event(state, LogEvent.ROUTING_DECISION, {"next_agent": next_agent, "reason": "deadline_critical"})
+        return apply_route(state, next_agent)
+    if pressure == "tight":
+        next_agent = next_pending_agent(state)
+        print(f"👑 Supervisor: Deadline tight - routing to {next_agent} without AI routing")
+        log_event(state, LogEvent.ROUTING_DECISION, {"next_agent": next_agent, "reason": "deadline_tight"})
+        return apply_route(state, next_agent)
+    
     # Use AI to make routing decision
     routing_context = {
         "query": state.get("query", ""),
@@ -34,49 +63,63 @@ def supervisor_agent(state: AgentState) -> AgentState:
     }
     
     # AI-powered routing decision
-    system_prompt = """You are an intelligent supervisor managing a multi-agent workflow. 
-    Based on the current state, decide the next agent to route to:
-    
-    Available agents:
-    - team1: Research and initial analysis
-    - team2: Repair and quality assurance  
-    - team3: Medical/pharmaceutical specialist
-    - team4: Financial analysis specialist
-    - team5: Summary and synthesis
-    - team6: Document processing and organization
+    system_prompt, user_prompt = render_prompt("supervisor", routing_context=routing_context)
     
-    Rules:
-    1. Start with team1 (research) if no research is done
-    2. Route to team3 for medical queries, team4 for financial queries
-    3. Use team2 for quality checks and repairs
-    4. Use team5 for summarization after main analysis
-    5. Use team6 for final document processing
-    6. Return 'END' when all necessary tasks are complete
+    try:
+        next_agent = llm_helper.generate_structured("routing_decision", system_prompt, user_prompt, state, "supervisor")["next_agent"]
+    except StructuredOutputError as e:
+        print(f"⚠️ Supervisor: Invalid routing decision ({e}) - following the standard flow")
+        next_agent = next_pending_agent(state)
     
-    Return only the team name or 'END'."""
+    # Refuse re-entry to agents whose inputs have not changed, and route cycles
+    reason = check_route(state, next_agent)
+    if reason:
+        record_blocked(state, next_agent, reason)
+        print(f"👑 Supervisor: Skipping redundant route to {next_agent} ({reason})")
+        next_agent = next_pending_agent(state)
     
-    user_prompt = f"Current workflow state: {routing_context}"
+    log_event(state, LogEvent.ROUTING_DECISION, {"next_agent": next_agent, "reason": "ai"})
+    print(f"👑 Supervisor: AI routing decision - {next_agent}")
     
-    next_agent = llm_helper.generate_response(system_prompt, user_prompt).strip().lower()
+    return apply_route(state, next_agent)
+
+def next_pending_agent(state: AgentState) -> str:
+    """First stage of the standard flow that has not produced results yet"""
+    results = state.get("results", {})
+    domain = state.get("query_analysis", {}).get("domain", "general").lower()
     
-    # Validate and clean the response
-    valid_agents = ["team1", "team2", "team3", "team4", "team5", "team6", "end"]
-    if next_agent not in valid_agents:
-        # Fallback logic
-        if not results.get("research"):
-            next_agent = "team1"
-        elif not results.get("summary"):
-            next_agent = "team5"
-        else:
-            next_agent = "end"
+    flow = ["team1"]
+    if "medical" in domain or "pharma" in domain:
+        flow.append("team3")
+    if "financial" in domain or "finance" in domain:
+        flow.append("team4")
+    flow.extend(["team5", "team6"])
     
+    for team in flow:
+        if TEAM_RESULT_KEYS[team] in results or check_route(state, team):
+            continue
+        if skip_for_deadline(state, team):
+            record_deadline_skip(state, team)
+            continue
+        return team
+    return "end"
+
+def wrap_up_route(results: Dict[str, Any]) -> str:
+    """Next wrap-up stage so a run still ends with a summary and documents"""
+    if not results.get("summary"):
+        return "team5"
+    if not results.get("documents"):
+        return "team6"
+    return "end"
+
+def apply_route(state: AgentState, next_agent: str) -> AgentState:
+    """Write a routing decision into state"""
+    state["handoff_context"] = {}
     if next_agent == "end":
         state["workflow_complete"] = True
         state["next_agent"] = None
     else:
         state["next_agent"] = next_agent
-    
-    state["messages"].append(f"Supervisor: AI routing decision - {next_agent}")
-    print(f"👑 Supervisor: AI routing decision - {next_agent}")
-    
+        record_visit(state, next_agent)
+    emit_progress(EventType.ROUTING_DECISION, next_agent=next_agent)
     return state
@@ -0,0 +1,30 @@
+from contextlib import redirect_stdout
+from models.state import AgentState
+from benchmarks.offline_llm import OfflineChat
+import io
+
+BENCHMARK_QUERY = "Evaluate AI-assisted diagnostics: clinical outcomes, regulatory risk and market growth"
+
+# Synthetic run sizes: sentences per LLM response and the teams a run goes through
+SIZES = {
+    "small": {"sentences": 5, "teams": ["team1", "team5", "team6"]},
+    "medium": {"sentences": 40, "teams": ["team1", "team3", "team4", "team5", "team6"]},
+    "large": {"sentences": 300, "teams": ["team1", "team3", "team4", "team2", "team5", "team6"]}
+}
+
+def build_state(size: str, chat: OfflineChat) -> AgentState:
+    """State of a run that has been through every team of a size except documents
+
+    The real agents fill it in against the offline model, so the fixture
+    keeps the shapes the agents produce.
+    """
+    from main import build_initial_state
+    from bulk_pipeline import TEAM_AGENTS
+
+    chat.configure(**SIZES[size])
+    state = build_initial_state(BENCHMARK_QUERY, deadline=0)
+    with redirect_stdout(io.StringIO()):
+        for team in SIZES[size]["teams"]:
+            if team != "team6":
+                state = TEAM_AGENTS[team](state)
+    return state
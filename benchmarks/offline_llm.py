@@ -0,0 +1,101 @@
+from typing import Dict, Any, List, Optional
+from config.settings import settings
+from utils.visit_ledger import TEAM_RESULT_KEYS
+import random
+import copy
+import json
+import zlib
+import re
+
+VOCABULARY = [
+    "analysis", "patient", "market", "clinical", "risk", "treatment", "revenue", "regulatory",
+    "evidence", "outcome", "model", "adoption", "diagnostic", "investment", "safety", "growth",
+    "trial", "forecast", "quality", "accuracy", "cost", "policy", "workflow", "benchmark"
+]
+
+_COMPLETED_TASKS = re.compile(r"'completed_tasks': \[([^\]]*)\]")
+
+class OfflineMessage:
+    """Response of the offline model (no usage metadata, so usage is estimated)"""
+
+    def __init__(self, content: str):
+        self.content = content
+        self.response_metadata = {}
+
+class OfflineChat:
+    """Stand-in for ChatOpenAI that answers instantly and deterministically
+
+    Free-text calls get `sentences` sentences of filler text; structured
+    calls get a valid object for their schema, routing through `teams` in
+    order. Bound clients share the configuration of the client they came from.
+    """
+
+    def __init__(self, sentences: int = 10, teams: Optional[List[str]] = None):
+        self.config = {}
+        self.bound = {}
+        self.configure(sentences, teams or ["team1", "team5", "team6"])
+
+    def configure(self, sentences: int, teams: List[str]):
+        self.config["sentences"] = sentences
+        self.config["teams"] = teams
+
+    def bind(self, **kwargs) -> "OfflineChat":
+        bound = copy.copy(self)
+        bound.bound = {**self.bound, **kwargs}
+        return bound
+
+    def invoke(self, messages, **kwargs) -> OfflineMessage:
+        return OfflineMessage(self._answer(messages[0].content, messages[1].content))
+
+    async def ainvoke(self, messages, **kwargs) -> OfflineMessage:
+        return self.invoke(messages)
+
+    def stream(self, messages, **kwargs):
+        yield self.invoke(messages)
+
+    def _answer(self, system_prompt: str, user_prompt: str) -> str:
+        response_format = self.bound.get("response_format") or {}
+        if response_format.get("type") == "json_schema":
+            return json.dumps(self._structured(response_format["json_schema"]["name"], user_prompt))
+
+        rng = random.Random(zlib.crc32(user_prompt.encode("utf-8")))
+        sentences = []
+        for _ in range(self.config["sentences"]):
+            words = [rng.choice(VOCABULARY) for _ in range(rng.randint(8, 16))]
+            sentences.append(" ".join(words).capitalize() + ".")
+        return " ".join(sentences)
+
+    def _structured(self, name: str, user_prompt: str) -> Dict[str, Any]:
+        teams = self.config["teams"]
+        if name == "routing_decision":
+            match = _COMPLETED_TASKS.search(user_prompt)
+            completed = match.group(1) if match else ""
+            pending = [team for team in teams if f"'{TEAM_RESULT_KEYS[team]}'" not in completed]
+            return {"next_agent": pending[0] if pending else "end"}
+        if name == "execution_plan":
+            return {"teams": teams}
+        if name == "query_analysis":
+            domains = [TEAM_RESULT_KEYS[team] for team in teams if team in ("team3", "team4")]
+            return {
+                "intent": "analysis",
+                "domain": " and ".join(domains) or "general",
+                "complexity": "medium",
+                "keywords": VOCABULARY[:6],
+                "suggested_agents": ["research"] + domains + ["summary"],
+                "estimated_time": "5"
+            }
+        if name == "document_metadata":
+            return {"title": "Benchmark analysis", "tags": VOCABULARY[:4], "categories": ["benchmark"], "search_keywords": VOCABULARY[4:8]}
+        raise ValueError(f"Offline model has no answer for structured output {name}")
+
+def install_offline_llm(sentences: int = 10, teams: Optional[List[str]] = None) -> OfflineChat:
+    """Route every llm_helper call to an OfflineChat and return it"""
+    from utils.llm_helper import llm_helper
+    from utils.endpoint_pool import EndpointPool, Endpoint
+
+    # The offline model answers structured calls by schema name
+    settings.STRUCTURED_OUTPUT_MODE = "json_schema"
+    settings.OPENAI_FAST_MODEL = ""
+    chat = OfflineChat(sentences, teams)
+    llm_helper.endpoints = EndpointPool([Endpoint("offline", client_factory=lambda endpoint, model: chat)])
+    return chat
@@ -0,0 +1,214 @@
+"""Local OpenAI-compatible stand-in servers with configurable latency and error rate
+
+Serves POST /v1/chat/completions (plain and streamed) with the offline
+model's answers. Load-test the endpoint pool against three of them:
+
+    python -m benchmarks.openai_stub_server --latencies 0.05 0.2 0.6 --requests 60
+
+or against one server that answers 429 beyond 6 concurrent requests, to
+watch the adaptive concurrency limit settle:
+
+    python -m benchmarks.openai_stub_server --latencies 0.1 --capacity 6 --requests 200 --concurrency 32
+
+or keep them running for a real run (prints the LLM_ENDPOINTS value to use):
+
+    python -m benchmarks.openai_stub_server --latencies 0.05 0.6 --serve
+"""
+import os
+
+# Settings validation needs a key; the stand-in servers ignore it
+os.environ.setdefault("OPENAI_API_KEY", "stub")
+
+from typing import Dict, Any, List, Tuple
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from benchmarks.offline_llm import OfflineChat
+from utils.token_budget import estimate_tokens
+import threading
+import argparse
+import random
+import time
+import json
+import uuid
+import re
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, name: str, latency: float, error_rate: float, capacity: int = 0, port: int = 0):
+        super().__init__(("127.0.0.1", port), StubHandler)
+        self.name = name
+        self.latency = latency
+        self.error_rate = error_rate
+        # Concurrent requests served before answering 429 (0 = unlimited)
+        self.capacity = capacity
+        self.active = 0
+        self._active_lock = threading.Lock()
+        self.chat = OfflineChat(sentences=3)
+        self.requests = 0
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+class StubHandler(BaseHTTPRequestHandler):
+    server: StubServer
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        if self.path.rstrip("/") != "/v1/chat/completions":
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}", "type": "invalid_request_error"}})
+            return
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        self.server.requests += 1
+        with self.server._active_lock:
+            overloaded = self.server.capacity and self.server.active >= self.server.capacity
+            if not overloaded:
+                self.server.active += 1
+        if overloaded:
+            self._send_json(429, {"error": {"message": f"{self.server.name} is over capacity", "type": "rate_limit_error"}})
+            return
+        try:
+            self._respond(body)
+        finally:
+            with self.server._active_lock:
+                self.server.active -= 1
+
+    def _respond(self, body: Dict[str, Any]):
+        # Latency varies +-20% around the server's setting
+        time.sleep(self.server.latency * random.uniform(0.8, 1.2))
+        if random.random() < self.server.error_rate:
+            self._send_json(500, {"error": {"message": f"{self.server.name} failed", "type": "server_error"}})
+            return
+
+        messages = body.get("messages", [])
+        system_prompt = messages[0]["content"] if messages else ""
+        user_prompt = messages[-1]["content"] if messages else ""
+        chat = self.server.chat.bind(response_format=body.get("response_format"))
+        content = chat.invoke([SimpleNamespace(content=system_prompt), SimpleNamespace(content=user_prompt)]).content
+        usage = {
+            "prompt_tokens": estimate_tokens(system_prompt + user_prompt),
+            "completion_tokens": estimate_tokens(content)
+        }
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+
+        if body.get("stream"):
+            self._send_stream(body, content, usage)
+        else:
+            self._send_json(200, {
+                "id": f"chatcmpl-{uuid.uuid4().hex}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body.get("model", self.server.name),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                "usage": usage
+            })
+
+    def _send_json(self, status: int, payload: Dict[str, Any]):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_stream(self, body: Dict[str, Any], content: str, usage: Dict[str, int]):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+
+        chunk_id = f"chatcmpl-{uuid.uuid4().hex}"
+        def chunk(delta: Dict[str, Any], finish_reason=None, chunk_usage=None) -> Dict[str, Any]:
+            return {
+                "id": chunk_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": body.get("model", self.server.name),
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}] if chunk_usage is None else [],
+                "usage": chunk_usage
+            }
+
+        events = [chunk({"role": "assistant", "content": ""})]
+        events += [chunk({"content": piece}) for piece in re.split(r"(?<= )", content) if piece]
+        events.append(chunk({}, "stop"))
+        if (body.get("stream_options") or {}).get("include_usage"):
+            events.append(chunk({}, chunk_usage=usage))
+        for event in events:
+            self.wfile.write(f"data: {json.dumps(event)}\n\n".encode("utf-8"))
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.close_connection = True
+
+def start_stub_servers(latencies: List[float], error_rates: List[float] = None, capacity: int = 0) -> List[StubServer]:
+    """Start one stand-in server per latency on free local ports"""
+    servers = []
+    for index, latency in enumerate(latencies):
+        error_rate = error_rates[index] if error_rates and index < len(error_rates) else 0.0
+        server = StubServer(f"stub{index + 1}", latency, error_rate, capacity)
+        threading.Thread(target=server.serve_forever, name=server.name, daemon=True).start()
+        servers.append(server)
+    return servers
+
+def endpoint_configs(servers: List[StubServer]) -> List[Dict[str, Any]]:
+    """LLM_ENDPOINTS entries for the servers"""
+    return [{"name": server.name, "base_url": server.base_url, "api_key": "stub"} for server in servers]
+
+def run_load(servers: List[StubServer], requests: int, concurrency: int, policy: str) -> Tuple[float, Dict[str, Any]]:
+    """Send requests through llm_helper over a pool of the servers; returns (seconds, endpoint stats)"""
+    from utils.llm_helper import llm_helper
+    from utils.endpoint_pool import create_endpoint_pool, ENDPOINT_ERRORS
+    from config.settings import settings
+
+    settings.LLM_ENDPOINT_POLICY = policy
+    llm_helper.endpoints = create_endpoint_pool(endpoint_configs(servers))
+
+    def call(index: int):
+        try:
+            llm_helper.generate_response("You are a load-test assistant.", f"Request {index}: summarize the findings.")
+        except ENDPOINT_ERRORS:
+            # Counted in the endpoint stats; a load test keeps going
+            pass
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(call, range(requests)))
+    return time.perf_counter() - started, llm_helper.endpoint_stats()
+
+def main():
+    parser = argparse.ArgumentParser(description="Run local OpenAI-compatible stand-in servers")
+    parser.add_argument("--latencies", nargs="+", type=float, default=[0.05, 0.2, 0.6], help="seconds per response, one server each")
+    parser.add_argument("--error-rates", nargs="+", type=float, default=None, help="failure probability per server")
+    parser.add_argument("--requests", type=int, default=60)
+    parser.add_argument("--capacity", type=int, default=0, help="concurrent requests per server before it answers 429")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--policy", default="ewma", choices=["ewma", "least_outstanding"])
+    parser.add_argument("--serve", action="store_true", help="keep the servers running instead of load-testing them")
+    args = parser.parse_args()
+
+    servers = start_stub_servers(args.latencies, args.error_rates, args.capacity)
+    for server in servers:
+        print(f"🧪 {server.name}: {server.base_url} ({server.latency * 1000:.0f} ms, {server.error_rate:.0%} errors)")
+
+    if args.serve:
+        print(f"\nLLM_ENDPOINTS='{json.dumps(endpoint_configs(servers))}'")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            return
+
+    elapsed, stats = run_load(servers, args.requests, args.concurrency, args.policy)
+    print(f"\n📊 {args.requests} requests in {elapsed:.1f}s with the {args.policy} policy:")
+    for name, endpoint in stats.items():
+        print(f"• {name}: {endpoint['requests']} requests, {endpoint['failures']} failures, "
+              f"EWMA {endpoint['ewma_ms']:.0f} ms, {endpoint['ejections']} ejections ({endpoint['status']})")
+    from utils.llm_helper import llm_helper
+    concurrency = llm_helper.concurrency_stats()
+    if concurrency["adaptive"]:
+        print(f"🚦 In-flight limit {concurrency['limit']}: {concurrency['increases']} increases, {concurrency['decreases']} cuts "
+              f"({concurrency['rate_limit']} rate limit, {concurrency['timeout']} timeout, {concurrency['latency']} latency)")
+
+if __name__ == "__main__":
+    main()
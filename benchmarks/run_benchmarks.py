@@ -0,0 +1,210 @@
+"""Micro-benchmarks for the CPU-side orchestration hot paths
+
+Runs each component against synthetic run states (see fixtures.SIZES) with
+the offline model, so no API key or network is needed:
+
+    python -m benchmarks.run_benchmarks                  # compare with the baseline
+    python -m benchmarks.run_benchmarks --save-baseline  # record a new baseline
+
+Exits with status 1 when a component got slower, or needs more memory,
+than its baseline by more than the threshold.
+"""
+import os
+
+# Settings validation needs a key; the offline model never uses it
+os.environ.setdefault("OPENAI_API_KEY", "offline-benchmark")
+
+from typing import Dict, Any, List, Optional, Callable, Tuple
+from contextlib import redirect_stdout
+from config.settings import settings
+from benchmarks.offline_llm import OfflineChat, install_offline_llm
+from benchmarks.fixtures import SIZES, BENCHMARK_QUERY, build_state
+from datetime import datetime
+import statistics
+import tracemalloc
+import tempfile
+import platform
+import argparse
+import time
+import json
+import sys
+import io
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+# Allowed slowdown (and memory growth) relative to the baseline
+DEFAULT_THRESHOLD = 0.25
+# Differences below these are noise whatever the ratio
+MIN_TIME_DELTA_S = 0.0005
+MIN_MEMORY_DELTA_KIB = 64
+
+# A component prepares its work for a state: (call, operations per call)
+Component = Callable[[Dict[str, Any], OfflineChat], Tuple[Callable[[], Any], int]]
+
+def bench_main_report(state: Dict[str, Any], chat: OfflineChat):
+    from agents.document_agent import create_main_report
+    args = (state["query"], state["results"], state["summary"], state["llm_responses"], "Document planning guidance")
+    return lambda: create_main_report(*args), 1
+
+def bench_specialist_report(state: Dict[str, Any], chat: OfflineChat):
+    from agents.document_agent import create_specialist_report
+    specialists = [key for key in ["research", "medical", "financial"] if key in state["results"]]
+
+    def run():
+        for specialist in specialists:
+            create_specialist_report(specialist, state["results"][specialist], state["llm_responses"].get(specialist, ""))
+    return run, len(specialists)
+
+def bench_technical_export(state: Dict[str, Any], chat: OfflineChat):
+    from agents.document_agent import create_technical_export
+    return lambda: create_technical_export(state), 1
+
+def bench_routing_state_dump(state: Dict[str, Any], chat: OfflineChat):
+    from utils.llm_helper import llm_helper
+    return lambda: llm_helper.make_routing_decision(state), 1
+
+def bench_graph_step(state: Dict[str, Any], chat: OfflineChat):
+    """A whole supervisor-mode run, reported per graph step"""
+    from main import create_ai_multi_agent_system, build_initial_state
+    with redirect_stdout(io.StringIO()):
+        app = create_ai_multi_agent_system()
+
+    def run():
+        with redirect_stdout(io.StringIO()):
+            return sum(1 for _ in app.stream(build_initial_state(BENCHMARK_QUERY, deadline=0), stream_mode="updates"))
+
+    return run, run()
+
+COMPONENTS: Dict[str, Component] = {
+    "main_report": bench_main_report,
+    "specialist_report": bench_specialist_report,
+    "technical_export": bench_technical_export,
+    "routing_state_dump": bench_routing_state_dump,
+    "graph_step": bench_graph_step
+}
+
+def measure(call: Callable[[], Any], operations: int, repeat: int) -> Dict[str, float]:
+    """Best time over repeat calls and the peak traced memory of one call, per operation"""
+    call()  # warm-up
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        call()
+        times.append(time.perf_counter() - started)
+
+    tracemalloc.start()
+    try:
+        baseline, _ = tracemalloc.get_traced_memory()
+        call()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    operations = max(1, operations)
+    return {
+        "time_s": min(times) / operations,
+        "median_s": statistics.median(times) / operations,
+        "peak_kib": (peak - baseline) / 1024 / operations
+    }
+
+def run_benchmarks(components: List[str], sizes: List[str], repeat: int) -> Dict[str, Dict[str, Dict[str, float]]]:
+    """Measurements by component and size"""
+    chat = install_offline_llm()
+    # Only CPU work is measured: no per-run event log files
+    settings.EVENT_LOG_DIR = ""
+    results: Dict[str, Dict[str, Dict[str, float]]] = {name: {} for name in components}
+    for size in sizes:
+        state = build_state(size, chat)
+        for name in components:
+            call, operations = COMPONENTS[name](state, chat)
+            with redirect_stdout(io.StringIO()):
+                results[name][size] = measure(call, operations, repeat)
+            print(f"⏱️ {name} [{size}]: {results[name][size]['time_s'] * 1000:.3f} ms, peak {results[name][size]['peak_kib']:.1f} KiB")
+    return results
+
+def find_regressions(results: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """Components slower or hungrier than their baseline beyond the threshold"""
+    regressions = []
+    for name, by_size in results.items():
+        for size, current in by_size.items():
+            previous = baseline.get(name, {}).get(size)
+            if not previous:
+                continue
+            if (current["time_s"] > previous["time_s"] * (1 + threshold)
+                    and current["time_s"] - previous["time_s"] > MIN_TIME_DELTA_S):
+                regressions.append(f"{name} [{size}]: time {previous['time_s'] * 1000:.3f} → {current['time_s'] * 1000:.3f} ms "
+                                   f"({current['time_s'] / previous['time_s'] - 1:+.0%})")
+            if (current["peak_kib"] > previous["peak_kib"] * (1 + threshold)
+                    and current["peak_kib"] - previous["peak_kib"] > MIN_MEMORY_DELTA_KIB):
+                regressions.append(f"{name} [{size}]: peak memory {previous['peak_kib']:.1f} → {current['peak_kib']:.1f} KiB "
+                                   f"({current['peak_kib'] / max(previous['peak_kib'], 1e-9) - 1:+.0%})")
+    return regressions
+
+def load_baseline(path: str) -> Optional[Dict[str, Any]]:
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def save_baseline(path: str, results: Dict[str, Any], threshold: float, existing: Optional[Dict[str, Any]] = None):
+    """Write results as the baseline, keeping entries of components and sizes not rerun"""
+    merged = dict((existing or {}).get("results", {}))
+    for name, by_size in results.items():
+        merged[name] = {**merged.get(name, {}), **by_size}
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({
+            "created": datetime.now().isoformat(),
+            "python": platform.python_version(),
+            "machine": platform.platform(),
+            "threshold": threshold,
+            "results": merged
+        }, f, indent=2)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the orchestration hot paths against a stored baseline")
+    parser.add_argument("--components", nargs="+", choices=list(COMPONENTS), default=list(COMPONENTS))
+    parser.add_argument("--sizes", nargs="+", choices=list(SIZES), default=list(SIZES))
+    parser.add_argument("--repeat", type=int, default=5, help="timed calls per component (best is kept)")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline JSON file")
+    parser.add_argument("--threshold", type=float, default=None,
+                        help=f"allowed regression ratio (default: the baseline's, else {DEFAULT_THRESHOLD})")
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the new baseline")
+    parser.add_argument("--output", default=None, help="also write the results to this JSON file")
+    args = parser.parse_args()
+
+    baseline_path = os.path.abspath(args.baseline)
+    output_path = os.path.abspath(args.output) if args.output else None
+    baseline = load_baseline(baseline_path)
+    threshold = args.threshold if args.threshold is not None else (baseline or {}).get("threshold", DEFAULT_THRESHOLD)
+
+    # The graph run saves documents; keep them out of the working tree
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="benchmarks_") as workdir:
+        os.chdir(workdir)
+        try:
+            results = run_benchmarks(args.components, args.sizes, args.repeat)
+        finally:
+            os.chdir(cwd)
+
+    if output_path:
+        with open(output_path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+    if args.save_baseline:
+        save_baseline(baseline_path, results, threshold, baseline)
+        print(f"💾 Baseline saved to: {baseline_path}")
+        return
+
+    if baseline is None:
+        print(f"⚠️ No baseline at {baseline_path} - run with --save-baseline to record one")
+        return
+
+    regressions = find_regressions(results, baseline["results"], threshold)
+    if regressions:
+        print(f"\n❌ {len(regressions)} regressions beyond {threshold:.0%} (baseline from {baseline['created']}, {baseline['machine']}):")
+        for regression in regressions:
+            print(f"• {regression}")
+        sys.exit(1)
+    print(f"\n✅ No regressions beyond {threshold:.0%} of the baseline")
+
+if __name__ == "__main__":
+    main()
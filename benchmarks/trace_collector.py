@@ -0,0 +1,151 @@
+"""Local stand-in for an OpenTelemetry collector, and a viewer for exported traces
+
+Receives OTLP/JSON over HTTP (POST /v1/traces), appends each request to a
+JSONL file and prints the trace as a span tree:
+
+    python -m benchmarks.trace_collector --port 4318 --output traces/collected.otlp.jsonl
+    TRACE_EXPORTER=otlp python main.py
+
+Span trees of traces already on file (TRACE_EXPORTER=file):
+
+    python -m benchmarks.trace_collector --file traces/traces.otlp.jsonl --last 3
+"""
+from typing import Dict, Any, List
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from collections import defaultdict
+import threading
+import argparse
+import json
+import os
+
+# Attributes shown next to each span in the tree
+TREE_ATTRIBUTES = [
+    "run.id", "node.next_agent", "llm.endpoint", "llm.queue_wait_ms",
+    "gen_ai.usage.input_tokens", "gen_ai.usage.output_tokens", "llm.cached_tokens", "io.path"
+]
+
+def _value(value: Dict[str, Any]) -> Any:
+    if "arrayValue" in value:
+        return [_value(item) for item in value["arrayValue"].get("values", [])]
+    for key in ("stringValue", "boolValue", "doubleValue"):
+        if key in value:
+            return value[key]
+    if "intValue" in value:
+        return int(value["intValue"])
+    return None
+
+def request_spans(payload: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Spans of an ExportTraceServiceRequest with plain attribute dicts"""
+    spans = []
+    for resource_spans in payload.get("resourceSpans", []):
+        for scope_spans in resource_spans.get("scopeSpans", []):
+            for span in scope_spans.get("spans", []):
+                spans.append({
+                    **span,
+                    "attributes": {attribute["key"]: _value(attribute["value"]) for attribute in span.get("attributes", [])},
+                    "duration_s": (int(span["endTimeUnixNano"]) - int(span["startTimeUnixNano"])) / 1e9
+                })
+    return spans
+
+def format_trace(spans: List[Dict[str, Any]]) -> List[str]:
+    """Indented span tree of one trace, children in start order"""
+    children = defaultdict(list)
+    for span in spans:
+        children[span.get("parentSpanId")].append(span)
+    ids = {span["spanId"] for span in spans}
+
+    lines = []
+    def walk(span: Dict[str, Any], depth: int):
+        details = [f"{key}={span['attributes'][key]}" for key in TREE_ATTRIBUTES if span["attributes"].get(key) is not None]
+        error = " ❌ " + span["status"].get("message", "") if span.get("status", {}).get("code") == 2 else ""
+        lines.append(f"{'  ' * depth}{span['name']} {span['duration_s'] * 1000:.1f} ms {' '.join(details)}{error}".rstrip())
+        for child in sorted(children[span["spanId"]], key=lambda child: int(child["startTimeUnixNano"])):
+            walk(child, depth + 1)
+
+    # Roots, and spans whose parent was dropped or sampled away
+    for span in sorted(spans, key=lambda span: int(span["startTimeUnixNano"])):
+        if span.get("parentSpanId") not in ids:
+            walk(span, 0)
+    return lines
+
+def print_request(payload: Dict[str, Any]):
+    by_trace = defaultdict(list)
+    for span in request_spans(payload):
+        by_trace[span["traceId"]].append(span)
+    for trace_id, spans in by_trace.items():
+        print(f"\n🔭 Trace {trace_id} ({len(spans)} spans)")
+        for line in format_trace(spans):
+            print(line)
+
+class CollectorHandler(BaseHTTPRequestHandler):
+    server: "CollectorServer"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        if self.path.rstrip("/") != "/v1/traces":
+            self.send_response(404)
+            self.end_headers()
+            return
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        try:
+            payload = json.loads(body)
+        except json.JSONDecodeError:
+            self.send_response(400)
+            self.end_headers()
+            return
+        self.server.store(payload)
+        data = b"{}"
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+class CollectorServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port: int, output: str, quiet: bool = False):
+        super().__init__(("127.0.0.1", port), CollectorHandler)
+        self.output = output
+        self.quiet = quiet
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def store(self, payload: Dict[str, Any]):
+        with self._lock:
+            self.requests += 1
+            if self.output:
+                directory = os.path.dirname(self.output)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                with open(self.output, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(payload) + "\n")
+            if not self.quiet:
+                print_request(payload)
+
+def main():
+    parser = argparse.ArgumentParser(description="Receive OTLP/JSON traces locally, or show traces on file")
+    parser.add_argument("--port", type=int, default=4318)
+    parser.add_argument("--output", default="traces/collected.otlp.jsonl", help="JSONL file for received traces (\"\" = keep none)")
+    parser.add_argument("--file", default=None, help="show the traces in this OTLP/JSON lines file instead of listening")
+    parser.add_argument("--last", type=int, default=1, help="with --file, how many of the latest traces to show")
+    args = parser.parse_args()
+
+    if args.file:
+        with open(args.file, 'r', encoding='utf-8') as f:
+            requests = [json.loads(line) for line in f if line.strip()]
+        for payload in requests[-args.last:]:
+            print_request(payload)
+        return
+
+    server = CollectorServer(args.port, args.output)
+    print(f"🔭 Trace collector listening on http://127.0.0.1:{args.port}/v1/traces")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+from models.state import AgentState
+from agents.research_agent import research_agent
+from agents.repair_agent import repair_agent
+from agents.medical_agent import medical_agent
+from agents.financial_agent import financial_agent
+from agents.summary_agent import summary_agent
+from agents.document_agent import document_agent
+from agents.planner import planner_agent, advance_plan, next_planned_step, STAGE_ORDER
+from config.settings import settings
+from main import build_initial_state
+from utils.llm_helper import llm_helper, replaying, PromptCaptured
+from utils.batch_backend import BatchBackend, create_batch_backend
+from utils.visit_ledger import record_visit
+from utils.blob_store import create_blob_store, release_blob_store, materialize_state
+from utils.run_history import RunHistory, run_record
+from utils.event_log import close_event_log
+from utils.progress import progress_listener, emit_progress
+from contextlib import redirect_stdout
+from typing import Dict, Any, List, Optional, Callable
+from datetime import datetime
+import argparse
+import sys
+import io
+import itertools
+import copy
+import json
+
+TEAM_AGENTS = {
+    "team1": research_agent,
+    "team2": repair_agent,
+    "team3": medical_agent,
+    "team4": financial_agent,
+    "team5": summary_agent,
+    "team6": document_agent
+}
+
+# Every run goes through the same stages in this order
+STAGES = ["planner"] + [team for stage in STAGE_ORDER for team in stage]
+
+# Batch rounds one stage may take (an agent making N LLM calls needs N rounds)
+MAX_STAGE_ROUNDS = 8
+
+def plan_step(team: str) -> Callable[[AgentState], AgentState]:
+    """Run a team as a plan step and move the plan cursor on"""
+    def run_step(state: AgentState) -> AgentState:
+        record_visit(state, team)
+        state = TEAM_AGENTS[team](state)
+        advance_plan(state)
+        return state
+    return run_step
+
+def plan_once(state: AgentState) -> AgentState:
+    """Plan a run; replanning would break stage order, so it is disabled"""
+    state = planner_agent(state)
+    state["execution_plan"]["max_replans"] = 0
+    return state
+
+def stage_node(stage: str) -> Callable[[AgentState], AgentState]:
+    return plan_once if stage == "planner" else plan_step(stage)
+
+def wants_stage(state: AgentState, stage: str) -> bool:
+    """Whether a run's plan has this stage next"""
+    if stage == "planner":
+        return not state.get("execution_plan")
+    return next_planned_step(state) == stage
+
+def replay_stage(run: Dict[str, Any], stage: str) -> AgentState:
+    """Replay a stage on a copy of a run's state with the responses known so far
+
+    Prints and progress events are held back, and only passed on by the
+    replay that finishes (or fails), so each shows once per stage.
+    """
+    output, events = io.StringIO(), []
+    try:
+        with replaying(run["responses"]), redirect_stdout(output), progress_listener(events.append, stream_tokens=False):
+            state = stage_node(stage)(copy.deepcopy(run["state"]))
+    except PromptCaptured:
+        raise
+    except Exception:
+        sys.stdout.write(output.getvalue())
+        raise
+    sys.stdout.write(output.getvalue())
+    for event in events:
+        emit_progress(event.type, node=event.node, **event.data)
+    return state
+
+def run_stage(runs: List[Dict[str, Any]], stage: str, backend: BatchBackend, batch_name: str) -> int:
+    """Advance runs through one stage, batching their LLM calls round by round
+
+    Each round replays the stage on a copy of every waiting run's state with
+    the responses known so far; the first unknown call of each run is
+    captured, and all captured calls go out as one batch. Returns the number
+    of requests submitted.
+    """
+    pending = runs
+    submitted = 0
+    for round_number in itertools.count(1):
+        requests, waiting = [], []
+        for run in pending:
+            try:
+                run["state"] = replay_stage(run, stage)
+            except PromptCaptured as captured:
+                request = dict(captured.request, custom_id=f"{run['state']['run_id']}:{captured.request['key']}")
+                requests.append(request)
+                waiting.append(run)
+            except Exception as e:
+                run["error"] = f"{stage}: {e}"
+                print(f"❌ Bulk run {run['state']['run_id']} failed in {stage}: {e}")
+
+        if not requests:
+            break
+        if round_number > MAX_STAGE_ROUNDS:
+            for run in waiting:
+                run["error"] = f"{stage}: still calling the LLM after {MAX_STAGE_ROUNDS} batch rounds"
+            break
+
+        results = backend.run(f"{batch_name}_{stage}_{round_number}", requests)
+        submitted += len(requests)
+        for run, request in zip(waiting, requests):
+            result = results.get(request["custom_id"], {"error": "missing from batch output"})
+            if "error" in result:
+                run["responses"][request["key"]] = RuntimeError(f"Batch request failed: {result['error']}")
+            else:
+                run["responses"][request["key"]] = (result["content"], result["usage"])
+        pending = waiting
+
+    # Responses are only replayed within a stage
+    for run in runs:
+        run["responses"] = {}
+    return submitted
+
+def run_bulk_pipeline(queries: List[str], backend: Optional[BatchBackend] = None, token_budget: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Analyze many queries stage by stage, one batch per stage round
+
+    Returns one entry per query with the materialized final state, or the
+    error that stopped the run.
+    """
+    backend = backend or create_batch_backend()
+    batch_name = f"bulk_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+
+    runs = []
+    for query in queries:
+        # Offline jobs have no deadline
+        state = build_initial_state(query, token_budget, deadline=0)
+        create_blob_store(state["run_id"])
+        runs.append({"state": state, "responses": {}, "error": None})
+
+    print(f"\n📦 Bulk pipeline: {len(runs)} queries through stages {' → '.join(STAGES)}")
+    for stage in STAGES:
+        active = [run for run in runs if not run["error"] and wants_stage(run["state"], stage)]
+        if not active:
+            continue
+        submitted = run_stage(active, stage, backend, batch_name)
+        concurrency = llm_helper.concurrency_stats()
+        limit = f", LLM in-flight limit {concurrency['limit']}" if concurrency["adaptive"] else ""
+        print(f"📦 Stage {stage}: {len(active)} runs, {submitted} batched LLM requests{limit}")
+
+    outcomes = []
+    for run in runs:
+        run_id = run["state"]["run_id"]
+        store = release_blob_store(run_id)
+        close_event_log(run_id)
+        final_state = materialize_state(run["state"], store.export() if store else {})
+        outcomes.append({"run_id": run_id, "query": final_state["query"], "error": run["error"], "final_state": final_state})
+
+    finished = [outcome for outcome in outcomes if not outcome["error"]]
+    if settings.RUN_HISTORY_DB and finished:
+        history = RunHistory()
+        try:
+            history.record_runs([run_record(outcome["final_state"]) for outcome in finished])
+        finally:
+            history.close()
+
+    print(f"📦 Bulk pipeline complete: {len(finished)}/{len(outcomes)} runs finished")
+    return outcomes
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyze many queries in stage-wise LLM batches")
+    parser.add_argument("queries", help="text file with one query per line")
+    parser.add_argument("--backend", default=None, help="batch backend: openai or local (default: BATCH_BACKEND)")
+    parser.add_argument("--output", default=None, help="JSONL file for the results (default: bulk_results_<timestamp>.jsonl)")
+    parser.add_argument("--token-budget", type=int, default=None, help="token cap per run")
+    args = parser.parse_args()
+
+    with open(args.queries, 'r', encoding='utf-8') as f:
+        queries = [line.strip() for line in f if line.strip()]
+
+    outcomes = run_bulk_pipeline(queries, create_batch_backend(args.backend), args.token_budget)
+
+    output = args.output or f"bulk_results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jsonl"
+    with open(output, 'w', encoding='utf-8') as f:
+        for outcome in outcomes:
+            f.write(json.dumps(outcome, default=str) + "\n")
+    print(f"💾 Bulk results saved to: {output}")
+
+if __name__ == "__main__":
+    main()
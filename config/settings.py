@@ -6,13 +6,107 @@ load_dotenv()
 class Settings:
     OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
     OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4")
+    # OpenAI-compatible endpoint for OPENAI_API_KEY ("" = api.openai.com)
+    OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "")
+    # Faster model tier used under deadline pressure ("" keeps OPENAI_MODEL)
+    OPENAI_FAST_MODEL = os.getenv("OPENAI_FAST_MODEL", "")
     MAX_TOKENS = 2000
     TEMPERATURE = 0.7
+    # Operator cap on total tokens per run (0 = complexity budget only)
+    RUN_TOKEN_BUDGET = int(os.getenv("RUN_TOKEN_BUDGET", "0"))
+    # "supervisor" routes step by step, "planned" runs a plan-once execution DAG
+    ORCHESTRATION_MODE = os.getenv("ORCHESTRATION_MODE", "supervisor")
+    # Supervisor mode: take agent-proposed handoffs at least this confident without a supervisor hop
+    DIRECT_HANDOFFS = os.getenv("DIRECT_HANDOFFS", "true").lower() == "true"
+    HANDOFF_MIN_CONFIDENCE = float(os.getenv("HANDOFF_MIN_CONFIDENCE", "0.8"))
+    # How the planned mode builds its DAG: "local" or "llm"
+    PLANNER_MODE = os.getenv("PLANNER_MODE", "local")
+    # Only regenerate documents whose inputs changed since the previous build
+    INCREMENTAL_DOCUMENTS = os.getenv("INCREMENTAL_DOCUMENTS", "false").lower() == "true"
+    DOCUMENT_BUILD_DIR = os.getenv("DOCUMENT_BUILD_DIR", "analysis_output_builds")
+    # Share one upstream call between identical concurrent LLM requests
+    COALESCE_LLM_REQUESTS = os.getenv("COALESCE_LLM_REQUESTS", "true").lower() == "true"
+    # Opt-in per-node cProfile/tracemalloc profiling (also: python main.py --profile)
+    PROFILE_NODES = os.getenv("AGENT_PROFILE", "false").lower() == "true"
+    PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+    PROFILE_TOP_N = int(os.getenv("PROFILE_TOP_N", "20"))
+    # Keep large LLM texts once per run in a content-addressed store, state holds references
+    INTERN_LLM_TEXTS = os.getenv("INTERN_LLM_TEXTS", "true").lower() == "true"
+    BLOB_MIN_CHARS = int(os.getenv("BLOB_MIN_CHARS", "256"))
+    # "none", "zlib" or "zstd" (needs the zstandard package)
+    BLOB_COMPRESSION = os.getenv("BLOB_COMPRESSION", "none")
+    # SQLite run history with full-text search, off unless a path is set (prior-run reuse needs it)
+    RUN_HISTORY_DB = os.getenv("RUN_HISTORY_DB", "")
+    RUN_HISTORY_MAX_AGE_DAYS = float(os.getenv("RUN_HISTORY_MAX_AGE_DAYS", "0"))
+    RUN_HISTORY_MAX_RUNS = int(os.getenv("RUN_HISTORY_MAX_RUNS", "0"))
+    # Also write the loose ai_multi_agent_results_<timestamp>.json file
+    SAVE_RESULTS_JSON = os.getenv("SAVE_RESULTS_JSON", "true").lower() == "true"
+    # Reuse prior runs of near-duplicate queries, per agent: "research:reuse,medical:context"
+    REUSE_POLICY = os.getenv("REUSE_POLICY", "")
+    REUSE_SIMILARITY_THRESHOLD = float(os.getenv("REUSE_SIMILARITY_THRESHOLD", "0.85"))
+    REUSE_TTL_HOURS = float(os.getenv("REUSE_TTL_HOURS", "168"))
+    REUSE_MAX_RUNS = int(os.getenv("REUSE_MAX_RUNS", "5000"))
+    # LLM call scheduler: concurrent upstream calls, default class ("interactive", "service", "batch")
+    LLM_MAX_IN_FLIGHT = int(os.getenv("LLM_MAX_IN_FLIGHT", "4"))
+    LLM_DEFAULT_PRIORITY = os.getenv("LLM_DEFAULT_PRIORITY", "interactive")
+    # Fair-share weights per tenant: "tenant_a:2,tenant_b:1" (unlisted tenants weigh 1)
+    LLM_TENANT_WEIGHTS = os.getenv("LLM_TENANT_WEIGHTS", "")
+    # Adaptive (AIMD) in-flight limit, starting at LLM_MAX_IN_FLIGHT and kept within these bounds
+    LLM_ADAPTIVE_CONCURRENCY = os.getenv("LLM_ADAPTIVE_CONCURRENCY", "true").lower() == "true"
+    LLM_MIN_IN_FLIGHT = int(os.getenv("LLM_MIN_IN_FLIGHT", "1"))
+    LLM_MAX_IN_FLIGHT_CEILING = int(os.getenv("LLM_MAX_IN_FLIGHT_CEILING", "32"))
+    # Cut factor on 429s, timeouts and latency inflation, and the latency rise over baseline that counts as inflation
+    LLM_CONCURRENCY_BACKOFF = float(os.getenv("LLM_CONCURRENCY_BACKOFF", "0.5"))
+    LLM_LATENCY_TOLERANCE = float(os.getenv("LLM_LATENCY_TOLERANCE", "2.0"))
+    # Per-run deadline in seconds (0 = none) and the time kept back for summary and documents
+    # (at most a quarter of the deadline)
+    RUN_DEADLINE_SECONDS = float(os.getenv("RUN_DEADLINE_SECONDS", "0"))
+    DEADLINE_WRAP_UP_SECONDS = float(os.getenv("DEADLINE_WRAP_UP_SECONDS", "30"))
+    # Bulk pipeline: "openai" (Batch API) or "local" (answers batch files with regular calls)
+    BATCH_BACKEND = os.getenv("BATCH_BACKEND", "openai")
+    BATCH_DIR = os.getenv("BATCH_DIR", "batches")
+    BATCH_POLL_SECONDS = float(os.getenv("BATCH_POLL_SECONDS", "30"))
+    BATCH_LOCAL_WORKERS = int(os.getenv("BATCH_LOCAL_WORKERS", "4"))
+    # Interactive CLI: analyze (and optionally research) a query while the user confirms it
+    PREFETCH_ANALYSIS = os.getenv("PREFETCH_ANALYSIS", "true").lower() == "true"
+    PREFETCH_RESEARCH = os.getenv("PREFETCH_RESEARCH", "false").lower() == "true"
+    # Whole-run result cache, off unless a path is set; --refresh bypasses it for a run
+    RUN_CACHE_DB = os.getenv("RUN_CACHE_DB", "")
+    RUN_CACHE_TTL_HOURS = float(os.getenv("RUN_CACHE_TTL_HOURS", "24"))
+    RUN_CACHE_MAX_MB = float(os.getenv("RUN_CACHE_MAX_MB", "200"))
+    RUN_CACHE_FORCE_REFRESH = os.getenv("RUN_CACHE_FORCE_REFRESH", "false").lower() == "true"
+    # Structured event log: records kept in state, and the directory of full per-run JSONL logs ("" = state only)
+    EVENT_LOG_CAPACITY = int(os.getenv("EVENT_LOG_CAPACITY", "50"))
+    EVENT_LOG_DIR = os.getenv("EVENT_LOG_DIR", "")
+    # Structured outputs: "json_schema", "json_object", "prompt" or "auto" (json_schema where the model supports it)
+    STRUCTURED_OUTPUT_MODE = os.getenv("STRUCTURED_OUTPUT_MODE", "auto")
+    # Pooled keep-alive HTTP transport shared by all OpenAI clients of a process (HTTP/2 needs the h2 package)
+    HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "20"))
+    HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "10"))
+    HTTP_KEEPALIVE_SECONDS = float(os.getenv("HTTP_KEEPALIVE_SECONDS", "60"))
+    HTTP2 = os.getenv("HTTP2", "true").lower() == "true"
+    HTTP_TIMEOUT_SECONDS = float(os.getenv("HTTP_TIMEOUT_SECONDS", "600"))
+    # Pool of OpenAI-compatible endpoints/keys: JSON list or path to a JSON file ("" = OPENAI_API_KEY only)
+    LLM_ENDPOINTS = os.getenv("LLM_ENDPOINTS", "")
+    # Endpoint choice: "ewma" (latency-weighted) or "least_outstanding"
+    LLM_ENDPOINT_POLICY = os.getenv("LLM_ENDPOINT_POLICY", "ewma")
+    # Consecutive failures before an endpoint is ejected, and the first ejection's length
+    LLM_ENDPOINT_EJECT_AFTER = int(os.getenv("LLM_ENDPOINT_EJECT_AFTER", "3"))
+    LLM_ENDPOINT_EJECT_SECONDS = float(os.getenv("LLM_ENDPOINT_EJECT_SECONDS", "30"))
+    
+    # Trace spans of runs, nodes, LLM calls and file I/O in OTLP/JSON: "none", "file" or "otlp" (HTTP collector)
+    TRACE_EXPORTER = os.getenv("TRACE_EXPORTER", "none")
+    TRACE_FILE = os.getenv("TRACE_FILE", "traces/traces.otlp.jsonl")
+    TRACE_OTLP_ENDPOINT = os.getenv("TRACE_OTLP_ENDPOINT", "http://127.0.0.1:4318/v1/traces")
+    TRACE_EXPORT_TIMEOUT_SECONDS = float(os.getenv("TRACE_EXPORT_TIMEOUT_SECONDS", "2"))
+    # Fraction of runs traced, and the most spans kept per run
+    TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "1.0"))
+    TRACE_MAX_SPANS = int(os.getenv("TRACE_MAX_SPANS", "1000"))
     
     @classmethod
     def validate(cls):
-        if not cls.OPENAI_API_KEY:
-            raise ValueError("OPENAI_API_KEY not found in environment variables")
+        if not cls.OPENAI_API_KEY and not cls.LLM_ENDPOINTS:
+            raise ValueError("OPENAI_API_KEY not found in environment variables (nor LLM_ENDPOINTS)")
         return True
 
 settings = Settings()
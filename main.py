@@ -7,7 +7,32 @@ from agents.medical_agent import medical_agent
 from agents.financial_agent import financial_agent
 from agents.summary_agent import summary_agent
 from agents.document_agent import document_agent
+from agents.planner import planner_agent, advance_plan, next_planned_step
 from config.settings import settings
+from utils.llm_helper import llm_helper
+from utils.token_budget import create_token_budget
+from utils.visit_ledger import create_visit_ledger, record_visit
+from utils.handoffs import resolve_handoff
+from utils.tracing import run_span, trace_span, annotate_run
+from utils.progress import progress_listener, node_context, emit_progress
+from utils.profiling import profile_node, profiling_summary
+from utils.blob_store import create_blob_store, release_blob_store, materialize_state
+from utils.run_history import record_finished_run
+from utils.similarity_index import find_prior_analysis
+from utils.llm_scheduler import llm_priority
+from utils.deadline import create_deadline, record_deadline_outcome, deadline_stats
+from utils.prefetch import query_prefetcher, apply_prefetch
+from utils.run_cache import load_cached_run, store_run
+from utils.event_log import create_event_log, log_event, close_event_log
+from models.events import EventType, ProgressEvent, LogEvent
+from typing import Dict, Any, Optional, Iterator, AsyncIterator
+import argparse
+import asyncio
+import threading
+import contextvars
+import uuid
+import time
+import queue
 import json
 import os
 from datetime import datetime
@@ -22,14 +47,25 @@ def create_ai_multi_agent_system():
     # Initialize the graph
     workflow = StateGraph(AgentState)
     
+    teams = {
+        "team1": research_agent,
+        "team2": repair_agent,
+        "team3": medical_agent,
+        "team4": financial_agent,
+        "team5": summary_agent,
+        "team6": document_agent
+    }
+    
+    def team_step(team: str, agent):
+        """Run a team, then take or refuse the handoff it proposed"""
+        def run_team(state: AgentState):
+            return resolve_handoff(agent(state), team)
+        return run_team
+    
     # Add all AI-powered agent nodes
-    workflow.add_node("supervisor", supervisor_agent)
-    workflow.add_node("team1", research_agent)
-    workflow.add_node("team2", repair_agent)
-    workflow.add_node("team3", medical_agent)
-    workflow.add_node("team4", financial_agent)
-    workflow.add_node("team5", summary_agent)
-    workflow.add_node("team6", document_agent)
+    workflow.add_node("supervisor", instrument_node("supervisor", supervisor_agent))
+    for team, agent in teams.items():
+        workflow.add_node(team, instrument_node(team, team_step(team, agent)))
     
     # Define AI-powered routing
     def route_to_agent(state: AgentState):
@@ -53,27 +89,79 @@ def create_ai_multi_agent_system():
         }
     )
     
-    # All teams return to AI supervisor
-    for team in ["team1", "team2", "team3", "team4", "team5", "team6"]:
-        workflow.add_edge(team, "supervisor")
+    # Teams return to the AI supervisor unless they handed off directly
+    def route_from_team(state: AgentState):
+        next_agent = state.get("next_agent")
+        return next_agent if next_agent in teams else "supervisor"
+    
+    team_paths = {team: team for team in teams}
+    team_paths["supervisor"] = "supervisor"
+    for team in teams:
+        workflow.add_conditional_edges(team, route_from_team, team_paths)
     
     workflow.set_entry_point("supervisor")
     
     return workflow.compile()
 
-def run_ai_multi_agent_system(query: str):
-    """Execute AI-powered multi-agent system"""
+def create_planned_multi_agent_system():
+    """Create multi-agent system that follows a plan made once, step by step"""
     
-    print(f"\n🤖 Starting AI-Powered Multi-Agent System")
-    print(f"🔑 Using OpenAI Model: {settings.OPENAI_MODEL}")
-    print(f"📝 Query: {query}")
-    print("=" * 70)
+    settings.validate()
+    print(f"✅ OpenAI configured with model: {settings.OPENAI_MODEL}")
+    
+    workflow = StateGraph(AgentState)
+    
+    teams = {
+        "team1": research_agent,
+        "team2": repair_agent,
+        "team3": medical_agent,
+        "team4": financial_agent,
+        "team5": summary_agent,
+        "team6": document_agent
+    }
+    
+    def plan_step(team: str, agent):
+        """Run a team as a plan step and move the plan cursor on"""
+        def run_step(state: AgentState):
+            record_visit(state, team)
+            state = agent(state)
+            advance_plan(state)
+            return state
+        return run_step
+    
+    workflow.add_node("planner", instrument_node("planner", planner_agent))
+    for team, agent in teams.items():
+        workflow.add_node(team, instrument_node(team, plan_step(team, agent)))
     
-    app = create_ai_multi_agent_system()
+    # Direct edges between plan steps - no supervisor hops
+    path_map = {team: team for team in teams}
+    path_map["planner"] = "planner"
+    path_map["end"] = END
     
-    # Initialize state with AI capabilities
-    initial_state = {
-        "messages": [f"AI System initialized with query: {query}"],
+    for node in ["planner"] + list(teams):
+        workflow.add_conditional_edges(node, next_planned_step, path_map)
+    
+    workflow.set_entry_point("planner")
+    
+    return workflow.compile()
+
+def instrument_node(name: str, agent):
+    """Wrap a graph node so progress consumers see it start"""
+    if settings.PROFILE_NODES:
+        agent = profile_node(name, agent)
+    
+    def run_node(state: AgentState):
+        with node_context(name), trace_span(f"node {name}", "node", **{"node.name": name}) as span:
+            state = agent(state)
+            span.set_attribute("node.next_agent", state.get("next_agent"))
+            return state
+    return run_node
+
+def build_initial_state(query: str, token_budget: Optional[int] = None, deadline: Optional[float] = None) -> AgentState:
+    """Initial state for a new run"""
+    state = {
+        "run_id": uuid.uuid4().hex,
+        "event_log": create_event_log(),
         "current_task": "ai_initialization",
         "query": query,
         "query_analysis": {},
@@ -90,12 +178,153 @@ def run_ai_multi_agent_system(query: str):
         "iteration_count": 0,
         "max_iterations": 15,
         "llm_responses": {},
-        "confidence_scores": {}
+        "confidence_scores": {},
+        "token_budget": create_token_budget(cap=token_budget),
+        "visit_ledger": create_visit_ledger(),
+        "execution_plan": {},
+        "prior_analysis": {},
+        "deadline": create_deadline(deadline),
+        "prefetched": {},
+        "cache_hit": False
     }
+    log_event(state, LogEvent.RUN_INITIALIZED, {"query": query}, node="system")
+    return state
+
+def stream_ai_multi_agent_system(query: str, token_budget: Optional[int] = None, mode: Optional[str] = None, stream_tokens: bool = True,
+                                 priority: Optional[str] = None, tenant: Optional[str] = None, deadline: Optional[float] = None,
+                                 prefetched: Optional[Dict[str, Any]] = None) -> Iterator[ProgressEvent]:
+    """Execute the multi-agent system, yielding progress events as they happen
+    
+    The last event is RUN_FINISHED or RUN_FAILED. RUN_FINISHED carries the
+    final state in data["final_state"], with large texts as blob references,
+    and the run's blob table in data["blobs"] (see materialize_state).
+    
+    LLM calls are scheduled under the given priority class; runs share
+    capacity fairly per tenant (default: one tenant per run). deadline is
+    the run's time limit in seconds (default: RUN_DEADLINE_SECONDS).
+    prefetched results (see QueryPrefetcher) replace the matching LLM calls.
+    """
+    mode = mode or settings.ORCHESTRATION_MODE
+    priority = priority or settings.LLM_DEFAULT_PRIORITY
+    events = queue.Queue()
+    done = object()
+    
+    initial_state = build_initial_state(query, token_budget, deadline)
+    blob_store = create_blob_store(initial_state["run_id"])
+    apply_prefetch(initial_state, prefetched)
+    initial_state["prior_analysis"] = find_prior_analysis(initial_state)
+    if initial_state["prior_analysis"]:
+        prior = initial_state["prior_analysis"]
+        print(f"♻️ Similar prior run found ({prior['similarity']:.0%} match): {prior['query']}")
+    
+    def execute():
+        with progress_listener(events.put, stream_tokens=stream_tokens), llm_priority(priority, tenant or initial_state["run_id"]), \
+                run_span(**{"run.mode": mode}) as span:
+            annotate_run(**{"run.id": initial_state["run_id"], "run.query": query})
+            try:
+                emit_progress(EventType.RUN_STARTED, query=query, mode=mode)
+                
+                if mode == "planned":
+                    app = create_planned_multi_agent_system()
+                else:
+                    app = create_ai_multi_agent_system()
+                
+                final_state = None
+                for stream_mode, chunk in app.stream(initial_state, stream_mode=["updates", "values"]):
+                    if stream_mode == "updates":
+                        for node, update in chunk.items():
+                            emit_progress(EventType.NODE_FINISHED, node=node, updated=list(update or {}))
+                    else:
+                        final_state = chunk
+                
+                if final_state:
+                    span.set_attributes({
+                        "run.iterations": final_state.get("iteration_count", 0),
+                        "run.tokens": final_state.get("token_budget", {}).get("spent", 0),
+                        "run.supervisor_hops_avoided": final_state.get("visit_ledger", {}).get("supervisor_hops_avoided", 0)
+                    })
+                emit_progress(EventType.RUN_FINISHED, final_state=final_state, blobs=blob_store.export())
+            except Exception as e:
+                span.set_attribute("error", str(e))
+                emit_progress(EventType.RUN_FAILED, error=str(e))
+            finally:
+                release_blob_store(initial_state["run_id"])
+                close_event_log(initial_state["run_id"])
+                events.put(done)
+    
+    # The worker carries on the caller's trace, if any
+    worker = threading.Thread(target=contextvars.copy_context().run, args=(execute,), daemon=True)
+    worker.start()
+    
+    while True:
+        event = events.get()
+        if event is done:
+            break
+        yield event
+    
+    worker.join()
+
+async def astream_ai_multi_agent_system(query: str, token_budget: Optional[int] = None, mode: Optional[str] = None, stream_tokens: bool = True,
+                                        priority: Optional[str] = None, tenant: Optional[str] = None, deadline: Optional[float] = None,
+                                        prefetched: Optional[Dict[str, Any]] = None) -> AsyncIterator[ProgressEvent]:
+    """Async version of stream_ai_multi_agent_system"""
+    loop = asyncio.get_running_loop()
+    events = stream_ai_multi_agent_system(query, token_budget, mode, stream_tokens, priority, tenant, deadline, prefetched)
+    
+    while True:
+        event = await loop.run_in_executor(None, next, events, None)
+        if event is None:
+            break
+        yield event
+
+def run_ai_multi_agent_system(query: str, token_budget: Optional[int] = None, mode: Optional[str] = None,
+                              priority: Optional[str] = None, tenant: Optional[str] = None, deadline: Optional[float] = None,
+                              prefetched: Optional[Dict[str, Any]] = None, force_refresh: Optional[bool] = None):
+    """Execute AI-powered multi-agent system
+    
+    An earlier run of the same normalized query under the same settings is
+    returned from the run cache (with cache_hit set) unless force_refresh.
+    The run, including the report and results dump, is one trace.
+    """
+    with run_span(**{"run.query": query, "run.mode": mode or settings.ORCHESTRATION_MODE}):
+        return execute_and_report(query, token_budget, mode, priority, tenant, deadline, prefetched, force_refresh)
+
+def execute_and_report(query: str, token_budget: Optional[int], mode: Optional[str], priority: Optional[str],
+                       tenant: Optional[str], deadline: Optional[float], prefetched: Optional[Dict[str, Any]],
+                       force_refresh: Optional[bool]):
+    """Run the system (or answer from the run cache) and print the report"""
+    
+    print(f"\n🤖 Starting AI-Powered Multi-Agent System")
+    print(f"🔑 Using OpenAI Model: {settings.OPENAI_MODEL}")
+    print(f"📝 Query: {query}")
+    print("=" * 70)
+    
+    force_refresh = settings.RUN_CACHE_FORCE_REFRESH if force_refresh is None else force_refresh
+    if settings.RUN_CACHE_DB and not force_refresh:
+        cached = load_cached_run(query, token_budget, mode)
+        if cached is not None:
+            print(f"⚡ Cache hit: returning the cached result of run {cached['run_id']} (use --refresh to rerun)")
+            annotate_run(**{"run.cache_hit": True, "run.cached_run_id": cached["run_id"]})
+            if cached.get("summary"):
+                print("\n🤖 AI-GENERATED COMPREHENSIVE ANALYSIS:")
+                print("-" * 50)
+                print(cached["summary"])
+            return cached
+    
+    started = time.perf_counter()
+    final_state = None
+    blobs = {}
+    for event in stream_ai_multi_agent_system(query, token_budget, mode, stream_tokens=False,
+                                              priority=priority, tenant=tenant, deadline=deadline, prefetched=prefetched):
+        if event.type == EventType.RUN_FINISHED:
+            final_state = event.data["final_state"]
+            blobs = event.data["blobs"]
+        elif event.type == EventType.RUN_FAILED:
+            print(f"❌ Error during AI execution: {event.data['error']}")
+            return None
+    latency_s = time.perf_counter() - started
     
     try:
-        final_state = app.invoke(initial_state)
-        
         print("\n" + "=" * 70)
         print("🎉 AI Multi-Agent System Execution Complete!")
         print("=" * 70)
@@ -104,7 +333,7 @@ def run_ai_multi_agent_system(query: str):
         if final_state.get("summary"):
             print("\n🤖 AI-GENERATED COMPREHENSIVE ANALYSIS:")
             print("-" * 50)
-            print(final_state["summary"])
+            print(materialize_state(final_state["summary"], blobs))
         
         print(f"\n📈 EXECUTION STATISTICS:")
         print(f"• AI Model Used: {settings.OPENAI_MODEL}")
@@ -112,14 +341,103 @@ def run_ai_multi_agent_system(query: str):
         print(f"• AI agents involved: {len(final_state.get('llm_responses', {}))}")
         print(f"• Documents generated: {len(final_state.get('documents', []))}")
         
+        budget = final_state.get("token_budget", {})
+        if budget:
+            print(f"• Tokens used: {budget.get('spent', 0)}/{budget.get('total', 0)} ({budget.get('complexity', 'medium')} complexity budget)")
+            if budget.get("exhausted"):
+                print("• Token budget exhausted - run wrapped up early")
+        
+        plan = final_state.get("execution_plan", {})
+        if plan:
+            print(f"• Execution plan: {' → '.join(plan.get('steps', []))} ({plan.get('mode')} planner, {plan.get('replans', 0)} replans)")
+        
+        ledger = final_state.get("visit_ledger", {})
+        if ledger.get("blocked"):
+            print(f"• Redundant routes refused: {len(ledger['blocked'])}")
+            print(f"• Iterations avoided: {ledger.get('iterations_avoided', 0)}")
+            print(f"• LLM calls avoided: {ledger.get('llm_calls_avoided', 0)}")
+        if ledger.get("supervisor_hops_avoided"):
+            print(f"• Supervisor hops avoided by direct handoffs: {ledger['supervisor_hops_avoided']}")
+        
+        prior = final_state.get("prior_analysis", {})
+        if prior:
+            print(f"• Prior run reused: {prior['run_id']} ({prior['similarity']:.0%} match) - reused {prior['reused'] or 'none'}, context for {prior['injected'] or 'none'}")
+        
+        coalescing = llm_helper.coalescing_stats()
+        if coalescing["coalesced"]:
+            print(f"• LLM requests coalesced: {coalescing['coalesced']}/{coalescing['calls']} (process total)")
+        
+        run_deadline = final_state.get("deadline", {})
+        hit = record_deadline_outcome(final_state, latency_s)
+        if hit is not None:
+            outcomes = deadline_stats()
+            print(f"• Deadline: {'hit' if hit else 'missed'} ({latency_s:.1f}s of {run_deadline['seconds']:.0f}s) - {outcomes['hit']}/{outcomes['runs']} runs on time (process total)")
+            if run_deadline["skipped"]:
+                print(f"• Skipped for time: {', '.join(skip['team'] for skip in run_deadline['skipped'])}")
+            if run_deadline["degraded_calls"]:
+                print(f"• Degraded LLM calls: {run_deadline['degraded_calls']} ({run_deadline['fast_model_calls']} on {settings.OPENAI_FAST_MODEL or settings.OPENAI_MODEL})")
+            if run_deadline["wrap_up_forced"]:
+                print("• Deadline forced an early wrap-up")
+        
+        scheduling = llm_helper.scheduler_stats()
+        for priority_class, waits in scheduling["classes"].items():
+            if waits["admitted"]:
+                print(f"• LLM queue wait ({priority_class}): avg {waits['wait_avg_s']:.2f}s, p95 {waits['wait_p95_s']:.2f}s over {waits['admitted']} calls (process total)")
+        
+        concurrency = llm_helper.concurrency_stats()
+        if concurrency["adaptive"] and (concurrency["increases"] or concurrency["decreases"]):
+            print(f"• LLM concurrency limit: {concurrency['limit']} ({concurrency['increases']} increases, {concurrency['decreases']} cuts: "
+                  f"{concurrency['rate_limit']} rate limit, {concurrency['timeout']} timeout, {concurrency['latency']} latency) (process total)")
+        
+        transport = llm_helper.transport_stats()
+        if transport["requests"]:
+            print(f"• HTTP connections: {transport['connections_opened']} opened for {transport['requests']} requests "
+                  f"({transport['reuse_rate']:.0%} reused, {'HTTP/2' if transport['http2'] else 'HTTP/1.1'}), "
+                  f"avg handshake {transport['tcp_connect_avg_ms'] + transport['tls_handshake_avg_ms']:.0f} ms (process total)")
+        
+        endpoints = llm_helper.endpoint_stats()
+        if len(endpoints) > 1:
+            for name, endpoint in endpoints.items():
+                print(f"• Endpoint {name}: {endpoint['requests']} requests, {endpoint['failures']} failures, "
+                      f"EWMA {endpoint['ewma_ms']:.0f} ms, {endpoint['status']} (process total)")
+        
+        for site, cache in llm_helper.prompt_cache_stats().items():
+            if cache["cached_tokens"]:
+                print(f"• Prompt cache ({site}): {cache['cached_ratio']:.0%} of prompt tokens cached over {cache['calls']} calls, "
+                      f"~{cache['latency_saved_s']:.1f}s saved (process total)")
+        
+        for name, outputs in llm_helper.structured_stats().items():
+            if outputs["failures"]:
+                print(f"• Invalid structured outputs ({name}): {outputs['failures']}/{outputs['calls']} (process total)")
+        
+        if settings.PROFILE_NODES:
+            print(f"• Node profiles written to: {profiling_summary()['output_dir']}")
+        
+        print(f"• Run time: {latency_s:.1f}s")
+        
+        event_log = final_state.get("event_log", {})
+        if settings.EVENT_LOG_DIR:
+            print(f"• Event log: {event_log.get('next_seq', 0)} events in {os.path.join(settings.EVENT_LOG_DIR, final_state['run_id'] + '.jsonl')}")
+        
         # Save AI results
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"ai_multi_agent_results_{timestamp}.json"
+        if settings.SAVE_RESULTS_JSON:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            filename = f"ai_multi_agent_results_{timestamp}.json"
+            
+            # Interned texts are written once in the blob table
+            with trace_span("results_dump", "io", **{"io.path": filename}), open(filename, 'w') as f:
+                json.dump({**final_state, "timestamp": datetime.now().isoformat(), "blobs": blobs}, f, indent=2, default=str)
+            
+            print(f"\n💾 AI Results saved to: {filename}")
+        
+        final_state = materialize_state(final_state, blobs)
+        if settings.RUN_HISTORY_DB:
+            record_finished_run(final_state, latency_s)
+            print(f"🗄️ Run recorded in history: {settings.RUN_HISTORY_DB} (run {final_state['run_id']})")
         
-        with open(filename, 'w') as f:
-            json.dump(final_state, f, indent=2, default=str)
+        if settings.RUN_CACHE_DB and store_run(query, final_state, token_budget, mode):
+            print(f"⚡ Run cached in: {settings.RUN_CACHE_DB}")
         
-        print(f"\n💾 AI Results saved to: {filename}")
         return final_state
         
     except Exception as e:
@@ -180,10 +498,14 @@ def get_user_query():
                 print("❌ Query too short. Please provide more details.")
                 continue
             
+            # Start analyzing while the user answers the remaining prompts
+            query_prefetcher.start(query)
+            
             # Validate query
             if validate_query(query):
                 return query
             else:
+                query_prefetcher.cancel()
                 print("❌ Query validation failed. Please try again.")
                 continue
         
@@ -195,11 +517,13 @@ def get_user_query():
                 if 0 <= suggestion_choice < len(suggestions):
                     selected_query = suggestions[suggestion_choice]
                     print(f"\n✅ Selected: {selected_query}")
+                    query_prefetcher.start(selected_query)
                     
                     confirm = input("\nUse this query? (y/n): ").strip().lower()
                     if confirm in ['y', 'yes']:
                         return selected_query
                     else:
+                        query_prefetcher.cancel()
                         continue
                 else:
                     print("❌ Invalid selection. Please try again.")
@@ -350,8 +674,11 @@ def main():
             confirm = input("Proceed with analysis? (y/n): ").strip().lower()
             
             if confirm in ['y', 'yes']:
-                # Run the analysis
-                result = run_ai_multi_agent_system(user_query)
+                # Run the analysis, reusing whatever was prefetched meanwhile
+                prefetched = query_prefetcher.take(user_query)
+                if prefetched:
+                    print(f"⚡ Query analysis prefetched in {prefetched['elapsed_s']:.1f}s while waiting for confirmation")
+                result = run_ai_multi_agent_system(user_query, prefetched=prefetched)
                 
                 if result:
                     print("\n🎉 Analysis completed successfully!")
@@ -363,6 +690,7 @@ def main():
                 else:
                     print("\n❌ Analysis failed. Please try again.")
             else:
+                query_prefetcher.cancel()
                 print("Analysis cancelled.")
         
         except KeyboardInterrupt:
@@ -375,5 +703,18 @@ def main():
     print("\n👋 Thank you for using the AI Multi-Agent Analysis System!")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="AI-powered multi-agent analysis system")
+    parser.add_argument("--profile", action="store_true", help="profile every graph node with cProfile and tracemalloc")
+    parser.add_argument("--deadline", type=float, help="per-run deadline in seconds")
+    parser.add_argument("--refresh", action="store_true", help="ignore cached results and rerun every query")
+    args = parser.parse_args()
+    
+    if args.profile:
+        settings.PROFILE_NODES = True
+    if args.deadline is not None:
+        settings.RUN_DEADLINE_SECONDS = args.deadline
+    if args.refresh:
+        settings.RUN_CACHE_FORCE_REFRESH = True
+    
     main()
 
@@ -0,0 +1,28 @@
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Dict, Any, Optional
+import time
+
+class EventType(str, Enum):
+    RUN_STARTED = "run_started"
+    NODE_STARTED = "node_started"
+    NODE_FINISHED = "node_finished"
+    ROUTING_DECISION = "routing_decision"
+    TOKEN = "token"
+    DOCUMENT_SAVED = "document_saved"
+    RUN_FINISHED = "run_finished"
+    RUN_FAILED = "run_failed"
+
+@dataclass
+class ProgressEvent:
+    type: EventType
+    node: Optional[str] = None
+    data: Dict[str, Any] = field(default_factory=dict)
+    timestamp: float = field(default_factory=time.time)
+
+class LogEvent(str, Enum):
+    RUN_INITIALIZED = "run_initialized"
+    AGENT_COMPLETED = "agent_completed"
+    ROUTING_DECISION = "routing_decision"
+    PLAN_CREATED = "plan_created"
+    PLAN_REVISED = "plan_revised"
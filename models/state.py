@@ -2,7 +2,8 @@ from typing import TypedDict, List, Dict, Any, Optional
 from datetime import datetime
 
 class AgentState(TypedDict):
-    messages: List[str]
+    run_id: str
+    event_log: Dict[str, Any]
     current_task: str
     query: str
     query_analysis: Dict[str, Any]
@@ -20,3 +21,10 @@ class AgentState(TypedDict):
     max_iterations: int
     llm_responses: Dict[str, str]
     confidence_scores: Dict[str, float]
+    token_budget: Dict[str, Any]
+    visit_ledger: Dict[str, Any]
+    execution_plan: Dict[str, Any]
+    prior_analysis: Dict[str, Any]
+    deadline: Dict[str, Any]
+    prefetched: Dict[str, Any]
+    cache_hit: bool
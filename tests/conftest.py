@@ -0,0 +1,24 @@
+import os
+import sys
+
+import pytest
+
+# Tests import the project modules from the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+@pytest.fixture
+def offline_llm(tmp_path, monkeypatch):
+    """Every LLM call answered by an OfflineChat, run files written under tmp_path"""
+    from config.settings import settings
+    from utils.llm_helper import llm_helper
+    from benchmarks.offline_llm import install_offline_llm
+
+    monkeypatch.chdir(tmp_path)
+    for name, value in [("INCREMENTAL_DOCUMENTS", False), ("RUN_HISTORY_DB", ""), ("RUN_CACHE_DB", ""),
+                        ("EVENT_LOG_DIR", ""), ("TRACE_EXPORTER", "none"),
+                        ("STRUCTURED_OUTPUT_MODE", settings.STRUCTURED_OUTPUT_MODE),
+                        ("OPENAI_FAST_MODEL", settings.OPENAI_FAST_MODEL)]:
+        monkeypatch.setattr(settings, name, value)
+    monkeypatch.setattr(llm_helper, "endpoints", llm_helper.endpoints)
+    return install_offline_llm(sentences=3)
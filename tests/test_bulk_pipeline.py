@@ -0,0 +1,46 @@
+from datetime import datetime
+import glob
+import os
+
+import pytest
+
+from utils.batch_backend import BatchBackend, LocalBatchBackend
+import agents.document_agent as document_agent
+import bulk_pipeline
+
+QUERIES = ["AI in medical diagnostics", "Electric vehicle market outlook", "Remote work productivity"]
+
+class FrozenDatetime(datetime):
+    """Every run finishes its document stage in the same second"""
+
+    @classmethod
+    def now(cls, tz=None):
+        return cls(2025, 7, 13, 10, 36, 42)
+
+@pytest.fixture
+def offline(offline_llm, monkeypatch):
+    monkeypatch.setattr(document_agent, "datetime", FrozenDatetime)
+
+def test_bulk_runs_keep_their_own_documents(offline, tmp_path):
+    outcomes = bulk_pipeline.run_bulk_pipeline(QUERIES, backend=LocalBatchBackend(batch_dir=str(tmp_path / "batches")))
+
+    assert [outcome["error"] for outcome in outcomes] == [None, None, None]
+    output_dirs = sorted(glob.glob("analysis_output_*"))
+    assert len(output_dirs) == len(QUERIES)
+
+    for outcome in outcomes:
+        output_dir, = [path for path in output_dirs if path.endswith(outcome["run_id"])]
+        with open(os.path.join(output_dir, "index.md"), encoding="utf-8") as f:
+            assert f"**Query:** {outcome['query']}" in f.read()
+        saved = [name for name in os.listdir(output_dir) if name != "index.md"]
+        assert len(saved) == len(outcome["final_state"]["documents"])
+
+def test_stage_replays_print_once_per_run(offline, tmp_path, capsys):
+    bulk_pipeline.run_bulk_pipeline(QUERIES, backend=LocalBatchBackend(batch_dir=str(tmp_path / "batches")))
+
+    output = capsys.readouterr().out
+    assert output.count("📄 Document Agent: AI-powered document processing in progress...") == len(QUERIES)
+
+def test_batch_backend_requires_run():
+    with pytest.raises(TypeError):
+        BatchBackend()
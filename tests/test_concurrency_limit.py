@@ -0,0 +1,72 @@
+import time
+
+from utils.llm_scheduler import LLMScheduler
+from utils.concurrency_limit import AIMDLimiter, FixedLimiter, overload_reason, LATENCY_WARMUP_SAMPLES
+
+def limiter(initial=4, minimum=1, maximum=16):
+    scheduler = LLMScheduler(max_in_flight=initial)
+    return AIMDLimiter(scheduler, initial, minimum, maximum, backoff=0.5, tolerance=2.0), scheduler
+
+def saturate(scheduler, limit):
+    scheduler._in_flight = limit
+
+def test_limit_grows_by_one_per_round_while_it_binds():
+    aimd, scheduler = limiter(initial=4)
+    for calls in range(1, 6):
+        saturate(scheduler, int(aimd.limit))
+        aimd.on_success(time.perf_counter(), 1.0, 100)
+        if calls < 5:
+            assert scheduler.max_in_flight == 4
+    assert scheduler.max_in_flight == 5
+    assert aimd.stats()["increases"] == 1
+
+def test_limit_holds_when_not_fully_used():
+    aimd, scheduler = limiter(initial=4)
+    saturate(scheduler, 2)
+    for _ in range(20):
+        aimd.on_success(time.perf_counter(), 1.0, 100)
+    assert scheduler.max_in_flight == 4
+
+def test_timeout_cuts_once_per_overload_episode():
+    aimd, scheduler = limiter(initial=8)
+    started = time.perf_counter()
+    aimd.on_error(started, TimeoutError())
+    # Calls started before the cut were part of the same episode
+    aimd.on_error(started, TimeoutError())
+    assert scheduler.max_in_flight == 4
+
+    aimd.on_error(time.perf_counter(), TimeoutError())
+    assert scheduler.max_in_flight == 2
+    assert (aimd.stats()["decreases"], aimd.stats()["timeout"]) == (2, 2)
+
+def test_limit_never_drops_below_minimum():
+    aimd, scheduler = limiter(initial=4, minimum=3)
+    for _ in range(3):
+        aimd.on_error(time.perf_counter(), TimeoutError())
+    assert scheduler.max_in_flight == 3
+
+def test_unrelated_errors_leave_the_limit():
+    aimd, scheduler = limiter(initial=4)
+    aimd.on_error(time.perf_counter(), ValueError("bad request"))
+    assert overload_reason(ValueError()) is None
+    assert scheduler.max_in_flight == 4
+
+def test_inflated_latency_cuts_after_warmup():
+    aimd, scheduler = limiter(initial=8, maximum=8)
+    saturate(scheduler, 8)
+    for _ in range(LATENCY_WARMUP_SAMPLES):
+        aimd.on_success(time.perf_counter(), 1.0, 100)
+    assert scheduler.max_in_flight == 8
+
+    # A round of slow calls, all started before the first of them cut the limit
+    started = time.perf_counter()
+    for _ in range(10):
+        aimd.on_success(started, 5.0, 100)
+    assert scheduler.max_in_flight == 4
+    assert aimd.stats()["latency"] == 1
+
+def test_fixed_limiter_reports_the_scheduler_limit():
+    scheduler = LLMScheduler(max_in_flight=6)
+    fixed = FixedLimiter(scheduler)
+    fixed.on_error(time.perf_counter(), TimeoutError())
+    assert fixed.stats() == {"adaptive": False, "limit": 6, "in_flight": 0}
@@ -0,0 +1,61 @@
+import time
+
+import pytest
+
+from config.settings import settings
+from utils.deadline import create_deadline, deadline_pressure, skip_for_deadline, degrade_call, record_deadline_outcome
+
+@pytest.fixture(autouse=True)
+def wrap_up_window(monkeypatch):
+    monkeypatch.setattr(settings, "DEADLINE_WRAP_UP_SECONDS", 30.0)
+
+def state_with(seconds: float, elapsed: float):
+    deadline = create_deadline(seconds)
+    deadline["deadline_at"] = time.time() + seconds - elapsed
+    return {"deadline": deadline, "results": {}}
+
+@pytest.mark.parametrize("elapsed, pressure", [(0, "none"), (9, "none"), (11, "tight"), (14, "tight"), (16, "critical")])
+def test_short_deadline_scales_wrap_up_window(elapsed, pressure):
+    assert deadline_pressure(state_with(20, elapsed)) == pressure
+
+@pytest.mark.parametrize("elapsed, pressure", [(0, "none"), (29, "none"), (31, "tight"), (44, "tight"), (46, "critical")])
+def test_minute_deadline_is_tight_before_critical(elapsed, pressure):
+    assert deadline_pressure(state_with(60, elapsed)) == pressure
+
+def test_short_deadline_runs_research_at_start():
+    assert not skip_for_deadline(state_with(20, 0), "team1")
+    assert skip_for_deadline(state_with(20, 11), "team2")
+
+def test_long_deadline_keeps_fixed_wrap_up_window():
+    assert deadline_pressure(state_with(300, 265)) == "tight"
+    assert deadline_pressure(state_with(300, 271)) == "critical"
+
+def test_no_deadline_means_no_pressure():
+    assert create_deadline(0) == {}
+    assert deadline_pressure({"deadline": {}}) == "none"
+    assert degrade_call({}, 1200) == (1200, None)
+
+def test_tight_deadline_runs_only_one_specialist():
+    state = state_with(300, 200)
+    assert not skip_for_deadline(state, "team3")
+    state["results"]["medical"] = {"status": "completed"}
+    assert skip_for_deadline(state, "team4")
+
+def test_critical_deadline_keeps_only_wrap_up_stages():
+    state = state_with(300, 290)
+    assert [team for team in ["team1", "team2", "team3", "team5", "team6"] if not skip_for_deadline(state, team)] == ["team5", "team6"]
+
+def test_pressure_shortens_completions_and_picks_fast_model(monkeypatch):
+    monkeypatch.setattr(settings, "OPENAI_FAST_MODEL", "gpt-4o-mini")
+    tight, critical = state_with(300, 200), state_with(300, 290)
+
+    assert degrade_call(tight, 1000) == (600, "gpt-4o-mini")
+    assert degrade_call(critical, 1000) == (400, "gpt-4o-mini")
+    # Never below the minimum completion a call needs
+    assert degrade_call(critical, 200) == (150, "gpt-4o-mini")
+    assert (critical["deadline"]["degraded_calls"], critical["deadline"]["fast_model_calls"]) == (2, 2)
+
+def test_outcome_counts_hits_and_misses():
+    assert record_deadline_outcome({}, 10.0) is None
+    assert record_deadline_outcome(state_with(60, 0), 45.0) is True
+    assert record_deadline_outcome(state_with(60, 0), 75.0) is False
@@ -0,0 +1,18 @@
+import json
+
+from utils.blob_store import create_blob_store, release_blob_store, intern_text, BLOB_PREFIX
+from agents.document_agent import create_technical_export
+
+def test_technical_export_keeps_blob_refs():
+    state = {"run_id": "export-run", "query": "AI in medical diagnostics", "results": {}}
+    create_blob_store(state["run_id"])
+    try:
+        text = "Clinical evidence for diagnostic accuracy. " * 20
+        state["research_data"] = {"ai_research": intern_text(state, text)}
+        export = json.loads(create_technical_export(state)["content"])
+    finally:
+        release_blob_store(state["run_id"])
+
+    assert export["research_data"]["ai_research"].startswith(BLOB_PREFIX)
+    assert "blobs" not in export
+    assert text not in json.dumps(export)
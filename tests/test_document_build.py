@@ -0,0 +1,48 @@
+from utils.document_build import DocumentBuild
+
+def counting(value):
+    calls = []
+    def build():
+        calls.append(1)
+        return value
+    return build, calls
+
+def test_unchanged_inputs_reuse_previous_build(tmp_path):
+    first = DocumentBuild(str(tmp_path))
+    first.llm_output("summary", {"query": "q"}, lambda: "summary text")
+    first.document("main_report", {"query": "q"}, lambda: {"type": "main_report", "content": "report"})
+    first.save(keep={"main_report"})
+
+    second = DocumentBuild(str(tmp_path))
+    generate, generated = counting("new summary")
+    build, built = counting({"type": "main_report", "content": "new report"})
+
+    assert second.llm_output("summary", {"query": "q"}, generate) == "summary text"
+    assert second.document("main_report", {"query": "q"}, build)["content"] == "report"
+    assert generated == [] and built == []
+    assert (second.llm_calls_reused, second.reused, second.changed) == (1, {"main_report"}, set())
+
+def test_changed_inputs_rebuild(tmp_path):
+    first = DocumentBuild(str(tmp_path))
+    first.document("main_report", {"query": "q"}, lambda: {"content": "report"})
+    first.save(keep={"main_report"})
+
+    second = DocumentBuild(str(tmp_path))
+    assert second.document("main_report", {"query": "changed"}, lambda: {"content": "new report"}) == {"content": "new report"}
+    assert second.changed == {"main_report"}
+
+def test_save_drops_documents_no_longer_produced(tmp_path):
+    first = DocumentBuild(str(tmp_path))
+    first.document("main_report", {}, lambda: {"content": "report"})
+    first.document("qa_report", {}, lambda: {"content": "qa"})
+    first.save(keep={"main_report"})
+
+    build, built = counting({"content": "qa again"})
+    DocumentBuild(str(tmp_path)).document("qa_report", {}, build)
+    assert built == [1]
+
+def test_non_incremental_build_writes_no_manifest(tmp_path):
+    build = DocumentBuild(str(tmp_path / "out"), incremental=False)
+    build.document("main_report", {}, lambda: {"content": "report"})
+    build.save(keep={"main_report"})
+    assert not (tmp_path / "out").exists()
@@ -0,0 +1,128 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from config.settings import settings
+from utils.endpoint_pool import EndpointPool, Endpoint, create_endpoint_pool
+
+def endpoint(name: str, **options) -> Endpoint:
+    return Endpoint(name, client_factory=lambda endpoint, model: (endpoint.name, model), **options)
+
+def single_slot_pool() -> EndpointPool:
+    return EndpointPool([endpoint("only", max_in_flight=1)])
+
+@pytest.fixture
+def ejection(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_ENDPOINT_EJECT_AFTER", 2)
+    monkeypatch.setattr(settings, "LLM_ENDPOINT_EJECT_SECONDS", 60.0)
+
+def test_least_outstanding_spreads_calls():
+    pool = EndpointPool([endpoint("a"), endpoint("b")], policy="least_outstanding")
+    first, second = pool.acquire("gpt-4"), pool.acquire("gpt-4")
+    assert {first.name, second.name} == {"a", "b"}
+
+def test_ewma_prefers_the_faster_endpoint():
+    pool = EndpointPool([endpoint("slow"), endpoint("fast")], policy="ewma")
+    for name, latency in [("slow", 2.0), ("fast", 0.2)]:
+        chosen = next(item for item in pool.endpoints if item.name == name)
+        chosen.outstanding += 1
+        pool.release(chosen, latency)
+    assert [pool.acquire("gpt-4").name for _ in range(3)] == ["fast", "fast", "fast"]
+
+def test_model_mapping_limits_and_renames():
+    pool = EndpointPool([endpoint("azure", models={"gpt-4": "gpt4-deployment"}), endpoint("openai")])
+    chosen = pool.acquire("gpt-4o")
+    assert chosen.name == "openai"
+    azure = pool.endpoints[0]
+    assert azure.client("gpt-4") == ("azure", "gpt4-deployment")
+    with pytest.raises(ValueError):
+        pool.acquire("gpt-4o", exclude={"openai"})
+
+def test_rpm_quota_blocks_until_the_window_frees():
+    pool = EndpointPool([endpoint("limited", rpm=2)])
+    held = [pool.acquire("gpt-4"), pool.acquire("gpt-4")]
+    for item in held:
+        pool.release(item, 0.1)
+    assert pool._try_acquire("gpt-4", set()) is None
+
+def test_failing_endpoint_is_ejected_but_never_the_last(ejection):
+    pool = EndpointPool([endpoint("bad"), endpoint("good")])
+    bad, good = pool.endpoints
+    for _ in range(2):
+        bad.outstanding += 1
+        pool.release(bad, None, failed=True)
+    assert pool.stats()["bad"]["status"] == "ejected"
+    acquired = [pool.acquire("gpt-4") for _ in range(3)]
+    assert [item.name for item in acquired] == ["good", "good", "good"]
+    for item in acquired:
+        pool.release(item, 0.1)
+
+    for _ in range(2):
+        good.outstanding += 1
+        pool.release(good, None, failed=True)
+    # Not ejected, only probed one call at a time until it recovers
+    assert pool.stats()["good"]["status"] == "probing"
+    assert pool.acquire("gpt-4") is good
+
+def test_ejected_endpoint_is_probed_one_call_at_a_time(ejection):
+    pool = EndpointPool([endpoint("bad"), endpoint("good")])
+    bad = pool.endpoints[0]
+    for _ in range(2):
+        bad.outstanding += 1
+        pool.release(bad, None, failed=True)
+    bad.ejected_until = time.monotonic() - 1
+
+    assert pool._try_acquire("gpt-4", {"good"}) is bad
+    assert pool._try_acquire("gpt-4", {"good"}) is None
+    pool.release(bad, 0.1)
+    assert pool.stats()["bad"]["status"] == "healthy"
+
+def test_pool_from_endpoint_configs(monkeypatch):
+    monkeypatch.setenv("AZURE_KEY", "secret")
+    pool = create_endpoint_pool([
+        {"name": "azure", "base_url": "https://example.invalid/v1", "api_key_env": "AZURE_KEY", "models": {"gpt-4": "dep"}, "rpm": 60},
+        {"base_url": "https://other.invalid/v1", "api_key": "key-2", "max_in_flight": 4}
+    ])
+    azure, other = pool.endpoints
+    assert (azure.name, azure.api_key, azure.rpm) == ("azure", "secret", 60)
+    assert (other.name, other.api_key, other.max_in_flight) == ("endpoint2", "key-2", 4)
+
+def test_async_acquire_wakes_on_release():
+    pool = single_slot_pool()
+    held = pool.acquire("gpt-4")
+    released_at = []
+
+    def release_later():
+        time.sleep(0.2)
+        released_at.append(time.perf_counter())
+        pool.release(held, 0.1)
+
+    async def acquire():
+        threading.Thread(target=release_later).start()
+        endpoint = await pool.aacquire("gpt-4")
+        return endpoint, time.perf_counter()
+
+    endpoint, acquired_at = asyncio.run(acquire())
+    assert endpoint is held
+    assert acquired_at - released_at[0] < 0.2
+    assert pool._waiters == []
+
+def test_cancelled_async_acquire_leaves_no_waiter():
+    pool = single_slot_pool()
+    held = pool.acquire("gpt-4")
+
+    async def acquire_then_cancel():
+        task = asyncio.ensure_future(pool.aacquire("gpt-4"))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    asyncio.run(acquire_then_cancel())
+    assert pool._waiters == []
+    pool.release(held, 0.1)
+    assert pool.acquire("gpt-4") is held
@@ -0,0 +1,76 @@
+import time
+
+import pytest
+
+from config.settings import settings
+from utils.handoffs import propose_handoff, handoff_refusal, resolve_handoff, received_handoff
+from utils.deadline import create_deadline
+from utils.token_budget import create_token_budget
+from utils.visit_ledger import create_visit_ledger
+
+@pytest.fixture(autouse=True)
+def handoffs_on(monkeypatch):
+    monkeypatch.setattr(settings, "DIRECT_HANDOFFS", True)
+    monkeypatch.setattr(settings, "HANDOFF_MIN_CONFIDENCE", 0.8)
+
+def proposed(confidence=0.9, target="team3"):
+    state = {
+        "query": "AI in medical diagnostics",
+        "results": {"research": {"status": "completed"}},
+        "visit_ledger": create_visit_ledger(),
+        "token_budget": create_token_budget("medium"),
+        "workflow_complete": False
+    }
+    propose_handoff(state, "team1", target, confidence, {"domain": "medical"})
+    return state
+
+def test_confident_handoff_is_taken():
+    assert handoff_refusal(proposed(), "team3") == ""
+
+def test_disabled_handoffs_are_refused(monkeypatch):
+    monkeypatch.setattr(settings, "DIRECT_HANDOFFS", False)
+    assert handoff_refusal(proposed(), "team3") == "disabled"
+
+def test_target_must_match_a_proposed_team():
+    assert handoff_refusal(proposed(), "team4") == "no_handoff"
+    assert handoff_refusal(proposed(target="end"), "end") == "no_handoff"
+
+def test_low_confidence_goes_to_the_supervisor():
+    assert handoff_refusal(proposed(confidence=0.5), "team3") == "low_confidence"
+
+def test_completed_workflow_refuses():
+    state = proposed()
+    state["workflow_complete"] = True
+    assert handoff_refusal(state, "team3") == "workflow_complete"
+
+def test_spent_budget_refuses():
+    state = proposed()
+    state["token_budget"]["spent"] = state["token_budget"]["total"]
+    assert handoff_refusal(state, "team3") == "token_budget_exhausted"
+
+def test_deadline_pressure_refuses():
+    state = proposed()
+    state["deadline"] = create_deadline(60)
+    state["deadline"]["deadline_at"] = time.time() + 20
+    assert handoff_refusal(state, "team3") == "deadline_pressure"
+
+def test_redundant_route_refuses():
+    state = proposed()
+    state["visit_ledger"]["route"] = ["team3", "team1", "team3", "team1"]
+    assert handoff_refusal(state, "team3") == "route_cycle"
+
+def test_accepted_handoff_routes_directly():
+    state = resolve_handoff(proposed(), "team1")
+
+    assert state["next_agent"] == "team3"
+    assert received_handoff(state, "team3") == {"domain": "medical"}
+    ledger = state["visit_ledger"]
+    assert ledger["route"] == ["team3"]
+    assert (ledger["handoffs"], ledger["supervisor_hops_avoided"], ledger["llm_calls_avoided"]) == (1, 1, 1)
+
+def test_refused_handoff_returns_to_the_supervisor():
+    state = resolve_handoff(proposed(confidence=0.5), "team1")
+
+    assert state["next_agent"] == "supervisor"
+    assert received_handoff(state, "team3") == {}
+    assert state["visit_ledger"]["handoffs"] == 0
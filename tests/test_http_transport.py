@@ -0,0 +1,34 @@
+import asyncio
+
+from utils.http_transport import AsyncPooledTransport
+
+def test_async_pool_per_event_loop():
+    transport = AsyncPooledTransport()
+
+    async def pools():
+        return transport._transport(), transport._transport()
+
+    first, again = asyncio.run(pools())
+    second, _ = asyncio.run(pools())
+
+    assert first is again
+    assert second is not first
+
+def test_aclose_closes_only_the_running_loop_pool():
+    transport = AsyncPooledTransport()
+    async def pool():
+        return transport._transport()
+
+    loop = asyncio.new_event_loop()
+    try:
+        kept = loop.run_until_complete(pool())
+
+        async def close_own_pool():
+            transport._transport()
+            await transport.aclose()
+            return len(transport._pools)
+
+        assert asyncio.run(close_own_pool()) == 1
+        assert transport._pools[loop] is kept
+    finally:
+        loop.close()
@@ -0,0 +1,24 @@
+import threading
+
+from utils.llm_helper import llm_helper, StructuredOutputError
+
+def test_structured_stats_count_concurrent_calls():
+    before = llm_helper.structured_stats().get("routing_decision", {"calls": 0, "failures": 0})
+
+    def parse_many():
+        for _ in range(200):
+            llm_helper._parse_structured("routing_decision", '{"next_agent": "end"}')
+            try:
+                llm_helper._parse_structured("routing_decision", "not json")
+            except StructuredOutputError:
+                pass
+
+    threads = [threading.Thread(target=parse_many) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    after = llm_helper.structured_stats()["routing_decision"]
+    assert after["calls"] - before["calls"] == 8 * 400
+    assert after["failures"] - before["failures"] == 8 * 200
@@ -0,0 +1,64 @@
+import threading
+
+import pytest
+
+from utils.llm_scheduler import LLMScheduler, llm_priority, current_priority, current_tenant, parse_tenant_weights
+
+def admission_order(scheduler, calls):
+    """Queue (label, priority, tenant) calls on a full scheduler, then serve them one at a time"""
+    scheduler.set_max_in_flight(0)
+    order, priorities = [], {}
+    for label, priority, tenant in calls:
+        priorities[label] = priority
+        scheduler._enqueue(priority, tenant).add_done_callback(lambda future, label=label: order.append(label))
+    scheduler.set_max_in_flight(1)
+    for served in range(len(calls)):
+        scheduler._release(priorities[order[served]])
+    return order
+
+def test_single_call_tenant_is_not_held_back_by_a_busy_one():
+    calls = [(f"a{n}", "batch", "a") for n in range(1, 5)] + [("b1", "batch", "b")]
+    assert admission_order(LLMScheduler(), calls) == ["a1", "b1", "a2", "a3", "a4"]
+
+def test_tenants_alternate_by_weight():
+    calls = [(f"a{n}", "batch", "a") for n in range(1, 5)] + [(f"b{n}", "batch", "b") for n in range(1, 3)]
+    order = admission_order(LLMScheduler(tenant_weights={"a": 2.0}), calls)
+    assert order == ["a1", "a2", "b1", "a3", "a4", "b2"]
+
+def test_higher_priority_class_is_served_first():
+    calls = [("batch1", "batch", "a"), ("service1", "service", "a"), ("interactive1", "interactive", "b"), ("batch2", "batch", "b")]
+    assert admission_order(LLMScheduler(), calls) == ["interactive1", "service1", "batch1", "batch2"]
+
+def test_returning_tenant_starts_level_after_idle():
+    scheduler = LLMScheduler()
+    admission_order(scheduler, [(f"a{n}", "batch", "a") for n in range(1, 4)])
+    calls = [("a4", "batch", "a"), ("a5", "batch", "a"), ("b1", "batch", "b")]
+    assert admission_order(scheduler, calls) == ["a4", "b1", "a5"]
+
+def test_slot_limits_calls_in_flight():
+    scheduler = LLMScheduler(max_in_flight=2)
+    peak, lock = [0], threading.Lock()
+
+    def call():
+        with scheduler.slot("service", "t"):
+            with lock:
+                peak[0] = max(peak[0], scheduler.in_flight)
+
+    threads = [threading.Thread(target=call) for _ in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert 1 <= peak[0] <= 2 and scheduler.in_flight == 0
+    assert scheduler.stats()["classes"]["service"]["completed"] == 10
+
+def test_priority_context():
+    with llm_priority("batch", "tenant-1"):
+        assert (current_priority(), current_tenant()) == ("batch", "tenant-1")
+    with pytest.raises(ValueError):
+        with llm_priority("urgent"):
+            pass
+
+def test_parse_tenant_weights():
+    assert parse_tenant_weights("a:2, b:0.5,broken") == {"a": 2.0, "b": 0.5}
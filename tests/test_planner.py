@@ -0,0 +1,11 @@
+from agents.planner import build_local_plan, order_stages
+
+def test_local_plan_adds_specialists_for_domain():
+    stages = build_local_plan({"domain": "medical and financial", "suggested_agents": ["research"]})
+    assert stages == [["team1"], ["team3", "team4"], ["team2"], ["team5"], ["team6"]]
+
+def test_local_plan_without_specialists():
+    assert build_local_plan({"domain": "general", "suggested_agents": "summary"}) == [["team1"], ["team2"], ["team5"], ["team6"]]
+
+def test_order_stages_follows_stage_order():
+    assert order_stages({"team6", "team4", "team1"}) == [["team1"], ["team4"], ["team6"]]
@@ -0,0 +1,56 @@
+import asyncio
+
+import pytest
+
+from config.settings import settings
+from utils.llm_helper import llm_helper
+from utils.prefetch import QueryPrefetcher, apply_prefetch, take_prefetched
+from utils.token_budget import create_token_budget
+
+QUERY = "AI in medical diagnostics"
+
+@pytest.fixture
+def prefetching(offline_llm, monkeypatch):
+    monkeypatch.setattr(settings, "PREFETCH_ANALYSIS", True)
+    monkeypatch.setattr(settings, "PREFETCH_RESEARCH", True)
+
+def test_confirmed_query_gets_prefetched_results(prefetching):
+    prefetcher = QueryPrefetcher()
+    prefetcher.start(QUERY)
+    prefetched = prefetcher.take(QUERY)
+
+    assert prefetched["query"] == QUERY
+    assert prefetched["query_analysis"]["intent"] == "analysis"
+    assert prefetched["research"]["text"]
+    assert prefetcher.stats()["used"] == 1
+
+def test_declined_query_cancels_the_prefetch(prefetching, monkeypatch):
+    async def slow_analysis(query):
+        await asyncio.sleep(10)
+
+    monkeypatch.setattr(llm_helper, "aanalyze_query", slow_analysis)
+    prefetcher = QueryPrefetcher()
+    prefetcher.start(QUERY)
+
+    assert prefetcher.take("A different query") is None
+    assert prefetcher.stats()["cancelled"] == 1
+
+def test_prefetched_results_seed_the_run_once():
+    prefetched = {
+        "query": QUERY,
+        "query_analysis": {"complexity": "high"},
+        "analysis_usage": {"prompt_tokens": 100, "completion_tokens": 50},
+        "research": {"text": "Prefetched research.", "usage": {"prompt_tokens": 200, "completion_tokens": 300}}
+    }
+    state = {"query": QUERY, "results": {}, "token_budget": create_token_budget()}
+    apply_prefetch(state, prefetched)
+
+    assert state["query_analysis"] == {"complexity": "high"}
+    assert state["token_budget"]["spent"] == 150
+    assert take_prefetched(state, "research")["text"] == "Prefetched research."
+    assert take_prefetched(state, "research") is None
+
+def test_prefetch_for_another_query_is_ignored():
+    state = {"query": QUERY, "results": {}}
+    apply_prefetch(state, {"query": "Something else", "query_analysis": {}, "analysis_usage": {}})
+    assert "query_analysis" not in state
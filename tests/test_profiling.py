@@ -0,0 +1,42 @@
+import tracemalloc
+
+import pytest
+
+import utils.profiling as profiling
+
+@pytest.fixture
+def profile_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "_output_dir", str(tmp_path))
+    reported = []
+    monkeypatch.setattr(profiling, "_write_node_profile",
+                        lambda name, profiler, before, after, peak, elapsed: reported.append(peak))
+    return reported
+
+def allocating_node(state):
+    block = bytearray(2 * 1024 * 1024)
+    del block
+    return state
+
+def test_peak_excludes_memory_traced_before_the_node(profile_dir):
+    tracemalloc.start()
+    try:
+        held = bytearray(8 * 1024 * 1024)
+        profiling.profile_node("allocating", allocating_node)({})
+        del held
+    finally:
+        tracemalloc.stop()
+
+    peak, = profile_dir
+    assert 2 * 1024 * 1024 <= peak < 4 * 1024 * 1024
+
+def test_tracing_stops_when_profiling_started_it(profile_dir):
+    assert not tracemalloc.is_tracing()
+    profiling.profile_node("allocating", allocating_node)({})
+    assert not tracemalloc.is_tracing()
+
+    tracemalloc.start()
+    try:
+        profiling.profile_node("allocating", allocating_node)({})
+        assert tracemalloc.is_tracing()
+    finally:
+        tracemalloc.stop()
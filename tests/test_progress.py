@@ -0,0 +1,32 @@
+from models.events import EventType
+from utils.progress import progress_listener, node_context, emit_progress, current_node, wants_tokens
+import main
+
+def test_events_go_to_the_listener_with_the_current_node():
+    events = []
+    with progress_listener(events.append, stream_tokens=False):
+        assert not wants_tokens()
+        with node_context("team1"):
+            assert current_node() == "team1"
+            emit_progress(EventType.DOCUMENT_SAVED, path="report.md")
+    emit_progress(EventType.DOCUMENT_SAVED, path="ignored.md")
+
+    assert [(event.type, event.node) for event in events] == [
+        (EventType.NODE_STARTED, "team1"),
+        (EventType.DOCUMENT_SAVED, "team1")
+    ]
+    assert events[1].data == {"path": "report.md"}
+    assert current_node() is None
+
+def test_stream_starts_and_finishes_with_run_events(offline_llm):
+    events = list(main.stream_ai_multi_agent_system("AI in medical diagnostics", stream_tokens=False))
+    types = [event.type for event in events]
+
+    assert types[0] == EventType.RUN_STARTED
+    assert types[-1] == EventType.RUN_FINISHED
+    assert EventType.TOKEN not in types
+    started = [event.node for event in events if event.type == EventType.NODE_STARTED]
+    finished = [event.node for event in events if event.type == EventType.NODE_FINISHED]
+    assert started[0] == "supervisor" and "team6" in started
+    assert sorted(set(started)) == sorted(set(finished))
+    assert events[-1].data["final_state"]["workflow_complete"]
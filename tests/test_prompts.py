@@ -0,0 +1,40 @@
+import pytest
+
+from utils.prompts import PROMPTS, PromptTemplate, PromptCacheStats, render_prompt, prompt_site
+
+@pytest.mark.parametrize("name", sorted(PROMPTS))
+def test_variables_come_after_the_static_prefix(name):
+    template = PROMPTS[name]
+    first_label = template.variables[0][1]
+    static = f"{template.instructions}\n\n{first_label}:\n" if template.instructions else f"{first_label}:\n"
+
+    for value in ["first run", "a different run"]:
+        system, user = template.render(**{key: value for key, _ in template.variables})
+        assert system == template.system
+        assert user.startswith(static + value)
+
+def test_render_prompt_fills_variables_in_order():
+    system, user = render_prompt("planner", query="AI in medical diagnostics", query_analysis={"domain": "medical"})
+    assert system == PROMPTS["planner"].system
+    assert user == "Query:\nAI in medical diagnostics\n\nQuery analysis:\n{'domain': 'medical'}"
+
+def test_repeated_variable_is_rejected():
+    with pytest.raises(ValueError):
+        PromptTemplate("broken", "System.", variables=[("query", "Query"), ("query", "Query again")])
+
+def test_prompt_site_matches_system_prompt_with_schema_appended():
+    system, _ = render_prompt("routing_decision", state="{}")
+    assert prompt_site(system + "\n\nRespond with only a JSON object") == "routing_decision"
+    assert prompt_site("You are something else entirely.") == "other"
+
+def test_cache_stats_estimate_latency_saved():
+    stats = PromptCacheStats()
+    system, _ = render_prompt("research", query="q", query_analysis={})
+    stats.record(system, 1000, 0, 2.0)
+    stats.record(system, 1000, 800, 1.5)
+    stats.record(system, 1000, 800, 1.5)
+
+    report = stats.stats()["research"]
+    assert report["calls"] == 3
+    assert report["cached_ratio"] == 1600 / 3000
+    assert report["latency_saved_s"] == 1.0
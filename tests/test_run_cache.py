@@ -0,0 +1,34 @@
+import json
+
+import pytest
+
+from config.settings import settings
+from utils.run_cache import settings_fingerprint
+
+def endpoints(api_key: str, deployment: str) -> str:
+    return json.dumps([{"name": "azure", "base_url": "https://example.invalid/v1", "api_key": api_key,
+                        "models": {"gpt-4": deployment}}])
+
+@pytest.fixture(autouse=True)
+def base_settings(monkeypatch):
+    monkeypatch.setattr(settings, "OPENAI_FAST_MODEL", "")
+    monkeypatch.setattr(settings, "STRUCTURED_OUTPUT_MODE", "json_schema")
+    monkeypatch.setattr(settings, "LLM_ENDPOINTS", "")
+
+@pytest.mark.parametrize("name, value", [
+    ("OPENAI_FAST_MODEL", "gpt-4o-mini"),
+    ("STRUCTURED_OUTPUT_MODE", "prompt"),
+    ("LLM_ENDPOINTS", endpoints("key-1", "gpt-4-deployment"))
+])
+def test_fingerprint_covers_model_settings(monkeypatch, name, value):
+    before = settings_fingerprint()
+    monkeypatch.setattr(settings, name, value)
+    assert settings_fingerprint() != before
+
+def test_fingerprint_ignores_endpoint_keys(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_ENDPOINTS", endpoints("key-1", "gpt-4-deployment"))
+    first = settings_fingerprint()
+    monkeypatch.setattr(settings, "LLM_ENDPOINTS", endpoints("key-2", "gpt-4-deployment"))
+    assert settings_fingerprint() == first
+    monkeypatch.setattr(settings, "LLM_ENDPOINTS", endpoints("key-2", "gpt-4o-deployment"))
+    assert settings_fingerprint() != first
@@ -0,0 +1,37 @@
+from datetime import datetime
+import json
+import os
+
+import pytest
+
+from utils.run_history import RunHistory, import_result_files
+
+def write_results(path, **fields):
+    final_state = {"run_id": os.path.basename(str(path)), "query": "AI in medical diagnostics",
+                   "llm_responses": {}, "summary": "", "blobs": {}, **fields}
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(final_state, f)
+    return str(path)
+
+@pytest.fixture
+def history(tmp_path):
+    history = RunHistory(str(tmp_path / "history.db"))
+    yield history
+    history.close()
+
+def created_at(history, run_id):
+    return history._conn.execute("SELECT created_at FROM runs WHERE run_id = ?", (run_id,)).fetchone()[0]
+
+def test_import_keeps_result_timestamp(history, tmp_path):
+    finished = datetime(2025, 7, 13, 10, 36, 42)
+    path = write_results(tmp_path / "stamped.json", timestamp=finished.isoformat())
+
+    assert import_result_files(history, [path]) == 1
+    assert created_at(history, "stamped.json") == finished.timestamp()
+
+def test_import_falls_back_to_file_mtime(history, tmp_path):
+    path = write_results(tmp_path / "unstamped.json")
+    os.utime(path, (1_700_000_000, 1_700_000_000))
+
+    import_result_files(history, [path])
+    assert created_at(history, "unstamped.json") == 1_700_000_000
@@ -0,0 +1,44 @@
+from utils.similarity_index import use_prior_output
+
+def prior_state():
+    prior = {
+        "run_id": "prior-run",
+        "query": "AI in medical diagnostics",
+        "similarity": 0.93,
+        "age_hours": 5.0,
+        "modes": {"research": "reuse", "medical": "context"},
+        "texts": {"research": "Prior research.", "medical": "Prior medical analysis."},
+        "reused": [],
+        "injected": []
+    }
+    return {"prior_analysis": prior}, prior
+
+def test_reuse_returns_prior_text_and_records_agent():
+    state, prior = prior_state()
+    mode, text, prompt = use_prior_output(state, "research", "Analyze.")
+
+    assert (mode, text, prompt) == ("reuse", "Prior research.", "Analyze.")
+    assert state["prior_analysis"]["reused"] == ["research"]
+    assert prior["reused"] == []
+
+def test_context_extends_prompt():
+    state, _ = prior_state()
+    mode, _, prompt = use_prior_output(state, "medical", "Analyze.")
+
+    assert mode == "context"
+    assert prompt.startswith("Analyze.") and "Prior medical analysis." in prompt
+    assert state["prior_analysis"]["injected"] == ["medical"]
+
+def test_rerun_records_agent_once():
+    state, _ = prior_state()
+    use_prior_output(state, "research", "Analyze.")
+    recorded = state["prior_analysis"]["reused"]
+    use_prior_output(state, "research", "Analyze.")
+
+    assert state["prior_analysis"]["reused"] == ["research"]
+    assert recorded == ["research"]
+
+def test_agent_without_prior_output():
+    state, _ = prior_state()
+    assert use_prior_output(state, "financial", "Analyze.") == (None, "", "Analyze.")
+    assert use_prior_output({}, "research", "Analyze.") == (None, "", "Analyze.")
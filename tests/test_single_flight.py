@@ -0,0 +1,78 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from utils.single_flight import SingleFlight
+
+def test_cancelled_leader_does_not_fail_follower():
+    flight = SingleFlight()
+    calls = []
+
+    async def call():
+        calls.append(len(calls))
+        if len(calls) == 1:
+            await asyncio.sleep(10)
+        return "fresh"
+
+    async def scenario():
+        leader = asyncio.ensure_future(flight.ado("key", call))
+        await asyncio.sleep(0.01)
+        follower = asyncio.ensure_future(flight.ado("key", call))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert asyncio.run(scenario()) == ("fresh", False)
+    assert len(calls) == 2
+    assert flight.stats()["in_flight"] == 0
+
+def test_cancelled_follower_leaves_leader_result_intact():
+    flight = SingleFlight()
+
+    async def call():
+        await asyncio.sleep(0.05)
+        return "answer"
+
+    async def scenario():
+        leader = asyncio.ensure_future(flight.ado("key", call))
+        await asyncio.sleep(0.01)
+        follower = asyncio.ensure_future(flight.ado("key", call))
+        await asyncio.sleep(0.01)
+        follower.cancel()
+        return await leader
+
+    assert asyncio.run(scenario()) == ("answer", False)
+
+def test_follower_shares_leader_error():
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    errors = []
+
+    def failing():
+        started.set()
+        release.wait()
+        raise ValueError("provider error")
+
+    def follow():
+        try:
+            flight.do("key", failing)
+        except ValueError as e:
+            errors.append(e)
+
+    leader = threading.Thread(target=follow)
+    leader.start()
+    started.wait()
+    follower = threading.Thread(target=follow)
+    follower.start()
+    while flight.stats()["coalesced"] == 0:
+        time.sleep(0.001)
+    release.set()
+    leader.join()
+    follower.join()
+
+    assert len(errors) == 2 and errors[0] is errors[1]
@@ -0,0 +1,54 @@
+import pytest
+
+from config.settings import settings
+from utils.token_budget import (
+    fit_prompt, create_token_budget, ensure_token_budget, allocate_tokens, record_token_usage,
+    budget_exhausted, MIN_PROMPT_TOKENS, MIN_COMPLETION_TOKENS, CHARS_PER_TOKEN
+)
+
+LONG_PROMPT = "evidence " * 5000
+
+def test_prompt_within_allocation_is_unchanged():
+    assert fit_prompt("short prompt", 100) == "short prompt"
+
+def test_prompt_is_trimmed_to_allocation():
+    trimmed = fit_prompt(LONG_PROMPT, 1000)
+    assert trimmed.startswith(LONG_PROMPT[:1000 * CHARS_PER_TOKEN])
+    assert len(trimmed) < 1100 * CHARS_PER_TOKEN
+
+@pytest.mark.parametrize("prompt_tokens", [0, -500, 10])
+def test_exhausted_allocation_trims_to_minimum(prompt_tokens):
+    trimmed = fit_prompt(LONG_PROMPT, prompt_tokens)
+    assert trimmed.startswith(LONG_PROMPT[:MIN_PROMPT_TOKENS * CHARS_PER_TOKEN])
+    assert len(trimmed) < (MIN_PROMPT_TOKENS + 50) * CHARS_PER_TOKEN
+
+@pytest.fixture
+def max_tokens(monkeypatch):
+    monkeypatch.setattr(settings, "MAX_TOKENS", 2000)
+    monkeypatch.setattr(settings, "RUN_TOKEN_BUDGET", 0)
+
+def test_cap_limits_complexity_budget(max_tokens):
+    assert create_token_budget("high")["total"] == 50000
+    assert create_token_budget("high", cap=20000)["total"] == 20000
+
+def test_budget_reseeds_once_analysis_is_known(max_tokens):
+    state = {"token_budget": create_token_budget()}
+    state["query_analysis"] = {"complexity": "high"}
+    assert ensure_token_budget(state)["total"] == 50000
+
+def test_fresh_budget_keeps_wrap_up_reserve(max_tokens):
+    state = {"token_budget": create_token_budget("medium"), "results": {}}
+    assert allocate_tokens(state, "research") == {"max_tokens": 1500, "prompt_tokens": 30000 - 8000 - 1500}
+
+def test_depleted_budget_leaves_only_wrap_up_stages(max_tokens):
+    state = {"token_budget": create_token_budget("medium"), "results": {}}
+    record_token_usage(state, "research", 20000, 2000)
+
+    assert budget_exhausted(state) and state["token_budget"]["exhausted"]
+    assert allocate_tokens(state, "medical") == {"max_tokens": MIN_COMPLETION_TOKENS, "prompt_tokens": 0}
+    assert allocate_tokens(state, "summary") == {"max_tokens": 400, "prompt_tokens": 7600}
+
+def test_finished_wrap_up_stage_releases_its_reserve(max_tokens):
+    state = {"token_budget": create_token_budget("medium"), "results": {"summary": {}}}
+    record_token_usage(state, "research", 20000, 2000)
+    assert not budget_exhausted(state)
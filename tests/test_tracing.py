@@ -0,0 +1,91 @@
+import json
+
+import pytest
+
+from config.settings import settings
+from utils.tracing import run_span, trace_span, traced, annotate_run, NO_SPAN
+from benchmarks.trace_collector import request_spans, format_trace
+
+@pytest.fixture
+def trace_file(tmp_path, monkeypatch):
+    path = tmp_path / "traces" / "traces.otlp.jsonl"
+    monkeypatch.setattr(settings, "TRACE_EXPORTER", "file")
+    monkeypatch.setattr(settings, "TRACE_FILE", str(path))
+    monkeypatch.setattr(settings, "TRACE_SAMPLE_RATE", 1.0)
+    return path
+
+def exported(path):
+    return [request_spans(json.loads(line)) for line in path.read_text(encoding="utf-8").splitlines()]
+
+@traced("load_cache")
+def load_cache():
+    return "cached"
+
+def test_untraced_runs_record_nothing(trace_file, monkeypatch):
+    monkeypatch.setattr(settings, "TRACE_EXPORTER", "none")
+    with run_span(query="q") as root:
+        with trace_span("team1", "node") as span:
+            assert root is NO_SPAN and span is NO_SPAN
+
+    assert not trace_file.exists()
+
+def test_unsampled_runs_record_nothing(trace_file, monkeypatch):
+    monkeypatch.setattr(settings, "TRACE_SAMPLE_RATE", 0.0)
+    with run_span(query="q") as root:
+        assert root is NO_SPAN
+
+    assert not trace_file.exists()
+
+def test_file_export_keeps_the_span_tree(trace_file):
+    with run_span(**{"run.id": "r1"}):
+        with run_span():
+            with trace_span("team1", "node", **{"node.next_agent": "team3"}):
+                assert load_cache() == "cached"
+        annotate_run(**{"run.tokens": 42})
+
+    [spans] = exported(trace_file)
+    by_name = {span["name"]: span for span in spans}
+    assert set(by_name) == {"run", "graph", "team1", "load_cache"}
+    assert len({span["traceId"] for span in spans}) == 1
+    assert "parentSpanId" not in by_name["run"]
+    assert by_name["graph"]["parentSpanId"] == by_name["run"]["spanId"]
+    assert by_name["team1"]["parentSpanId"] == by_name["graph"]["spanId"]
+    assert by_name["load_cache"]["parentSpanId"] == by_name["team1"]["spanId"]
+    assert by_name["run"]["attributes"]["run.tokens"] == 42
+
+    lines = format_trace(spans)
+    assert [line.split()[0] for line in lines] == ["run", "graph", "team1", "load_cache"]
+    assert lines[2].startswith("    team1") and "node.next_agent=team3" in lines[2]
+
+def test_failed_span_carries_the_error(trace_file):
+    with pytest.raises(RuntimeError):
+        with run_span():
+            with trace_span("fetch", "io"):
+                raise RuntimeError("timed out")
+
+    [spans] = exported(trace_file)
+    statuses = {span["name"]: span["status"] for span in spans}
+    assert statuses["fetch"] == {"code": 2, "message": "RuntimeError: timed out"}
+    assert statuses["run"]["code"] == 2
+    assert any("❌ RuntimeError: timed out" in line for line in format_trace(spans))
+
+def test_spans_over_the_cap_are_dropped(trace_file, monkeypatch):
+    monkeypatch.setattr(settings, "TRACE_MAX_SPANS", 3)
+    with run_span():
+        for index in range(5):
+            with trace_span(f"step{index}") as span:
+                assert (span is NO_SPAN) == (index >= 2)
+
+    [spans] = exported(trace_file)
+    assert len(spans) == 3
+    root = next(span for span in spans if span["name"] == "run")
+    assert root["attributes"]["trace.dropped_spans"] == 3
+
+def test_export_failure_does_not_fail_the_run(trace_file, monkeypatch, capsys):
+    monkeypatch.setattr(settings, "TRACE_EXPORTER", "zipkin")
+    with run_span():
+        with trace_span("team1", "node"):
+            pass
+
+    assert "Trace export failed" in capsys.readouterr().out
+    assert not trace_file.exists()
@@ -0,0 +1,43 @@
+from utils.visit_ledger import check_route, record_visit, record_blocked, create_visit_ledger
+
+def run_state(route=()):
+    state = {"query": "AI in medical diagnostics", "results": {}, "visit_ledger": create_visit_ledger()}
+    for team in route:
+        state["visit_ledger"]["route"].append(team)
+    return state
+
+def test_first_visit_is_allowed():
+    assert check_route(run_state(), "team1") is None
+
+def test_rerun_with_unchanged_inputs_is_redundant():
+    state = run_state()
+    record_visit(state, "team1")
+    state["results"]["research"] = {"status": "completed"}
+    assert check_route(state, "team1") == "inputs_unchanged"
+
+def test_rerun_after_inputs_changed_is_allowed():
+    state = run_state()
+    record_visit(state, "team3")
+    state["results"]["medical"] = {"status": "completed"}
+    state["research_data"] = {"ai_research": "New research findings."}
+    assert check_route(state, "team3") is None
+
+def test_repeated_stretch_is_a_cycle():
+    assert check_route(run_state(["team3", "team2", "team3"]), "team2") == "route_cycle"
+    assert check_route(run_state(["team3", "team4", "team2", "team3", "team4"]), "team2") == "route_cycle"
+
+def test_route_without_repetition_is_not_a_cycle():
+    assert check_route(run_state(["team1", "team3", "team2"]), "team3") is None
+    # Cycles longer than MAX_CYCLE_LENGTH are not looked for
+    route = ["team1", "team2", "team3", "team4", "team5"] * 2
+    assert check_route(run_state(route[:-1]), "team5") is None
+
+def test_unknown_team_is_never_redundant():
+    assert check_route(run_state(["supervisor", "supervisor"]), "end") is None
+
+def test_blocked_route_counts_saved_calls():
+    state = run_state()
+    record_blocked(state, "team6", "route_cycle")
+    ledger = state["visit_ledger"]
+    assert ledger["blocked"][0]["reason"] == "route_cycle"
+    assert (ledger["iterations_avoided"], ledger["llm_calls_avoided"]) == (1, 4)
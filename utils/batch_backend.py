@@ -0,0 +1,164 @@
+from concurrent.futures import ThreadPoolExecutor
+from abc import ABC, abstractmethod
+from typing import Dict, Any, List, Optional, Callable
+from config.settings import settings
+from utils.token_budget import estimate_tokens
+import json
+import time
+import os
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+
+def batch_line(request: Dict[str, Any]) -> Dict[str, Any]:
+    """One line of a chat-completions batch input file"""
+    body = {
+        "model": request["model"],
+        "messages": [
+            {"role": "system", "content": request["system_prompt"]},
+            {"role": "user", "content": request["user_prompt"]}
+        ],
+        "max_tokens": request["max_tokens"],
+        "temperature": settings.TEMPERATURE
+    }
+    if request.get("response_format"):
+        body["response_format"] = request["response_format"]
+    return {
+        "custom_id": request["custom_id"],
+        "method": "POST",
+        "url": BATCH_ENDPOINT,
+        "body": body
+    }
+
+def parse_result_line(line: Dict[str, Any]) -> Dict[str, Any]:
+    """{"content", "usage"} or {"error"} from one line of a batch output file"""
+    response = line.get("response") or {}
+    if line.get("error") or response.get("status_code", 200) >= 400:
+        error = line.get("error") or response.get("body", {}).get("error") or "request failed"
+        return {"error": str(error.get("message", error) if isinstance(error, dict) else error)}
+
+    body = response.get("body", {})
+    usage = body.get("usage", {})
+    return {
+        "content": body["choices"][0]["message"]["content"],
+        "usage": {
+            "prompt_tokens": usage.get("prompt_tokens", 0),
+            "completion_tokens": usage.get("completion_tokens", 0)
+        }
+    }
+
+class BatchBackend(ABC):
+    """Runs a list of LLM requests as one batch
+
+    Requests carry custom_id, model, system_prompt, user_prompt and
+    max_tokens (and optionally response_format); run returns results by
+    custom_id.
+    """
+
+    def __init__(self, batch_dir: Optional[str] = None):
+        self.batch_dir = batch_dir or settings.BATCH_DIR
+
+    def write_batch_file(self, name: str, requests: List[Dict[str, Any]]) -> str:
+        """Write the batch input file (JSONL) and return its path"""
+        os.makedirs(self.batch_dir, exist_ok=True)
+        path = os.path.join(self.batch_dir, f"{name}.jsonl")
+        with open(path, 'w', encoding='utf-8') as f:
+            for request in requests:
+                f.write(json.dumps(batch_line(request)) + "\n")
+        return path
+
+    @abstractmethod
+    def run(self, name: str, requests: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """Results ({"content", "usage"} or {"error"}) by custom_id"""
+
+class OpenAIBatchBackend(BatchBackend):
+    """Submits batches to the OpenAI Batch API and waits for them to finish"""
+
+    def __init__(self, batch_dir: Optional[str] = None, poll_seconds: Optional[float] = None):
+        super().__init__(batch_dir)
+        from openai import OpenAI
+        from utils.http_transport import shared_http_client
+        settings.validate()
+        self.client = OpenAI(api_key=settings.OPENAI_API_KEY, http_client=shared_http_client())
+        self.poll_seconds = poll_seconds or settings.BATCH_POLL_SECONDS
+
+    def run(self, name: str, requests: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        path = self.write_batch_file(name, requests)
+        with open(path, 'rb') as f:
+            input_file = self.client.files.create(file=f, purpose="batch")
+        batch = self.client.batches.create(
+            input_file_id=input_file.id,
+            endpoint=BATCH_ENDPOINT,
+            completion_window="24h",
+            metadata={"stage": name}
+        )
+        print(f"📦 Batch {batch.id}: {len(requests)} requests submitted ({name})")
+
+        while batch.status not in ["completed", "failed", "expired", "cancelled"]:
+            time.sleep(self.poll_seconds)
+            batch = self.client.batches.retrieve(batch.id)
+        print(f"📦 Batch {batch.id}: {batch.status}")
+
+        results = {}
+        for file_id in [batch.output_file_id, batch.error_file_id]:
+            if file_id:
+                for line in self.client.files.content(file_id).text.splitlines():
+                    if line.strip():
+                        entry = json.loads(line)
+                        results[entry["custom_id"]] = parse_result_line(entry)
+
+        # Requests a failed or expired batch never answered
+        for request in requests:
+            results.setdefault(request["custom_id"], {"error": f"batch {batch.status} without a result"})
+        return results
+
+class LocalBatchBackend(BatchBackend):
+    """Stand-in backend that answers a batch file locally
+
+    The batch file is written and read back exactly as for the OpenAI
+    backend; each line is then answered by complete(system_prompt,
+    user_prompt, max_tokens, model), which defaults to regular LLM calls
+    at batch priority.
+    """
+
+    def __init__(self, batch_dir: Optional[str] = None, complete: Optional[Callable[..., str]] = None, workers: Optional[int] = None):
+        super().__init__(batch_dir)
+        self.complete = complete
+        self.workers = workers or settings.BATCH_LOCAL_WORKERS
+
+    def run(self, name: str, requests: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        path = self.write_batch_file(name, requests)
+        with open(path, 'r', encoding='utf-8') as f:
+            lines = [json.loads(line) for line in f if line.strip()]
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            results = dict(zip([line["custom_id"] for line in lines], pool.map(self._answer, lines)))
+        print(f"📦 Local batch {name}: {len(results)} requests answered")
+        return results
+
+    def _answer(self, line: Dict[str, Any]) -> Dict[str, Any]:
+        body = line["body"]
+        system_prompt = body["messages"][0]["content"]
+        user_prompt = body["messages"][1]["content"]
+        try:
+            if self.complete is not None:
+                content = self.complete(system_prompt, user_prompt, body["max_tokens"], body["model"])
+                usage = {"prompt_tokens": estimate_tokens(system_prompt + user_prompt), "completion_tokens": estimate_tokens(content)}
+            else:
+                from utils.llm_helper import llm_helper
+                from utils.llm_scheduler import llm_priority
+                with llm_priority("batch", "bulk"):
+                    content = llm_helper.generate_response(system_prompt, user_prompt, body["max_tokens"], body["model"],
+                                                           body.get("response_format"))
+                usage = llm_helper.last_usage
+        except Exception as e:
+            return {"error": str(e)}
+        return {"content": content, "usage": usage}
+
+def create_batch_backend(name: Optional[str] = None) -> BatchBackend:
+    """Backend by name: "openai" or "local" (default: BATCH_BACKEND)"""
+    name = name or settings.BATCH_BACKEND
+    if name == "openai":
+        return OpenAIBatchBackend()
+    if name == "local":
+        return LocalBatchBackend()
+    raise ValueError(f"Unknown batch backend: {name}")
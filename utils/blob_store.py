@@ -0,0 +1,134 @@
+from typing import Dict, Any, Optional
+from config.settings import settings
+import hashlib
+import threading
+import zlib
+
+BLOB_PREFIX = "blob:sha256:"
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+class BlobStore:
+    """Per-run content-addressed store for large LLM texts
+
+    Texts are kept once, optionally compressed, and state holds
+    'blob:sha256:<digest>' references to them.
+    """
+
+    def __init__(self, compression: str = "none"):
+        if compression == "zstd" and zstandard is None:
+            print("⚠️ zstandard is not installed - compressing blobs with zlib instead")
+            compression = "zlib"
+        self.compression = compression
+        self._blobs: Dict[str, bytes] = {}
+        self._lock = threading.Lock()
+        self._stats = {"puts": 0, "deduplicated": 0, "raw_bytes": 0, "stored_bytes": 0}
+
+    def _compress(self, data: bytes) -> bytes:
+        if self.compression == "zstd":
+            return zstandard.ZstdCompressor().compress(data)
+        if self.compression == "zlib":
+            return zlib.compress(data)
+        return data
+
+    def _decompress(self, data: bytes) -> bytes:
+        if self.compression == "zstd":
+            return zstandard.ZstdDecompressor().decompress(data)
+        if self.compression == "zlib":
+            return zlib.decompress(data)
+        return data
+
+    def put(self, text: str) -> str:
+        """Store text and return its reference"""
+        data = text.encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            self._stats["puts"] += 1
+            if digest in self._blobs:
+                self._stats["deduplicated"] += 1
+            else:
+                stored = self._compress(data)
+                self._blobs[digest] = stored
+                self._stats["raw_bytes"] += len(data)
+                self._stats["stored_bytes"] += len(stored)
+        return BLOB_PREFIX + digest
+
+    def get(self, ref: str) -> str:
+        """Text behind a reference"""
+        digest = ref[len(BLOB_PREFIX):]
+        with self._lock:
+            stored = self._blobs[digest]
+        return self._decompress(stored).decode("utf-8")
+
+    def export(self) -> Dict[str, str]:
+        """All texts by digest, for serializing a run once"""
+        with self._lock:
+            digests = list(self._blobs)
+        return {digest: self.get(BLOB_PREFIX + digest) for digest in digests}
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["blobs"] = len(self._blobs)
+        return stats
+
+_stores: Dict[str, BlobStore] = {}
+_stores_lock = threading.Lock()
+
+def create_blob_store(run_id: str) -> BlobStore:
+    """Register the blob store for a run"""
+    store = BlobStore(settings.BLOB_COMPRESSION)
+    with _stores_lock:
+        _stores[run_id] = store
+    return store
+
+def get_blob_store(run_id: Optional[str]) -> Optional[BlobStore]:
+    with _stores_lock:
+        return _stores.get(run_id)
+
+def release_blob_store(run_id: str) -> Optional[BlobStore]:
+    """Drop a finished run's store"""
+    with _stores_lock:
+        return _stores.pop(run_id, None)
+
+def is_blob_ref(value: Any) -> bool:
+    return isinstance(value, str) and value.startswith(BLOB_PREFIX)
+
+def intern_text(state: Dict[str, Any], text: str) -> str:
+    """Reference to text in the run's store (text itself when interning is off or it is small)"""
+    if not settings.INTERN_LLM_TEXTS or not isinstance(text, str) or len(text) < settings.BLOB_MIN_CHARS:
+        return text
+    store = get_blob_store(state.get("run_id"))
+    if store is None:
+        return text
+    return store.put(text)
+
+def resolve_text(state: Dict[str, Any], value: Any) -> Any:
+    """Text behind a reference; any other value unchanged"""
+    if not is_blob_ref(value):
+        return value
+    store = get_blob_store(state.get("run_id"))
+    if store is None:
+        raise KeyError(f"No blob store registered for run {state.get('run_id')}")
+    return store.get(value)
+
+def resolve_refs(state: Dict[str, Any], value: Any) -> Any:
+    """Copy of a nested value with every reference replaced by its text"""
+    if isinstance(value, dict):
+        return {key: resolve_refs(state, item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [resolve_refs(state, item) for item in value]
+    return resolve_text(state, value)
+
+def materialize_state(value: Any, blobs: Dict[str, str]) -> Any:
+    """Resolve references against an exported blob table, after the run's store is gone"""
+    if isinstance(value, dict):
+        return {key: materialize_state(item, blobs) for key, item in value.items()}
+    if isinstance(value, list):
+        return [materialize_state(item, blobs) for item in value]
+    if is_blob_ref(value):
+        return blobs[value[len(BLOB_PREFIX):]]
+    return value
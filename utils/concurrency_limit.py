@@ -0,0 +1,156 @@
+from typing import Dict, Any, Optional
+from collections import deque
+from config.settings import settings
+from utils.llm_scheduler import LLMScheduler, llm_scheduler
+import threading
+import time
+
+# Smoothing of the current latency, and the upward drift of the baseline
+LATENCY_ALPHA = 0.2
+BASELINE_DRIFT = 0.01
+# Latency samples needed before inflation can cut the limit
+LATENCY_WARMUP_SAMPLES = 10
+# Limit changes kept for the gauge
+HISTORY_SIZE = 200
+
+# Errors that mean the provider is overloaded
+try:
+    from openai import RateLimitError, APITimeoutError
+    RATE_LIMIT_ERRORS = (RateLimitError,)
+    TIMEOUT_ERRORS = (APITimeoutError, TimeoutError)
+except ImportError:
+    RATE_LIMIT_ERRORS = ()
+    TIMEOUT_ERRORS = (TimeoutError,)
+
+def overload_reason(error: BaseException) -> Optional[str]:
+    """"rate_limit", "timeout", or None for errors that say nothing about load"""
+    if RATE_LIMIT_ERRORS and isinstance(error, RATE_LIMIT_ERRORS):
+        return "rate_limit"
+    if isinstance(error, TIMEOUT_ERRORS):
+        return "timeout"
+    return None
+
+class AIMDLimiter:
+    """Sets the scheduler's in-flight limit by additive increase, multiplicative decrease
+
+    Each successful call adds 1/limit while the limit is fully used and the
+    latency stays within LLM_LATENCY_TOLERANCE of its baseline, so the limit
+    grows by about one per round of calls. A 429, a timeout, or latency
+    inflated while the limit is fully used multiplies it by
+    LLM_CONCURRENCY_BACKOFF. Calls started before
+    the last cut cannot cut again, so one overload episode costs one cut.
+
+    Latency is compared per completion token, so long and short answers
+    give comparable samples.
+    """
+
+    def __init__(self, scheduler: LLMScheduler, initial: int, minimum: int, maximum: int,
+                 backoff: float, tolerance: float):
+        self.scheduler = scheduler
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.backoff = backoff
+        self.tolerance = tolerance
+        self.limit = float(min(max(initial, self.minimum), self.maximum))
+        self._lock = threading.Lock()
+        self._last_cut = 0.0
+        self._samples = 0
+        self._baseline: Optional[float] = None
+        self._current: Optional[float] = None
+        self._stats = {"increases": 0, "decreases": 0, "rate_limit": 0, "timeout": 0, "latency": 0}
+        self._history = deque(maxlen=HISTORY_SIZE)
+        scheduler.set_max_in_flight(int(self.limit))
+
+    def on_success(self, started: float, latency: float, completion_tokens: int):
+        """Record a completed call; started is its time.perf_counter() start"""
+        sample = latency / max(1, completion_tokens)
+        with self._lock:
+            self._samples += 1
+            self._current = sample if self._current is None else LATENCY_ALPHA * sample + (1 - LATENCY_ALPHA) * self._current
+            if self._baseline is None or sample < self._baseline:
+                self._baseline = sample
+            else:
+                self._baseline += BASELINE_DRIFT * (sample - self._baseline)
+
+            # Latency only says something about the limit while the limit binds
+            binding = self.scheduler.in_flight >= int(self.limit)
+            if self._current > self._baseline * self.tolerance:
+                if binding and self._samples >= LATENCY_WARMUP_SAMPLES and started >= self._last_cut:
+                    limit = self._cut("latency")
+                else:
+                    return
+            elif binding and self.limit < self.maximum:
+                before = int(self.limit)
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+                if int(self.limit) == before:
+                    return
+                self._stats["increases"] += 1
+                self._history.append((time.time(), int(self.limit), "increase"))
+                limit = int(self.limit)
+            else:
+                return
+        self.scheduler.set_max_in_flight(limit)
+
+    def on_error(self, started: float, error: BaseException):
+        """Record a failed call; cuts the limit when the error signals overload"""
+        reason = overload_reason(error)
+        if reason is None:
+            return
+        with self._lock:
+            if started < self._last_cut:
+                return
+            limit = self._cut(reason)
+        self.scheduler.set_max_in_flight(limit)
+
+    def _cut(self, reason: str) -> int:
+        self.limit = max(float(self.minimum), self.limit * self.backoff)
+        self._last_cut = time.perf_counter()
+        self._stats["decreases"] += 1
+        self._stats[reason] += 1
+        self._history.append((time.time(), int(self.limit), reason))
+        return int(self.limit)
+
+    def stats(self) -> Dict[str, Any]:
+        """Live gauge: current limit and in-flight calls, with the limit's recent changes"""
+        with self._lock:
+            return {
+                "adaptive": True,
+                "limit": int(self.limit),
+                "in_flight": self.scheduler.in_flight,
+                "min": self.minimum,
+                "max": self.maximum,
+                "baseline_ms_per_token": (self._baseline or 0.0) * 1000,
+                "current_ms_per_token": (self._current or 0.0) * 1000,
+                **self._stats,
+                "history": [{"time": at, "limit": limit, "change": change} for at, limit, change in self._history]
+            }
+
+class FixedLimiter:
+    """The scheduler's fixed LLM_MAX_IN_FLIGHT, when adaptive concurrency is off"""
+
+    def __init__(self, scheduler: LLMScheduler):
+        self.scheduler = scheduler
+
+    def on_success(self, started: float, latency: float, completion_tokens: int):
+        pass
+
+    def on_error(self, started: float, error: BaseException):
+        pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {"adaptive": False, "limit": self.scheduler.max_in_flight, "in_flight": self.scheduler.in_flight}
+
+def create_limiter(scheduler: LLMScheduler = llm_scheduler):
+    if not settings.LLM_ADAPTIVE_CONCURRENCY:
+        return FixedLimiter(scheduler)
+    return AIMDLimiter(
+        scheduler,
+        settings.LLM_MAX_IN_FLIGHT,
+        settings.LLM_MIN_IN_FLIGHT,
+        settings.LLM_MAX_IN_FLIGHT_CEILING,
+        settings.LLM_CONCURRENCY_BACKOFF,
+        settings.LLM_LATENCY_TOLERANCE
+    )
+
+# Global limiter: one limit for every run in the process
+concurrency_limiter = create_limiter()
@@ -0,0 +1,120 @@
+from typing import Dict, Any, Optional, Tuple
+from config.settings import settings
+from utils.token_budget import MIN_COMPLETION_TOKENS
+from utils.visit_ledger import TEAM_RESULT_KEYS
+import threading
+import time
+
+# Below this fraction of the deadline left, optional stages are dropped
+TIGHT_FRACTION = 0.5
+# The wrap-up window never takes more than this fraction of the deadline
+WRAP_UP_FRACTION = 0.25
+
+# Completion token multiplier per pressure level
+PRESSURE_TOKEN_SCALE = {
+    "none": 1.0,
+    "tight": 0.6,
+    "critical": 0.4
+}
+
+# Stages that are never skipped for time
+WRAP_UP_TEAMS = ["team5", "team6"]
+# Dropped as soon as time is tight
+OPTIONAL_TEAMS = ["team2"]
+# Only the first of these runs once time is tight
+SPECIALIST_TEAMS = ["team3", "team4"]
+
+_outcomes_lock = threading.Lock()
+_outcomes = {"runs": 0, "hit": 0, "miss": 0, "overrun_s": 0.0}
+
+def create_deadline(seconds: Optional[float] = None) -> Dict[str, Any]:
+    """Create a per-run deadline (empty when the run has none)"""
+    seconds = settings.RUN_DEADLINE_SECONDS if seconds is None else seconds
+    if not seconds or seconds <= 0:
+        return {}
+
+    now = time.time()
+    return {
+        "seconds": seconds,
+        "started_at": now,
+        "deadline_at": now + seconds,
+        "skipped": [],
+        "degraded_calls": 0,
+        "fast_model_calls": 0,
+        "wrap_up_forced": False
+    }
+
+def remaining_seconds(state: Dict[str, Any]) -> Optional[float]:
+    """Seconds left until the deadline, None without one"""
+    deadline = state.get("deadline") or {}
+    if not deadline:
+        return None
+    return deadline["deadline_at"] - time.time()
+
+def wrap_up_seconds(total: float) -> float:
+    """Time kept for the wrap-up stages, scaled down for short deadlines"""
+    return min(settings.DEADLINE_WRAP_UP_SECONDS, total * WRAP_UP_FRACTION)
+
+def deadline_pressure(state: Dict[str, Any]) -> str:
+    """'none', 'tight' or 'critical' (only time for the wrap-up stages is left)"""
+    remaining = remaining_seconds(state)
+    if remaining is None:
+        return "none"
+    total = state["deadline"]["seconds"]
+    if remaining <= wrap_up_seconds(total):
+        return "critical"
+    if remaining <= total * TIGHT_FRACTION:
+        return "tight"
+    return "none"
+
+def skip_for_deadline(state: Dict[str, Any], team: str) -> bool:
+    """True when a team should not run in the time that is left"""
+    pressure = deadline_pressure(state)
+    if pressure == "none" or team in WRAP_UP_TEAMS:
+        return False
+    if pressure == "critical" or team in OPTIONAL_TEAMS:
+        return True
+    if team in SPECIALIST_TEAMS:
+        results = state.get("results", {})
+        return any(TEAM_RESULT_KEYS[specialist] in results for specialist in SPECIALIST_TEAMS)
+    return False
+
+def record_deadline_skip(state: Dict[str, Any], team: str):
+    state["deadline"]["skipped"].append({"team": team, "remaining_s": round(remaining_seconds(state), 2)})
+
+def degrade_call(state: Dict[str, Any], max_tokens: int) -> Tuple[int, Optional[str]]:
+    """Completion budget and model override for a call under deadline pressure"""
+    pressure = deadline_pressure(state)
+    if pressure == "none":
+        return max_tokens, None
+
+    deadline = state["deadline"]
+    deadline["degraded_calls"] += 1
+    max_tokens = max(min(MIN_COMPLETION_TOKENS, max_tokens), int(max_tokens * PRESSURE_TOKEN_SCALE[pressure]))
+
+    # Switch to the faster model tier when one is configured
+    model = settings.OPENAI_FAST_MODEL or None
+    if model:
+        deadline["fast_model_calls"] += 1
+    return max_tokens, model
+
+def record_deadline_outcome(final_state: Dict[str, Any], latency_s: float) -> Optional[bool]:
+    """Count a finished run as a deadline hit or miss; None when it had no deadline"""
+    deadline = final_state.get("deadline") or {}
+    if not deadline:
+        return None
+
+    hit = latency_s <= deadline["seconds"]
+    with _outcomes_lock:
+        _outcomes["runs"] += 1
+        _outcomes["hit" if hit else "miss"] += 1
+        if not hit:
+            _outcomes["overrun_s"] += latency_s - deadline["seconds"]
+    return hit
+
+def deadline_stats() -> Dict[str, Any]:
+    """Deadline hits and misses of the runs in this process"""
+    with _outcomes_lock:
+        stats = dict(_outcomes)
+    stats["hit_rate"] = stats["hit"] / stats["runs"] if stats["runs"] else 0.0
+    return stats
@@ -0,0 +1,66 @@
+from typing import Dict, Any, Callable, Set
+from utils.hashing import stable_hash
+import json
+import os
+
+MANIFEST_FILE = "build_manifest.json"
+
+class DocumentBuild:
+    """Tracks input hashes of a document build so unchanged outputs are reused"""
+
+    def __init__(self, output_dir: str, incremental: bool = True):
+        self.output_dir = output_dir
+        self.incremental = incremental
+        self.manifest = self._load() if incremental else {}
+        self.manifest.setdefault("llm_outputs", {})
+        self.manifest.setdefault("documents", {})
+        self.changed: Set[str] = set()
+        self.reused: Set[str] = set()
+        self.llm_calls_reused = 0
+
+    def _load(self) -> Dict[str, Any]:
+        path = os.path.join(self.output_dir, MANIFEST_FILE)
+        if not os.path.exists(path):
+            return {}
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Ignoring unreadable build manifest {path}: {e}")
+            return {}
+
+    def llm_output(self, name: str, inputs: Any, generate: Callable[[], str]) -> str:
+        """LLM text for the inputs, reused from the previous build when they match"""
+        input_hash = stable_hash(inputs)
+        entry = self.manifest["llm_outputs"].get(name)
+        if entry and entry["input_hash"] == input_hash:
+            self.llm_calls_reused += 1
+            return entry["text"]
+
+        text = generate()
+        self.manifest["llm_outputs"][name] = {"input_hash": input_hash, "text": text}
+        return text
+
+    def document(self, key: str, inputs: Any, build: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        """Document for the inputs, reused from the previous build when they match"""
+        input_hash = stable_hash(inputs)
+        entry = self.manifest["documents"].get(key)
+        if entry and entry["input_hash"] == input_hash:
+            self.reused.add(key)
+            return entry["document"]
+
+        document = build()
+        self.manifest["documents"][key] = {"input_hash": input_hash, "document": document}
+        self.changed.add(key)
+        return document
+
+    def save(self, keep: Set[str]):
+        """Write the manifest, dropping documents that are no longer produced"""
+        if not self.incremental:
+            return
+        self.manifest["documents"] = {
+            key: entry for key, entry in self.manifest["documents"].items() if key in keep
+        }
+        os.makedirs(self.output_dir, exist_ok=True)
+        with open(os.path.join(self.output_dir, MANIFEST_FILE), 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, indent=2, default=str)
@@ -0,0 +1,266 @@
+from concurrent.futures import Future
+from typing import Dict, Any, List, Optional, Callable, Set
+from collections import deque
+from config.settings import settings
+import threading
+import asyncio
+import time
+import json
+import os
+
+# Smoothing of the per-endpoint latency average
+EWMA_ALPHA = 0.3
+# Ejections back off up to EJECT_SECONDS * 2**MAX_EJECTION_DOUBLINGS
+MAX_EJECTION_DOUBLINGS = 4
+# Requests-per-minute quotas count requests started in this window
+RPM_WINDOW_SECONDS = 60.0
+
+# Errors that say something about the endpoint rather than the request
+try:
+    from openai import APIConnectionError, APITimeoutError, RateLimitError, InternalServerError
+    ENDPOINT_ERRORS = (APIConnectionError, APITimeoutError, RateLimitError, InternalServerError, ConnectionError, TimeoutError)
+except ImportError:
+    ENDPOINT_ERRORS = (ConnectionError, TimeoutError)
+
+class Endpoint:
+    """One OpenAI-compatible endpoint and key, with its model mapping and quota
+
+    models maps requested model names to the names this endpoint serves
+    them under; an empty mapping serves every model unchanged.
+    """
+
+    def __init__(self, name: str, base_url: Optional[str] = None, api_key: Optional[str] = None,
+                 models: Optional[Dict[str, str]] = None, max_in_flight: int = 0, rpm: int = 0,
+                 client_factory: Optional[Callable[["Endpoint", str], Any]] = None):
+        self.name = name
+        self.base_url = base_url
+        self.api_key = api_key
+        self.models = models or {}
+        self.max_in_flight = max_in_flight
+        self.rpm = rpm
+        self._client_factory = client_factory or create_chat_client
+        self._clients: Dict[str, Any] = {}
+
+        self.outstanding = 0
+        self.ewma_latency: Optional[float] = None
+        self.consecutive_failures = 0
+        self.ejections = 0
+        self.ejected_until = 0.0
+        self._started = deque()
+        self._stats = {"requests": 0, "failures": 0, "ejections": 0, "latency_samples": 0, "latency_total": 0.0}
+
+    def serves(self, model: str) -> bool:
+        return not self.models or model in self.models
+
+    def client(self, model: str):
+        """Chat client for a requested model on this endpoint"""
+        if model not in self._clients:
+            self._clients[model] = self._client_factory(self, self.models.get(model, model))
+        return self._clients[model]
+
+    def ejected(self, now: float) -> bool:
+        return self.consecutive_failures >= settings.LLM_ENDPOINT_EJECT_AFTER and now < self.ejected_until
+
+    def probing(self, now: float) -> bool:
+        """Ejection over but not yet recovered: one trial request at a time"""
+        return self.consecutive_failures >= settings.LLM_ENDPOINT_EJECT_AFTER and now >= self.ejected_until
+
+    def has_capacity(self, now: float) -> bool:
+        while self._started and now - self._started[0] > RPM_WINDOW_SECONDS:
+            self._started.popleft()
+        if self.max_in_flight and self.outstanding >= self.max_in_flight:
+            return False
+        if self.rpm and len(self._started) >= self.rpm:
+            return False
+        return not self.probing(now) or self.outstanding == 0
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        samples = self._stats["latency_samples"]
+        return {
+            "base_url": self.base_url or "default",
+            "requests": self._stats["requests"],
+            "failures": self._stats["failures"],
+            "outstanding": self.outstanding,
+            "ewma_ms": (self.ewma_latency or 0.0) * 1000,
+            "avg_ms": self._stats["latency_total"] / samples * 1000 if samples else 0.0,
+            "ejections": self._stats["ejections"],
+            "status": "ejected" if self.ejected(now) else "probing" if self.probing(now) else "healthy"
+        }
+
+def create_chat_client(endpoint: Endpoint, model: str):
+    """ChatOpenAI client for an endpoint, on the process-wide pooled HTTP transport"""
+    from langchain_openai import ChatOpenAI
+    from utils.http_transport import shared_http_client, shared_async_http_client
+    options = {}
+    if endpoint.base_url:
+        options["base_url"] = endpoint.base_url
+    return ChatOpenAI(
+        api_key=endpoint.api_key or settings.OPENAI_API_KEY,
+        model=model,
+        temperature=settings.TEMPERATURE,
+        max_tokens=settings.MAX_TOKENS,
+        http_client=shared_http_client(),
+        http_async_client=shared_async_http_client(),
+        **options
+    )
+
+class EndpointPool:
+    """Routes LLM calls across endpoints by least outstanding requests or EWMA latency
+
+    Endpoints failing LLM_ENDPOINT_EJECT_AFTER times in a row are ejected for
+    LLM_ENDPOINT_EJECT_SECONDS (doubling on repeated ejection), then re-probed
+    with one request at a time. The last healthy endpoint is never ejected.
+    """
+
+    def __init__(self, endpoints: List[Endpoint], policy: Optional[str] = None):
+        if not endpoints:
+            raise ValueError("An endpoint pool needs at least one endpoint")
+        self.endpoints = endpoints
+        self.policy = policy or settings.LLM_ENDPOINT_POLICY
+        if self.policy not in ("least_outstanding", "ewma"):
+            raise ValueError(f"Unknown endpoint policy: {self.policy}")
+        self._available = threading.Condition()
+        # Futures of async acquirers waiting for a release
+        self._waiters: List[Future] = []
+
+    def __len__(self) -> int:
+        return len(self.endpoints)
+
+    def _score(self, endpoint: Endpoint):
+        # Endpoints without latency samples yet are tried first
+        latency = endpoint.ewma_latency or 0.0
+        if self.policy == "least_outstanding":
+            return (endpoint.outstanding, latency)
+        return (latency * (endpoint.outstanding + 1), endpoint.outstanding)
+
+    def _try_acquire(self, model: str, exclude: Set[str]) -> Optional[Endpoint]:
+        now = time.monotonic()
+        candidates = [
+            endpoint for endpoint in self.endpoints
+            if endpoint.name not in exclude and endpoint.serves(model)
+            and not endpoint.ejected(now) and endpoint.has_capacity(now)
+        ]
+        if not candidates:
+            return None
+        endpoint = min(candidates, key=self._score)
+        endpoint.outstanding += 1
+        endpoint._started.append(now)
+        endpoint._stats["requests"] += 1
+        return endpoint
+
+    def serves(self, model: str, exclude: Optional[Set[str]] = None) -> bool:
+        """Whether an endpoint outside exclude serves the model"""
+        return any(endpoint.serves(model) and endpoint.name not in (exclude or set()) for endpoint in self.endpoints)
+
+    def acquire(self, model: str, exclude: Optional[Set[str]] = None) -> Endpoint:
+        """Endpoint for a call, waiting while every candidate is at its quota"""
+        exclude = exclude or set()
+        if not self.serves(model, exclude):
+            raise ValueError(f"No endpoint left that serves model {model}")
+        with self._available:
+            while True:
+                endpoint = self._try_acquire(model, exclude)
+                if endpoint is not None:
+                    return endpoint
+                # Woken by a release; the timeout covers RPM windows and ejections running out
+                self._available.wait(timeout=1.0)
+
+    async def aacquire(self, model: str, exclude: Optional[Set[str]] = None) -> Endpoint:
+        """Async version of acquire"""
+        exclude = exclude or set()
+        if not self.serves(model, exclude):
+            raise ValueError(f"No endpoint left that serves model {model}")
+        while True:
+            with self._available:
+                endpoint = self._try_acquire(model, exclude)
+                if endpoint is not None:
+                    return endpoint
+                waiter = Future()
+                self._waiters.append(waiter)
+            # Woken by a release; the timeout covers RPM windows and ejections running out
+            try:
+                await asyncio.wait_for(asyncio.wrap_future(waiter), timeout=1.0)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                with self._available:
+                    if waiter in self._waiters:
+                        self._waiters.remove(waiter)
+
+    def release(self, endpoint: Endpoint, latency: Optional[float], failed: bool = False):
+        """Record a finished call's latency, or its endpoint-side failure
+        
+        latency None releases a call that failed for reasons of its own.
+        """
+        with self._available:
+            endpoint.outstanding -= 1
+            if failed:
+                endpoint._stats["failures"] += 1
+                endpoint.consecutive_failures += 1
+                if endpoint.consecutive_failures >= settings.LLM_ENDPOINT_EJECT_AFTER and self._can_eject(endpoint):
+                    self._eject(endpoint)
+            elif latency is not None:
+                endpoint._stats["latency_samples"] += 1
+                endpoint._stats["latency_total"] += latency
+                endpoint.ewma_latency = latency if endpoint.ewma_latency is None else (
+                    EWMA_ALPHA * latency + (1 - EWMA_ALPHA) * endpoint.ewma_latency
+                )
+                if endpoint.consecutive_failures >= settings.LLM_ENDPOINT_EJECT_AFTER:
+                    print(f"✅ Endpoint {endpoint.name} recovered")
+                endpoint.consecutive_failures = 0
+                endpoint.ejections = 0
+            self._available.notify_all()
+            waiters, self._waiters = self._waiters, []
+        for waiter in waiters:
+            # False when the waiter timed out or was cancelled meanwhile
+            if waiter.set_running_or_notify_cancel():
+                waiter.set_result(None)
+
+    def _can_eject(self, endpoint: Endpoint) -> bool:
+        now = time.monotonic()
+        return any(other is not endpoint and not other.ejected(now) for other in self.endpoints)
+
+    def _eject(self, endpoint: Endpoint):
+        seconds = settings.LLM_ENDPOINT_EJECT_SECONDS * 2 ** min(endpoint.ejections, MAX_EJECTION_DOUBLINGS)
+        endpoint.ejections += 1
+        endpoint._stats["ejections"] += 1
+        endpoint.ejected_until = time.monotonic() + seconds
+        print(f"⚠️ Endpoint {endpoint.name} ejected for {seconds:.0f}s after {endpoint.consecutive_failures} failures")
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._available:
+            return {endpoint.name: endpoint.stats() for endpoint in self.endpoints}
+
+def load_endpoint_configs(value: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Endpoint configs from LLM_ENDPOINTS: a JSON list, or the path of a JSON file holding one
+
+    Each entry has name, base_url, and api_key or api_key_env, plus optional
+    models ({"gpt-4": "deployment-name"}), max_in_flight and rpm.
+    """
+    value = settings.LLM_ENDPOINTS if value is None else value
+    if not value:
+        return []
+    if not value.lstrip().startswith("["):
+        with open(value, 'r', encoding='utf-8') as f:
+            value = f.read()
+    return json.loads(value)
+
+def create_endpoint_pool(configs: Optional[List[Dict[str, Any]]] = None) -> EndpointPool:
+    """Pool from endpoint configs (default: LLM_ENDPOINTS), or the default endpoint with OPENAI_API_KEY"""
+    configs = load_endpoint_configs() if configs is None else configs
+    if not configs:
+        return EndpointPool([Endpoint("default", settings.OPENAI_BASE_URL or None, settings.OPENAI_API_KEY)])
+
+    endpoints = []
+    for index, config in enumerate(configs):
+        api_key = config.get("api_key") or (os.getenv(config["api_key_env"]) if config.get("api_key_env") else None)
+        endpoints.append(Endpoint(
+            config.get("name", f"endpoint{index + 1}"),
+            config.get("base_url"),
+            api_key,
+            config.get("models"),
+            int(config.get("max_in_flight", 0)),
+            int(config.get("rpm", 0))
+        ))
+    return EndpointPool(endpoints)
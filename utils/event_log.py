@@ -0,0 +1,123 @@
+from typing import Dict, Any, List, Optional
+from config.settings import settings
+from models.events import LogEvent
+from utils.progress import current_node
+import threading
+import queue
+import json
+import time
+import os
+
+class EventLogSink:
+    """Appends event records to <EVENT_LOG_DIR>/<run_id>.jsonl on a background thread
+
+    Agents only enqueue records; the writer thread keeps one open file per
+    run until the run's log is closed.
+    """
+
+    def __init__(self, log_dir: str):
+        self.log_dir = log_dir
+        self._queue = queue.Queue()
+        self._files = {}
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def path(self, run_id: str) -> str:
+        return os.path.join(self.log_dir, f"{run_id}.jsonl")
+
+    def write(self, run_id: str, record: Dict[str, Any]):
+        self._ensure_writer()
+        self._queue.put((run_id, record))
+
+    def close(self, run_id: str):
+        """Flush and close a run's file once everything queued before this call is written"""
+        if self._thread is None:
+            return
+        done = threading.Event()
+        self._queue.put((run_id, done))
+        done.wait()
+
+    def _ensure_writer(self):
+        with self._lock:
+            if self._thread is None:
+                os.makedirs(self.log_dir, exist_ok=True)
+                self._thread = threading.Thread(target=self._write_loop, name="event-log-writer", daemon=True)
+                self._thread.start()
+
+    def _write_loop(self):
+        while True:
+            run_id, item = self._queue.get()
+            try:
+                if isinstance(item, threading.Event):
+                    f = self._files.pop(run_id, None)
+                    if f is not None:
+                        f.close()
+                    item.set()
+                    continue
+                f = self._files.get(run_id)
+                if f is None:
+                    f = self._files[run_id] = open(self.path(run_id), 'a', encoding='utf-8')
+                f.write(json.dumps(item, default=str) + "\n")
+                if self._queue.empty():
+                    f.flush()
+            except OSError as e:
+                print(f"⚠️ Event log write failed for run {run_id}: {e}")
+
+_sink: Optional[EventLogSink] = None
+
+def event_sink() -> Optional[EventLogSink]:
+    """Process-wide file sink, None when EVENT_LOG_DIR is empty"""
+    global _sink
+    if _sink is None and settings.EVENT_LOG_DIR:
+        _sink = EventLogSink(settings.EVENT_LOG_DIR)
+    return _sink
+
+def create_event_log(capacity: Optional[int] = None) -> Dict[str, Any]:
+    """Empty ring buffer of the most recent event records of a run"""
+    return {
+        "capacity": capacity or settings.EVENT_LOG_CAPACITY,
+        "records": [],
+        "next_seq": 0
+    }
+
+def log_event(state: Dict[str, Any], event: LogEvent, payload: Optional[Dict[str, Any]] = None, node: Optional[str] = None):
+    """Record an event in the state's ring buffer and the run's log file"""
+    log = state.setdefault("event_log", create_event_log())
+    record = {
+        "seq": log["next_seq"],
+        "timestamp": time.time(),
+        "node": node or current_node(),
+        "event": event.value,
+        "payload": payload or {}
+    }
+    log["next_seq"] += 1
+
+    # Once full, the oldest record's slot is overwritten
+    if len(log["records"]) < log["capacity"]:
+        log["records"].append(record)
+    else:
+        log["records"][record["seq"] % log["capacity"]] = record
+
+    sink = event_sink()
+    if sink is not None and state.get("run_id"):
+        sink.write(state["run_id"], record)
+
+def recent_events(state: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Records still in the ring buffer, oldest first"""
+    return sorted((state.get("event_log") or {}).get("records", []), key=lambda record: record["seq"])
+
+def close_event_log(run_id: str) -> Optional[str]:
+    """Flush a finished run's log file and return its path"""
+    sink = event_sink()
+    if sink is None:
+        return None
+    sink.close(run_id)
+    return sink.path(run_id)
+
+def read_event_log(run_id: str) -> List[Dict[str, Any]]:
+    """Full event history of a run from its log file"""
+    sink = event_sink()
+    if sink is None or not os.path.exists(sink.path(run_id)):
+        return []
+    with open(sink.path(run_id), 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
@@ -0,0 +1,105 @@
+from typing import Dict, Any, List, Optional, Set
+from utils.token_budget import estimate_tokens, CHARS_PER_TOKEN
+import math
+import re
+
+# Context block budgets in tokens
+SPECIALIST_CONTEXT_TOKENS = 600
+EXECUTIVE_SUMMARY_CONTEXT_TOKENS = 150
+
+# Score weights: keyword overlap, position, centrality (TextRank)
+KEYWORD_WEIGHT = 0.5
+POSITION_WEIGHT = 0.2
+CENTRALITY_WEIGHT = 0.3
+
+TEXTRANK_DAMPING = 0.85
+TEXTRANK_ITERATIONS = 30
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "has", "have", "in", "is", "it",
+    "its", "of", "on", "or", "that", "the", "this", "to", "was", "were", "will", "with", "which"
+}
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+|\n+")
+
+def split_sentences(text: str) -> List[str]:
+    """Sentences and list items of a text, in order"""
+    return [sentence.strip() for sentence in _SENTENCE_END.split(text) if sentence and sentence.strip()]
+
+def content_words(text: str) -> Set[str]:
+    return {word for word in re.findall(r"\w+", text.lower()) if word not in STOPWORDS and len(word) > 2}
+
+def textrank_scores(word_sets: List[Set[str]]) -> List[float]:
+    """Sentence centrality by PageRank over word-overlap similarity"""
+    count = len(word_sets)
+    if count < 2:
+        return [1.0] * count
+
+    weights = [[0.0] * count for _ in range(count)]
+    for i in range(count):
+        for j in range(i + 1, count):
+            overlap = len(word_sets[i] & word_sets[j])
+            if overlap and len(word_sets[i]) > 1 and len(word_sets[j]) > 1:
+                similarity = overlap / (math.log(len(word_sets[i])) + math.log(len(word_sets[j])))
+                weights[i][j] = weights[j][i] = similarity
+    totals = [sum(row) for row in weights]
+
+    # Incoming edges per sentence with their normalized weights
+    incoming = [
+        [(j, weights[j][i] / totals[j]) for j in range(count) if weights[j][i]]
+        for i in range(count)
+    ]
+    scores = [1.0] * count
+    for _ in range(TEXTRANK_ITERATIONS):
+        scores = [
+            (1 - TEXTRANK_DAMPING) + TEXTRANK_DAMPING * sum(weight * scores[j] for j, weight in edges)
+            for edges in incoming
+        ]
+    return scores
+
+def _normalized(values: List[float]) -> List[float]:
+    highest = max(values) if values else 0
+    return [value / highest if highest else 0.0 for value in values]
+
+def compress_text(text: str, max_tokens: int, keywords: Optional[List[str]] = None) -> str:
+    """Most relevant sentences of a text within max_tokens, in original order
+
+    Sentences are scored by overlap with the keywords, position (earlier is
+    better) and TextRank centrality; no LLM is involved.
+    """
+    if not text or estimate_tokens(text) <= max_tokens:
+        return text
+
+    sentences = split_sentences(text)
+    word_sets = [content_words(sentence) for sentence in sentences]
+    keyword_words = content_words(" ".join(str(keyword) for keyword in keywords or []))
+
+    keyword_scores = _normalized([len(words & keyword_words) for words in word_sets])
+    position_scores = [1.0 / (1 + index) ** 0.5 for index in range(len(sentences))]
+    centrality_scores = _normalized(textrank_scores(word_sets))
+    scores = [
+        KEYWORD_WEIGHT * keyword + POSITION_WEIGHT * position + CENTRALITY_WEIGHT * centrality
+        for keyword, position, centrality in zip(keyword_scores, position_scores, centrality_scores)
+    ]
+
+    chosen = []
+    used = 0
+    for index in sorted(range(len(sentences)), key=lambda i: -scores[i]):
+        tokens = estimate_tokens(sentences[index])
+        if used + tokens > max_tokens:
+            continue
+        chosen.append(index)
+        used += tokens
+
+    # A single sentence longer than the budget is cut at a word boundary
+    if not chosen:
+        best = sentences[max(range(len(sentences)), key=lambda i: scores[i])]
+        return best[:max_tokens * CHARS_PER_TOKEN].rsplit(" ", 1)[0] + "..."
+    return "\n".join(sentences[index] for index in sorted(chosen))
+
+def query_keywords(state: Dict[str, Any]) -> List[str]:
+    """Keywords from query analysis, falling back to the query words"""
+    keywords = state.get("query_analysis", {}).get("keywords") or state.get("query", "").split()
+    if isinstance(keywords, str):
+        keywords = keywords.split()
+    return keywords
@@ -0,0 +1,69 @@
+from typing import Dict, Any
+from config.settings import settings
+from models.events import EventType, LogEvent
+from utils.event_log import log_event
+from utils.progress import emit_progress
+from utils.token_budget import budget_exhausted
+from utils.deadline import deadline_pressure
+from utils.visit_ledger import check_route, record_visit, TEAM_RESULT_KEYS
+
+def propose_handoff(state: Dict[str, Any], source: str, target: str, confidence: float, payload: Dict[str, Any]):
+    """Propose the next team directly, with the payload it is handed"""
+    state["next_agent"] = target
+    state["handoff_context"] = {
+        "from": source,
+        "to": target,
+        "confidence": confidence,
+        "payload": payload
+    }
+
+def received_handoff(state: Dict[str, Any], team: str) -> Dict[str, Any]:
+    """Payload of the handoff that routed to team, or {} when the supervisor did"""
+    handoff = state.get("handoff_context") or {}
+    if handoff.get("to") == team and handoff.get("accepted"):
+        return handoff.get("payload", {})
+    return {}
+
+def handoff_refusal(state: Dict[str, Any], target: str) -> str:
+    """Why a proposed handoff has to go through the supervisor, or "" to take it"""
+    handoff = state.get("handoff_context") or {}
+    if not settings.DIRECT_HANDOFFS:
+        return "disabled"
+    if handoff.get("to") != target or target not in TEAM_RESULT_KEYS:
+        return "no_handoff"
+    if handoff.get("confidence", 0.0) < settings.HANDOFF_MIN_CONFIDENCE:
+        return "low_confidence"
+    if state.get("workflow_complete", False):
+        return "workflow_complete"
+    # Budget and deadline wrap-ups are the supervisor's call
+    if budget_exhausted(state):
+        return "token_budget_exhausted"
+    if deadline_pressure(state) != "none":
+        return "deadline_pressure"
+    return check_route(state, target) or ""
+
+def resolve_handoff(state: Dict[str, Any], team: str) -> Dict[str, Any]:
+    """After a team ran: take its proposed handoff, or send it back to the supervisor"""
+    target = state.get("next_agent")
+    if not target or target == "supervisor":
+        state["next_agent"] = "supervisor"
+        return state
+
+    reason = handoff_refusal(state, target)
+    if reason:
+        if reason != "no_handoff":
+            print(f"🤝 Handoff {team} → {target} refused ({reason}) - back to the supervisor")
+        state["next_agent"] = "supervisor"
+        return state
+
+    state["handoff_context"]["accepted"] = True
+    record_visit(state, target)
+    ledger = state["visit_ledger"]
+    ledger["handoffs"] += 1
+    # One supervisor step and its routing call
+    ledger["supervisor_hops_avoided"] += 1
+    ledger["llm_calls_avoided"] += 1
+    log_event(state, LogEvent.ROUTING_DECISION, {"next_agent": target, "reason": "handoff", "from": team})
+    emit_progress(EventType.ROUTING_DECISION, next_agent=target, handoff_from=team)
+    print(f"🤝 Direct handoff: {team} → {target}")
+    return state
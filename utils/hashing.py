@@ -0,0 +1,8 @@
+from typing import Any
+import hashlib
+import json
+
+def stable_hash(value: Any) -> str:
+    """Deterministic SHA-256 of a JSON-serializable value"""
+    payload = json.dumps(value, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
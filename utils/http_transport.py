@@ -0,0 +1,193 @@
+from typing import Dict, Any, Optional
+from config.settings import settings
+import threading
+import asyncio
+import weakref
+import time
+import os
+import httpx
+
+try:
+    import h2
+except ImportError:
+    h2 = None
+
+# Connection setup steps reported by the httpcore trace extension
+HANDSHAKE_STEPS = ("connection.connect_tcp", "connection.start_tls")
+
+class TransportMetrics:
+    """Requests, new connections and handshake time of this process's pool"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._handshakes = {step: {"count": 0, "seconds": 0.0} for step in HANDSHAKE_STEPS}
+
+    def record_request(self):
+        with self._lock:
+            self._requests += 1
+
+    def record_handshake(self, step: str, seconds: float):
+        with self._lock:
+            self._handshakes[step]["count"] += 1
+            self._handshakes[step]["seconds"] += seconds
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            tcp = dict(self._handshakes["connection.connect_tcp"])
+            tls = dict(self._handshakes["connection.start_tls"])
+            requests = self._requests
+        return {
+            "requests": requests,
+            "connections_opened": tcp["count"],
+            "reuse_rate": 1 - tcp["count"] / requests if requests else 0.0,
+            "tcp_connect_avg_ms": tcp["seconds"] / tcp["count"] * 1000 if tcp["count"] else 0.0,
+            "tls_handshake_avg_ms": tls["seconds"] / tls["count"] * 1000 if tls["count"] else 0.0,
+            "handshake_total_s": tcp["seconds"] + tls["seconds"]
+        }
+
+class _RequestTrace:
+    """httpcore trace callback timing the connection setup of one request"""
+
+    def __init__(self, metrics: TransportMetrics):
+        self.metrics = metrics
+        self._started: Dict[str, float] = {}
+
+    def __call__(self, event_name: str, info: Dict[str, Any]):
+        self._record(event_name)
+
+    def _record(self, event_name: str):
+        step, _, phase = event_name.rpartition(".")
+        if step not in HANDSHAKE_STEPS:
+            return
+        if phase == "started":
+            self._started[step] = time.perf_counter()
+        elif phase == "complete" and step in self._started:
+            self.metrics.record_handshake(step, time.perf_counter() - self._started.pop(step))
+
+class _AsyncRequestTrace(_RequestTrace):
+    async def __call__(self, event_name: str, info: Dict[str, Any]):
+        self._record(event_name)
+
+_metrics = TransportMetrics()
+_transports = weakref.WeakSet()
+
+def pool_options() -> Dict[str, Any]:
+    """httpx transport options from settings (HTTP/2 only when h2 is installed)"""
+    return {
+        "http2": settings.HTTP2 and h2 is not None,
+        "limits": httpx.Limits(
+            max_connections=settings.HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.HTTP_KEEPALIVE_SECONDS
+        )
+    }
+
+class PooledTransport(httpx.BaseTransport):
+    """Keep-alive connection pool, built on first use in each process
+
+    A forked child drops the pool it inherited (those sockets belong to the
+    parent) and opens its own.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pool: Optional[httpx.HTTPTransport] = None
+        _transports.add(self)
+
+    def _after_fork(self):
+        self._lock = threading.Lock()
+        self._pool = None
+
+    def _transport(self) -> httpx.HTTPTransport:
+        with self._lock:
+            if self._pool is None:
+                self._pool = httpx.HTTPTransport(**pool_options())
+            return self._pool
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        _metrics.record_request()
+        request.extensions["trace"] = _RequestTrace(_metrics)
+        return self._transport().handle_request(request)
+
+    def close(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.close()
+                self._pool = None
+
+class AsyncPooledTransport(httpx.AsyncBaseTransport):
+    """Async version of PooledTransport, with one pool per event loop
+
+    Async connections belong to the event loop that opened them, so the
+    prefetcher's loop, asyncio.run callers and any other loop each get a
+    pool of their own; a pool goes away with its loop.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pools: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncHTTPTransport]" = weakref.WeakKeyDictionary()
+        _transports.add(self)
+
+    def _after_fork(self):
+        self._lock = threading.Lock()
+        self._pools = weakref.WeakKeyDictionary()
+
+    def _transport(self) -> httpx.AsyncHTTPTransport:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            pool = self._pools.get(loop)
+            if pool is None:
+                pool = self._pools[loop] = httpx.AsyncHTTPTransport(**pool_options())
+            return pool
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        _metrics.record_request()
+        request.extensions["trace"] = _AsyncRequestTrace(_metrics)
+        return await self._transport().handle_async_request(request)
+
+    async def aclose(self):
+        """Close the running loop's pool"""
+        with self._lock:
+            pool = self._pools.pop(asyncio.get_running_loop(), None)
+        if pool is not None:
+            await pool.aclose()
+
+_clients: Dict[str, Any] = {}
+_clients_lock = threading.Lock()
+
+def _timeout() -> httpx.Timeout:
+    return httpx.Timeout(settings.HTTP_TIMEOUT_SECONDS, connect=5.0)
+
+def shared_http_client() -> httpx.Client:
+    """The process-wide pooled client every OpenAI client is built on"""
+    with _clients_lock:
+        if "sync" not in _clients:
+            _clients["sync"] = httpx.Client(transport=PooledTransport(), timeout=_timeout(), follow_redirects=True)
+        return _clients["sync"]
+
+def shared_async_http_client() -> httpx.AsyncClient:
+    """Async counterpart of shared_http_client; its transport keeps a pool per event loop"""
+    with _clients_lock:
+        if "async" not in _clients:
+            _clients["async"] = httpx.AsyncClient(transport=AsyncPooledTransport(), timeout=_timeout(), follow_redirects=True)
+        return _clients["async"]
+
+def transport_stats() -> Dict[str, Any]:
+    """Connection reuse and handshake metrics of this process"""
+    stats = _metrics.stats()
+    stats["http2"] = pool_options()["http2"]
+    stats["max_connections"] = settings.HTTP_MAX_CONNECTIONS
+    stats["pid"] = os.getpid()
+    return stats
+
+def _after_fork_in_child():
+    """Give a forked child fresh pools, locks and metrics"""
+    global _metrics, _clients_lock
+    _metrics = TransportMetrics()
+    _clients_lock = threading.Lock()
+    for transport in list(_transports):
+        transport._after_fork()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
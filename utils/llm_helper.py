@@ -1,64 +1,429 @@
-from langchain_openai import ChatOpenAI
 from langchain.schema import HumanMessage, SystemMessage
 from config.settings import settings
-from typing import List, Dict, Any
+from utils.token_budget import allocate_tokens, record_token_usage, fit_prompt, estimate_tokens
+from utils.progress import emit_progress, wants_tokens
+from models.events import EventType
+from utils.single_flight import SingleFlight
+from utils.llm_scheduler import llm_scheduler, current_priority
+from utils.concurrency_limit import concurrency_limiter
+from utils.deadline import degrade_call
+from utils.hashing import stable_hash
+from utils.schemas import STRUCTURED_OUTPUTS, SchemaValidationError, validate_schema
+from utils.http_transport import transport_stats
+from utils.endpoint_pool import create_endpoint_pool, ENDPOINT_ERRORS
+from utils.prompts import render_prompt, prompt_cache_stats, prompt_site
+from utils.tracing import trace_span, annotate_span
+from typing import List, Dict, Any, Optional
+from contextvars import ContextVar
+from contextlib import contextmanager
+import threading
 import json
+import time
+
+class PromptCaptured(Exception):
+    """Raised by an LLM call made while replaying, when its response is not known yet"""
+    
+    def __init__(self, request: Dict[str, Any]):
+        super().__init__(f"LLM request {request['key']} captured for batching")
+        self.request = request
+
+# Models that accept json_schema response formats (others get the schema in the prompt)
+JSON_SCHEMA_MODELS = ("gpt-4o", "gpt-4.1", "gpt-5", "o1", "o3", "o4")
+
+class StructuredOutputError(ValueError):
+    """A structured-output call whose response did not parse or match its schema"""
+
+# Known responses by request key while an agent is replayed (bulk pipeline)
+_replay: ContextVar[Optional[Dict[str, Any]]] = ContextVar("llm_replay", default=None)
+
+@contextmanager
+def replaying(responses: Dict[str, Any]):
+    """Answer LLM calls from responses; unknown calls raise PromptCaptured
+    
+    responses maps request keys to (content, usage) or to an exception to raise.
+    """
+    token = _replay.set(responses)
+    try:
+        yield
+    finally:
+        _replay.reset(token)
 
 class LLMHelper:
     def __init__(self):
         settings.validate()
-        self.llm = ChatOpenAI(
-            api_key=settings.OPENAI_API_KEY,
-            model=settings.OPENAI_MODEL,
-            temperature=settings.TEMPERATURE,
-            max_tokens=settings.MAX_TOKENS
-        )
-    
-    def generate_response(self, system_prompt: str, user_prompt: str) -> str:
-        """Generate a response using OpenAI"""
-        messages = [
+        self.endpoints = create_endpoint_pool()
+        self._usage: ContextVar[Dict[str, int]] = ContextVar("llm_usage", default={"prompt_tokens": 0, "completion_tokens": 0})
+        self._single_flight = SingleFlight()
+        self._structured_stats: Dict[str, Dict[str, int]] = {}
+        self._structured_lock = threading.Lock()
+    
+    @property
+    def last_usage(self) -> Dict[str, int]:
+        """Token usage of the last call made in this thread or task"""
+        return self._usage.get()
+    
+    def generate_response(self, system_prompt: str, user_prompt: str, max_tokens: Optional[int] = None, model: Optional[str] = None,
+                          response_format: Optional[Dict[str, Any]] = None) -> str:
+        """Generate a response using OpenAI
+        
+        Identical requests already in flight share that call instead of
+        issuing their own. model overrides the configured model for this call.
+        """
+        if _replay.get() is not None:
+            return self._replayed_response(system_prompt, user_prompt, max_tokens, model, response_format)
+        
+        call = lambda: self._call_llm(system_prompt, user_prompt, max_tokens, model, response_format)
+        if not settings.COALESCE_LLM_REQUESTS:
+            content, usage = call()
+            shared = False
+        else:
+            key = self._request_key(system_prompt, user_prompt, max_tokens, model, response_format)
+            (content, usage), shared = self._single_flight.do(key, call)
+        
+        # Coalesced callers spent no tokens of their own
+        self._usage.set({"prompt_tokens": 0, "completion_tokens": 0} if shared else usage)
+        return content
+    
+    async def agenerate_response(self, system_prompt: str, user_prompt: str, max_tokens: Optional[int] = None, model: Optional[str] = None,
+                                 response_format: Optional[Dict[str, Any]] = None) -> str:
+        """Async version of generate_response"""
+        call = lambda: self._acall_llm(system_prompt, user_prompt, max_tokens, model, response_format)
+        if not settings.COALESCE_LLM_REQUESTS:
+            content, usage = await call()
+            shared = False
+        else:
+            key = self._request_key(system_prompt, user_prompt, max_tokens, model, response_format)
+            (content, usage), shared = await self._single_flight.ado(key, call)
+        
+        self._usage.set({"prompt_tokens": 0, "completion_tokens": 0} if shared else usage)
+        return content
+    
+    def _replayed_response(self, system_prompt: str, user_prompt: str, max_tokens: Optional[int], model: Optional[str],
+                           response_format: Optional[Dict[str, Any]]) -> str:
+        key = self._request_key(system_prompt, user_prompt, max_tokens, model, response_format)
+        response = _replay.get().get(key)
+        if response is None:
+            raise PromptCaptured({
+                "key": key,
+                "model": model or settings.OPENAI_MODEL,
+                "system_prompt": system_prompt,
+                "user_prompt": user_prompt,
+                "max_tokens": max_tokens or settings.MAX_TOKENS,
+                "response_format": response_format
+            })
+        if isinstance(response, Exception):
+            raise response
+        content, usage = response
+        self._usage.set(usage)
+        return content
+    
+    def coalescing_stats(self) -> Dict[str, Any]:
+        """How many requests shared an identical in-flight call"""
+        return self._single_flight.stats()
+    
+    def scheduler_stats(self) -> Dict[str, Any]:
+        """Queue-wait metrics per priority class"""
+        return llm_scheduler.stats()
+    
+    def concurrency_stats(self) -> Dict[str, Any]:
+        """Live gauge of the process-wide in-flight limit"""
+        return concurrency_limiter.stats()
+    
+    def transport_stats(self) -> Dict[str, Any]:
+        """Connection reuse and handshake metrics of the shared HTTP pool"""
+        return transport_stats()
+    
+    def prompt_cache_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Cached prompt-token ratio and estimated latency saved, per call site"""
+        return prompt_cache_stats.stats()
+    
+    def endpoint_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Requests, latency and health per endpoint"""
+        return self.endpoints.stats()
+    
+    def _request_key(self, system_prompt: str, user_prompt: str, max_tokens: Optional[int], model: Optional[str] = None,
+                     response_format: Optional[Dict[str, Any]] = None) -> str:
+        return stable_hash([model or settings.OPENAI_MODEL, settings.TEMPERATURE, max_tokens, system_prompt, user_prompt, response_format])
+    
+    def _bind(self, llm, max_tokens: Optional[int], response_format: Optional[Dict[str, Any]] = None):
+        """Client bound to a completion budget and response format"""
+        bound = {}
+        if max_tokens:
+            bound["max_tokens"] = max_tokens
+        if response_format:
+            bound["response_format"] = response_format
+        return llm.bind(**bound) if bound else llm
+    
+    def _messages(self, system_prompt: str, user_prompt: str):
+        return [
             SystemMessage(content=system_prompt),
             HumanMessage(content=user_prompt)
         ]
+    
+    def _call_llm(self, system_prompt: str, user_prompt: str, max_tokens: Optional[int], model: Optional[str] = None,
+                  response_format: Optional[Dict[str, Any]] = None):
+        """One upstream call; returns (content, usage)"""
+        messages = self._messages(system_prompt, user_prompt)
+        model = model or settings.OPENAI_MODEL
+        tried = set()
+        with trace_span(f"llm {prompt_site(system_prompt)}", "llm", **{
+            "gen_ai.system": "openai",
+            "gen_ai.request.model": model,
+            "gen_ai.request.max_tokens": max_tokens,
+            "llm.priority": current_priority()
+        }):
+            queued = time.perf_counter()
+            with llm_scheduler.slot():
+                annotate_span(**{"llm.queue_wait_ms": round((time.perf_counter() - queued) * 1000, 3)})
+                while True:
+                    endpoint = self.endpoints.acquire(model, tried)
+                    llm = self._bind(endpoint.client(model), max_tokens, response_format)
+                    started = time.perf_counter()
+                    try:
+                        # Structured outputs are not worth streaming to the user
+                        if wants_tokens() and not response_format:
+                            response = self._stream_response(llm, messages)
+                        else:
+                            response = llm.invoke(messages)
+                    except ENDPOINT_ERRORS as e:
+                        self.endpoints.release(endpoint, time.perf_counter() - started, failed=True)
+                        concurrency_limiter.on_error(started, e)
+                        tried.add(endpoint.name)
+                        if not self.endpoints.serves(model, tried):
+                            raise
+                        print(f"⚠️ Endpoint {endpoint.name} failed ({e}) - retrying on another endpoint")
+                        continue
+                    except BaseException:
+                        self.endpoints.release(endpoint, None)
+                        raise
+                    elapsed = time.perf_counter() - started
+                    self.endpoints.release(endpoint, elapsed)
+                    usage = self._completed_usage(response, system_prompt, user_prompt, elapsed)
+                    annotate_span(**{"llm.endpoint": endpoint.name, "llm.attempts": len(tried) + 1})
+                    concurrency_limiter.on_success(started, elapsed, usage["completion_tokens"])
+                    return response.content, usage
+    
+    async def _acall_llm(self, system_prompt: str, user_prompt: str, max_tokens: Optional[int], model: Optional[str] = None,
+                         response_format: Optional[Dict[str, Any]] = None):
+        """Async upstream call; returns (content, usage)"""
+        messages = self._messages(system_prompt, user_prompt)
+        model = model or settings.OPENAI_MODEL
+        tried = set()
+        with trace_span(f"llm {prompt_site(system_prompt)}", "llm", **{
+            "gen_ai.system": "openai",
+            "gen_ai.request.model": model,
+            "gen_ai.request.max_tokens": max_tokens,
+            "llm.priority": current_priority()
+        }):
+            queued = time.perf_counter()
+            async with llm_scheduler.aslot():
+                annotate_span(**{"llm.queue_wait_ms": round((time.perf_counter() - queued) * 1000, 3)})
+                while True:
+                    endpoint = await self.endpoints.aacquire(model, tried)
+                    llm = self._bind(endpoint.client(model), max_tokens, response_format)
+                    started = time.perf_counter()
+                    try:
+                        response = await llm.ainvoke(messages)
+                    except ENDPOINT_ERRORS as e:
+                        self.endpoints.release(endpoint, time.perf_counter() - started, failed=True)
+                        concurrency_limiter.on_error(started, e)
+                        tried.add(endpoint.name)
+                        if not self.endpoints.serves(model, tried):
+                            raise
+                        print(f"⚠️ Endpoint {endpoint.name} failed ({e}) - retrying on another endpoint")
+                        continue
+                    except BaseException:
+                        self.endpoints.release(endpoint, None)
+                        raise
+                    elapsed = time.perf_counter() - started
+                    self.endpoints.release(endpoint, elapsed)
+                    usage = self._completed_usage(response, system_prompt, user_prompt, elapsed)
+                    annotate_span(**{"llm.endpoint": endpoint.name, "llm.attempts": len(tried) + 1})
+                    concurrency_limiter.on_success(started, elapsed, usage["completion_tokens"])
+                    return response.content, usage
+    
+    def generate_structured(self, name: str, system_prompt: str, user_prompt: str,
+                            state: Optional[Dict[str, Any]] = None, agent: Optional[str] = None) -> Dict[str, Any]:
+        """Generate a JSON object constrained to a schema in STRUCTURED_OUTPUTS
+        
+        The response is validated locally; StructuredOutputError is raised when
+        it does not parse or match. With a state, the call is charged to
+        agent's token budget like generate_budgeted_response.
+        """
+        max_tokens = STRUCTURED_OUTPUTS[name]["max_tokens"]
+        model = None
+        if state is not None:
+            allocation = allocate_tokens(state, agent)
+            user_prompt = fit_prompt(user_prompt, max(0, allocation["prompt_tokens"] - estimate_tokens(system_prompt)))
+            # A shorter completion would cut the JSON off, so only the model tier degrades
+            _, model = degrade_call(state, max_tokens)
         
-        response = self.llm.invoke(messages)
-        return response.content
+        system_prompt, response_format = self._structured_request(name, system_prompt, model)
+        response = self.generate_response(system_prompt, user_prompt, max_tokens, model, response_format)
+        if state is not None:
+            usage = self.last_usage
+            record_token_usage(state, agent, usage["prompt_tokens"], usage["completion_tokens"])
+        return self._parse_structured(name, response)
     
-    def analyze_query(self, query: str) -> Dict[str, Any]:
-        """Analyze query intent and characteristics"""
-        system_prompt = """You are an expert query analyzer. Analyze the given query and return a JSON response with:
-        - intent: the main purpose (research, analysis, question, etc.)
-        - domain: the subject area (medical, financial, technical, general, etc.)
-        - complexity: low, medium, or high
-        - keywords: list of important keywords
-        - suggested_agents: list of agent types that should handle this query
-        - estimated_time: rough estimate in minutes"""
+    async def agenerate_structured(self, name: str, system_prompt: str, user_prompt: str) -> Dict[str, Any]:
+        """Async version of generate_structured (unbudgeted)"""
+        system_prompt, response_format = self._structured_request(name, system_prompt, None)
+        response = await self.agenerate_response(system_prompt, user_prompt, STRUCTURED_OUTPUTS[name]["max_tokens"], None, response_format)
+        return self._parse_structured(name, response)
+    
+    def structured_stats(self) -> Dict[str, Dict[str, int]]:
+        """Structured-output calls and validation failures per schema"""
+        with self._structured_lock:
+            return {name: dict(stats) for name, stats in self._structured_stats.items()}
+    
+    def _structured_request(self, name: str, system_prompt: str, model: Optional[str]):
+        """System prompt and response_format for a structured call
+        
+        STRUCTURED_OUTPUT_MODE "json_schema" constrains decoding to the schema,
+        "json_object" only forces JSON, "prompt" relies on the instructions;
+        "auto" picks json_schema for models that support it.
+        """
+        schema = STRUCTURED_OUTPUTS[name]["schema"]
+        mode = settings.STRUCTURED_OUTPUT_MODE
+        if mode == "auto":
+            mode = "json_schema" if (model or settings.OPENAI_MODEL).startswith(JSON_SCHEMA_MODELS) else "prompt"
         
-        user_prompt = f"Analyze this query: {query}"
+        if mode == "json_schema":
+            return system_prompt, {"type": "json_schema", "json_schema": {"name": name, "strict": True, "schema": schema}}
         
-        response = self.generate_response(system_prompt, user_prompt)
+        system_prompt += f"\n\nRespond with only a JSON object matching this JSON schema:\n{json.dumps(schema)}"
+        return system_prompt, {"type": "json_object"} if mode == "json_object" else None
+    
+    def _parse_structured(self, name: str, response: str) -> Dict[str, Any]:
+        with self._structured_lock:
+            stats = self._structured_stats.setdefault(name, {"calls": 0, "failures": 0})
+            stats["calls"] += 1
+        
+        # Prompt-only mode may still wrap the object in a code fence
+        text = response.strip()
+        if text.startswith("```"):
+            text = text.strip("`")
+            text = text.split("\n", 1)[1] if text.startswith("json") else text
         try:
-            return json.loads(response)
-        except:
+            value = json.loads(text)
+            validate_schema(value, STRUCTURED_OUTPUTS[name]["schema"])
+        except (ValueError, SchemaValidationError) as e:
+            with self._structured_lock:
+                stats["failures"] += 1
+            raise StructuredOutputError(f"{name}: {e}") from e
+        return value
+    
+    def generate_budgeted_response(self, state: Dict[str, Any], agent: str, system_prompt: str, user_prompt: str) -> str:
+        """Generate a response within the run's token budget and charge its usage
+        
+        Under deadline pressure the completion is shorter and may go to the
+        faster model tier.
+        """
+        allocation = allocate_tokens(state, agent)
+        prompt_tokens = max(0, allocation["prompt_tokens"] - estimate_tokens(system_prompt))
+        user_prompt = fit_prompt(user_prompt, prompt_tokens)
+        max_tokens, model = degrade_call(state, allocation["max_tokens"])
+        
+        response = self.generate_response(system_prompt, user_prompt, max_tokens=max_tokens, model=model)
+        usage = self.last_usage
+        record_token_usage(state, agent, usage["prompt_tokens"], usage["completion_tokens"])
+        return response
+    
+    async def agenerate_budgeted_response(self, state: Dict[str, Any], agent: str, system_prompt: str, user_prompt: str) -> str:
+        """Async version of generate_budgeted_response"""
+        allocation = allocate_tokens(state, agent)
+        prompt_tokens = max(0, allocation["prompt_tokens"] - estimate_tokens(system_prompt))
+        user_prompt = fit_prompt(user_prompt, prompt_tokens)
+        max_tokens, model = degrade_call(state, allocation["max_tokens"])
+        
+        response = await self.agenerate_response(system_prompt, user_prompt, max_tokens=max_tokens, model=model)
+        usage = self.last_usage
+        record_token_usage(state, agent, usage["prompt_tokens"], usage["completion_tokens"])
+        return response
+    
+    def _stream_response(self, llm, messages):
+        """Stream a completion, reporting partial tokens as progress events"""
+        response = None
+        for chunk in llm.stream(messages):
+            if chunk.content:
+                emit_progress(EventType.TOKEN, token=chunk.content)
+            response = chunk if response is None else response + chunk
+        return response if response is not None else llm.invoke(messages)
+    
+    def _completed_usage(self, response, system_prompt: str, user_prompt: str, elapsed: float) -> Dict[str, int]:
+        """Usage of a completed call, recording its prompt-cache hits by call site"""
+        usage = self._extract_usage(response, system_prompt + user_prompt)
+        cached_tokens = self._cached_tokens(response)
+        prompt_cache_stats.record(system_prompt, usage["prompt_tokens"], cached_tokens, elapsed)
+        annotate_span(**{
+            "gen_ai.usage.input_tokens": usage["prompt_tokens"],
+            "gen_ai.usage.output_tokens": usage["completion_tokens"],
+            "llm.cached_tokens": cached_tokens
+        })
+        return usage
+    
+    def _cached_tokens(self, response) -> int:
+        """Prompt tokens the provider served from its prefix cache"""
+        details = (getattr(response, "usage_metadata", None) or {}).get("input_token_details") or {}
+        if details.get("cache_read"):
+            return details["cache_read"]
+        token_usage = (getattr(response, "response_metadata", None) or {}).get("token_usage") or {}
+        return (token_usage.get("prompt_tokens_details") or {}).get("cached_tokens") or 0
+    
+    def _extract_usage(self, response, prompt_text: str) -> Dict[str, int]:
+        """Read token usage from the response, estimating it when missing"""
+        usage = getattr(response, "usage_metadata", None) or {}
+        if usage:
+            return {
+                "prompt_tokens": usage.get("input_tokens", 0),
+                "completion_tokens": usage.get("output_tokens", 0)
+            }
+        
+        token_usage = getattr(response, "response_metadata", {}).get("token_usage", {})
+        if token_usage:
             return {
-                "intent": "general_inquiry",
-                "domain": "general",
-                "complexity": "medium",
-                "keywords": query.split(),
-                "suggested_agents": ["research", "summary"],
-                "estimated_time": "5-10"
+                "prompt_tokens": token_usage.get("prompt_tokens", 0),
+                "completion_tokens": token_usage.get("completion_tokens", 0)
             }
+        
+        return {
+            "prompt_tokens": estimate_tokens(prompt_text),
+            "completion_tokens": estimate_tokens(response.content)
+        }
+    
+    def analyze_query(self, query: str) -> Dict[str, Any]:
+        """Analyze query intent and characteristics"""
+        try:
+            return self.generate_structured("query_analysis", *self._analysis_prompts(query))
+        except StructuredOutputError as e:
+            return self._default_analysis(query, e)
+    
+    async def aanalyze_query(self, query: str) -> Dict[str, Any]:
+        """Async version of analyze_query"""
+        try:
+            return await self.agenerate_structured("query_analysis", *self._analysis_prompts(query))
+        except StructuredOutputError as e:
+            return self._default_analysis(query, e)
+    
+    def _analysis_prompts(self, query: str):
+        return render_prompt("query_analysis", query=query)
+    
+    def _default_analysis(self, query: str, error: StructuredOutputError) -> Dict[str, Any]:
+        print(f"⚠️ Query analysis unusable ({error}) - using the default analysis")
+        return {
+            "intent": "general_inquiry",
+            "domain": "general",
+            "complexity": "medium",
+            "keywords": query.split(),
+            "suggested_agents": ["research", "summary"],
+            "estimated_time": "5-10"
+        }
     
     def make_routing_decision(self, state: Dict[str, Any]) -> str:
         """Help supervisor make routing decisions"""
-        system_prompt = """You are a supervisor agent coordinator. Based on the current state, decide which agent should handle the next task.
-        Available agents: team1 (research), team2 (repair), team3 (medical), team4 (financial), team5 (summary), team6 (document)
-        Return only the agent name (e.g., 'team1') or 'END' if workflow is complete."""
-        
-        user_prompt = f"Current state: {json.dumps(state, default=str)}"
+        system_prompt, user_prompt = render_prompt("routing_decision", state=json.dumps(state, default=str))
         
-        response = self.generate_response(system_prompt, user_prompt)
-        return response.strip().lower()
+        return self.generate_structured("routing_decision", system_prompt, user_prompt)["next_agent"]
 
 # Global LLM helper instance
 llm_helper = LLMHelper()
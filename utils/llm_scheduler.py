@@ -0,0 +1,177 @@
+from concurrent.futures import Future
+from contextlib import contextmanager
+from contextvars import ContextVar
+from collections import deque
+from typing import Dict, Any, List, Optional
+from config.settings import settings
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+
+# Served strictly in this order; lower classes only get capacity nobody above is waiting for
+PRIORITY_CLASSES = ["interactive", "service", "batch"]
+# Recent queue waits kept per class for percentiles
+WAIT_SAMPLES = 1000
+
+_priority: ContextVar[Optional[str]] = ContextVar("llm_priority", default=None)
+_tenant: ContextVar[Optional[str]] = ContextVar("llm_tenant", default=None)
+
+@contextmanager
+def llm_priority(priority: str, tenant: Optional[str] = None):
+    """Run LLM calls in this thread or task under a priority class and tenant"""
+    if priority not in PRIORITY_CLASSES:
+        raise ValueError(f"Unknown priority class: {priority}")
+    priority_token = _priority.set(priority)
+    tenant_token = _tenant.set(tenant)
+    try:
+        yield
+    finally:
+        _priority.reset(priority_token)
+        _tenant.reset(tenant_token)
+
+def current_priority() -> str:
+    return _priority.get() or settings.LLM_DEFAULT_PRIORITY
+
+def current_tenant() -> str:
+    return _tenant.get() or "default"
+
+class LLMScheduler:
+    """Admits LLM calls under a max in-flight limit
+
+    Waiting calls are served by priority class first, then by weighted fair
+    queuing across tenants within a class: each tenant's calls get virtual
+    finish times spaced 1/weight apart, so a tenant with hundreds of queued
+    calls cannot hold back one that has a single call waiting.
+    """
+
+    def __init__(self, max_in_flight: int = 4, tenant_weights: Optional[Dict[str, float]] = None):
+        self.max_in_flight = max_in_flight
+        self.tenant_weights = tenant_weights or {}
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._sequence = itertools.count()
+        self._queues: Dict[str, List] = {priority: [] for priority in PRIORITY_CLASSES}
+        self._virtual_time: Dict[str, float] = {priority: 0.0 for priority in PRIORITY_CLASSES}
+        self._tenant_finish: Dict[str, Dict[str, float]] = {priority: {} for priority in PRIORITY_CLASSES}
+        self._stats = {
+            priority: {"submitted": 0, "admitted": 0, "completed": 0, "wait_total_s": 0.0, "wait_max_s": 0.0}
+            for priority in PRIORITY_CLASSES
+        }
+        self._waits = {priority: deque(maxlen=WAIT_SAMPLES) for priority in PRIORITY_CLASSES}
+
+    def _enqueue(self, priority: str, tenant: str) -> Future:
+        future = Future()
+        with self._lock:
+            self._stats[priority]["submitted"] += 1
+            start = max(self._virtual_time[priority], self._tenant_finish[priority].get(tenant, 0.0))
+            finish = start + 1.0 / self.tenant_weights.get(tenant, 1.0)
+            self._tenant_finish[priority][tenant] = finish
+            heapq.heappush(self._queues[priority], (finish, next(self._sequence), time.perf_counter(), future))
+        self._dispatch()
+        return future
+
+    def _dispatch(self):
+        """Admit waiting calls while there is capacity"""
+        admitted = []
+        with self._lock:
+            while self._in_flight < self.max_in_flight:
+                priority = next((p for p in PRIORITY_CLASSES if self._queues[p]), None)
+                if priority is None:
+                    break
+                finish, _, enqueued, future = heapq.heappop(self._queues[priority])
+                self._virtual_time[priority] = finish
+                if not self._queues[priority]:
+                    # Idle class: forget finish times so returning tenants start level
+                    self._tenant_finish[priority].clear()
+                # Skips waiters that gave up; after this the grant can no longer be cancelled
+                if not future.set_running_or_notify_cancel():
+                    continue
+                self._in_flight += 1
+                self._record_wait(priority, time.perf_counter() - enqueued)
+                admitted.append(future)
+        for future in admitted:
+            future.set_result(None)
+
+    def _record_wait(self, priority: str, waited: float):
+        stats = self._stats[priority]
+        stats["admitted"] += 1
+        stats["wait_total_s"] += waited
+        stats["wait_max_s"] = max(stats["wait_max_s"], waited)
+        self._waits[priority].append(waited)
+
+    def _release(self, priority: str):
+        with self._lock:
+            self._in_flight -= 1
+            self._stats[priority]["completed"] += 1
+        self._dispatch()
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def set_max_in_flight(self, max_in_flight: int):
+        """Change the limit; calls already admitted keep their slots"""
+        with self._lock:
+            self.max_in_flight = max_in_flight
+        self._dispatch()
+
+    @contextmanager
+    def slot(self, priority: Optional[str] = None, tenant: Optional[str] = None):
+        """Hold one in-flight slot for the duration of an upstream call"""
+        priority = priority or current_priority()
+        self._enqueue(priority, tenant or current_tenant()).result()
+        try:
+            yield
+        finally:
+            self._release(priority)
+
+    def aslot(self, priority: Optional[str] = None, tenant: Optional[str] = None):
+        """Async version of slot; use as 'async with scheduler.aslot():'"""
+        return _AsyncSlot(self, priority or current_priority(), tenant or current_tenant())
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth and queue-wait metrics per priority class"""
+        with self._lock:
+            stats = {"in_flight": self._in_flight, "max_in_flight": self.max_in_flight, "classes": {}}
+            for priority in PRIORITY_CLASSES:
+                entry = dict(self._stats[priority])
+                waits = sorted(self._waits[priority])
+                entry["queued"] = len(self._queues[priority])
+                entry["wait_avg_s"] = entry["wait_total_s"] / entry["admitted"] if entry["admitted"] else 0.0
+                entry["wait_p95_s"] = waits[int(0.95 * (len(waits) - 1))] if waits else 0.0
+                stats["classes"][priority] = entry
+        return stats
+
+class _AsyncSlot:
+    def __init__(self, scheduler: LLMScheduler, priority: str, tenant: str):
+        self.scheduler = scheduler
+        self.priority = priority
+        self.tenant = tenant
+
+    async def __aenter__(self):
+        future = self.scheduler._enqueue(self.priority, self.tenant)
+        try:
+            await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            # Give the slot back if it was granted while we were being cancelled
+            if not future.cancel():
+                self.scheduler._release(self.priority)
+            raise
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.scheduler._release(self.priority)
+
+def parse_tenant_weights(value: str) -> Dict[str, float]:
+    """'tenant:weight,...' from LLM_TENANT_WEIGHTS"""
+    weights = {}
+    for entry in value.split(","):
+        if ":" in entry:
+            tenant, weight = entry.split(":", 1)
+            weights[tenant.strip()] = float(weight)
+    return weights
+
+# Global scheduler shared by every LLM call in the process
+llm_scheduler = LLMScheduler(settings.LLM_MAX_IN_FLIGHT, parse_tenant_weights(settings.LLM_TENANT_WEIGHTS))
@@ -0,0 +1,102 @@
+from concurrent.futures import Future
+from typing import Dict, Any, Optional
+from config.settings import settings
+from utils.token_budget import create_token_budget, record_token_usage
+import asyncio
+import threading
+import time
+
+class QueryPrefetcher:
+    """Analyzes (and optionally researches) a chosen query in the background
+
+    The interactive CLI starts a prefetch as soon as a query is picked and
+    takes the result once the user confirms; a declined query cancels the
+    in-flight calls. Work runs on a private asyncio loop so cancellation
+    actually aborts the upstream requests.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._query: Optional[str] = None
+        self._future: Optional[Future] = None
+        self._stats = {"started": 0, "used": 0, "cancelled": 0, "failed": 0}
+
+    def _event_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name="query-prefetch", daemon=True).start()
+            return self._loop
+
+    def start(self, query: str):
+        """Begin prefetching a query, replacing any other prefetch"""
+        if not settings.PREFETCH_ANALYSIS or (query == self._query and self._future is not None):
+            return
+        self.cancel()
+        self._query = query
+        self._future = asyncio.run_coroutine_threadsafe(self._prefetch(query), self._event_loop())
+        self._stats["started"] += 1
+
+    def cancel(self):
+        """Drop the current prefetch, aborting its calls if they are still running"""
+        if self._future is not None and self._future.cancel():
+            self._stats["cancelled"] += 1
+        self._future = None
+        self._query = None
+
+    def take(self, query: str) -> Optional[Dict[str, Any]]:
+        """Prefetched results for the query (waiting for them if needed), None when there are none"""
+        if self._future is None or query != self._query:
+            self.cancel()
+            return None
+
+        future = self._future
+        self._future = None
+        self._query = None
+        try:
+            prefetched = future.result()
+        except Exception as e:
+            self._stats["failed"] += 1
+            print(f"⚠️ Prefetch failed, running without it: {e}")
+            return None
+        self._stats["used"] += 1
+        return prefetched
+
+    async def _prefetch(self, query: str) -> Dict[str, Any]:
+        from utils.llm_helper import llm_helper
+        started = time.perf_counter()
+
+        analysis = await llm_helper.aanalyze_query(query)
+        prefetched = {"query": query, "query_analysis": analysis, "analysis_usage": llm_helper.last_usage}
+
+        if settings.PREFETCH_RESEARCH:
+            from agents.research_agent import research_prompts
+            # Scratch budget so the call gets the allocation a fresh run would give it
+            scratch = {"query": query, "query_analysis": analysis, "results": {}, "token_budget": create_token_budget()}
+            record_token_usage(scratch, "research", **prefetched["analysis_usage"])
+            system_prompt, user_prompt = research_prompts(query, analysis)
+            text = await llm_helper.agenerate_budgeted_response(scratch, "research", system_prompt, user_prompt)
+            prefetched["research"] = {"text": text, "usage": llm_helper.last_usage}
+
+        prefetched["elapsed_s"] = time.perf_counter() - started
+        return prefetched
+
+    def stats(self) -> Dict[str, int]:
+        return dict(self._stats)
+
+def apply_prefetch(state: Dict[str, Any], prefetched: Optional[Dict[str, Any]]):
+    """Seed a new run with results prefetched for its query"""
+    if not prefetched or prefetched["query"] != state.get("query"):
+        return
+    state["query_analysis"] = prefetched["query_analysis"]
+    record_token_usage(state, "research", **prefetched["analysis_usage"])
+    if "research" in prefetched:
+        state["prefetched"] = {"research": prefetched["research"]}
+
+def take_prefetched(state: Dict[str, Any], agent: str) -> Optional[Dict[str, Any]]:
+    """Prefetched output of an agent ({"text", "usage"}), used at most once"""
+    return (state.get("prefetched") or {}).pop(agent, None)
+
+# Global prefetcher used by the interactive CLI
+query_prefetcher = QueryPrefetcher()
@@ -0,0 +1,154 @@
+from typing import Dict, Any, Callable, List, Tuple
+from config.settings import settings
+import cProfile
+import pstats
+import threading
+import tracemalloc
+import time
+import os
+
+# Deepest caller chain written to the collapsed-stack files
+MAX_STACK_DEPTH = 64
+# Caller chains carrying less time than this are folded into their prefix
+MIN_STACK_SECONDS = 1e-6
+
+_lock = threading.Lock()
+_invocations: Dict[str, int] = {}
+_node_stats: Dict[str, pstats.Stats] = {}
+_output_dir = None
+# Nodes being profiled, and whether profiling started tracemalloc for them
+_traced_nodes = 0
+_started_tracing = False
+
+def profile_output_dir() -> str:
+    """Directory this process writes profiles to"""
+    global _output_dir
+    if _output_dir is None:
+        timestamp = time.strftime("%Y%m%d_%H%M%S")
+        _output_dir = os.path.join(settings.PROFILE_DIR, f"profile_{timestamp}_{os.getpid()}")
+        os.makedirs(_output_dir, exist_ok=True)
+    return _output_dir
+
+def profile_node(name: str, agent: Callable) -> Callable:
+    """Wrap a graph node with cProfile and tracemalloc
+
+    Each invocation writes <node>_<n>.pstats, <node>_<n>.collapsed and
+    <node>_<n>_alloc.txt; <node>.pstats accumulates all invocations.
+    """
+    def run_profiled(state):
+        _start_tracing()
+        before = tracemalloc.take_snapshot()
+        # Peak is reported relative to what was traced when the node started
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        profiler.enable()
+        try:
+            return agent(state)
+        finally:
+            profiler.disable()
+            elapsed = time.perf_counter() - started
+            peak = max(0, tracemalloc.get_traced_memory()[1] - baseline)
+            after = tracemalloc.take_snapshot()
+            _stop_tracing()
+            _write_node_profile(name, profiler, before, after, peak, elapsed)
+
+    return run_profiled
+
+def _start_tracing():
+    global _traced_nodes, _started_tracing
+    with _lock:
+        if _traced_nodes == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _started_tracing = True
+        _traced_nodes += 1
+
+def _stop_tracing():
+    """Stop tracemalloc once the last profiled node is done, if profiling started it"""
+    global _traced_nodes, _started_tracing
+    with _lock:
+        _traced_nodes -= 1
+        if _traced_nodes == 0 and _started_tracing:
+            tracemalloc.stop()
+            _started_tracing = False
+
+def _write_node_profile(name: str, profiler: cProfile.Profile, before, after, peak: int, elapsed: float):
+    output_dir = profile_output_dir()
+    with _lock:
+        _invocations[name] = _invocations.get(name, 0) + 1
+        prefix = os.path.join(output_dir, f"{name}_{_invocations[name]}")
+
+        stats = pstats.Stats(profiler)
+        stats.dump_stats(f"{prefix}.pstats")
+
+        if name in _node_stats:
+            _node_stats[name].add(stats)
+        else:
+            _node_stats[name] = pstats.Stats(profiler)
+        _node_stats[name].dump_stats(os.path.join(output_dir, f"{name}.pstats"))
+
+    write_collapsed_stacks(stats, f"{prefix}.collapsed")
+    write_allocation_report(name, before, after, peak, elapsed, f"{prefix}_alloc.txt")
+    print(f"⏱️ Profiler: {name} took {elapsed:.3f}s, peak {peak / 1024:.1f} KiB - {prefix}.*")
+
+def _frame_label(func: Tuple[str, int, str]) -> str:
+    filename, lineno, funcname = func
+    if filename == "~":
+        label = funcname
+    else:
+        label = f"{funcname} ({os.path.basename(filename)}:{lineno})"
+    return label.replace(";", ":").replace(" ", "_")
+
+def write_collapsed_stacks(stats: pstats.Stats, path: str):
+    """Write folded stacks (flamegraph.pl / speedscope format) in microseconds
+
+    cProfile only records caller edges, so self time is spread over the
+    caller chains in proportion to the time each caller accounted for.
+    """
+    raw = stats.stats
+    folded: Dict[str, float] = {}
+
+    def walk(func, weight: float, path: List[str], seen: set):
+        callers = raw.get(func, (0, 0, 0, 0, {}))[4]
+        candidates = {caller: timing for caller, timing in callers.items() if caller not in seen}
+        total = sum(timing[3] for timing in candidates.values())
+        if not candidates or total <= 0 or len(path) >= MAX_STACK_DEPTH or weight < MIN_STACK_SECONDS:
+            stack = ";".join(reversed(path))
+            folded[stack] = folded.get(stack, 0.0) + weight
+            return
+        for caller, timing in candidates.items():
+            walk(caller, weight * timing[3] / total, path + [_frame_label(caller)], seen | {caller})
+
+    for func, (_, _, self_time, _, _) in raw.items():
+        if self_time > 0:
+            walk(func, self_time, [_frame_label(func)], {func})
+
+    with open(path, 'w', encoding='utf-8') as f:
+        for stack, seconds in sorted(folded.items()):
+            microseconds = int(seconds * 1_000_000)
+            if microseconds > 0:
+                f.write(f"{stack} {microseconds}\n")
+
+def write_allocation_report(name: str, before, after, peak: int, elapsed: float, path: str):
+    """Write the top-N allocation sites a node added"""
+    top_stats = after.compare_to(before, "lineno")[:settings.PROFILE_TOP_N]
+
+    lines = [
+        f"Allocation report: {name}",
+        f"Elapsed: {elapsed:.3f}s",
+        f"Peak memory above node start: {peak / 1024:.1f} KiB",
+        "",
+        f"Top {len(top_stats)} allocation sites (size delta, count delta):"
+    ]
+    for stat in top_stats:
+        frame = stat.traceback[0]
+        lines.append(f"{stat.size_diff / 1024:+10.1f} KiB {stat.count_diff:+8d}  {frame.filename}:{frame.lineno}")
+
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("\n".join(lines) + "\n")
+
+def profiling_summary() -> Dict[str, Any]:
+    """Where profiles were written and how many invocations each node had"""
+    return {"output_dir": _output_dir, "invocations": dict(_invocations)}
@@ -0,0 +1,43 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Optional
+from models.events import EventType, ProgressEvent
+
+# (callback, stream_tokens) of the consumer listening in this context
+_listener: ContextVar[Optional[tuple]] = ContextVar("progress_listener", default=None)
+_current_node: ContextVar[Optional[str]] = ContextVar("progress_node", default=None)
+
+@contextmanager
+def progress_listener(callback: Callable[[ProgressEvent], None], stream_tokens: bool = True):
+    """Deliver progress events raised in this context to callback"""
+    token = _listener.set((callback, stream_tokens))
+    try:
+        yield
+    finally:
+        _listener.reset(token)
+
+@contextmanager
+def node_context(node: str):
+    """Mark the graph node currently running and report its start"""
+    token = _current_node.set(node)
+    emit_progress(EventType.NODE_STARTED)
+    try:
+        yield
+    finally:
+        _current_node.reset(token)
+
+def current_node() -> Optional[str]:
+    """Graph node running in this context"""
+    return _current_node.get()
+
+def wants_tokens() -> bool:
+    """True when a listener asked for partial LLM tokens"""
+    listener = _listener.get()
+    return bool(listener and listener[1])
+
+def emit_progress(event_type: EventType, node: Optional[str] = None, **data):
+    """Send a progress event to the active listener, if any"""
+    listener = _listener.get()
+    if listener is None:
+        return
+    listener[0](ProgressEvent(type=event_type, node=node or current_node(), data=data))
@@ -0,0 +1,320 @@
+from typing import Dict, Any, List, Tuple, Optional
+import string
+import threading
+import textwrap
+
+class PromptTemplate:
+    """A call site's prompts laid out for provider prefix caching
+
+    The system prompt and the instructions opening the user prompt are
+    static, so every call of the site shares that prefix; per-run variables
+    follow in a fixed order at the very end. Templates are compiled when
+    they are registered, at import.
+    """
+
+    def __init__(self, name: str, system: str, instructions: str = "", variables: Optional[List[Tuple[str, str]]] = None):
+        self.name = name
+        self.system = textwrap.dedent(system).strip()
+        self.instructions = textwrap.dedent(instructions).strip()
+        self.variables = variables or []
+        # Labels and layout are fixed here; render only substitutes values
+        self._format = "\n\n".join(f"{label}:\n{{{key}}}" for key, label in self.variables)
+        fields = [field for _, field, _, _ in string.Formatter().parse(self._format) if field]
+        if len(set(fields)) != len(fields):
+            raise ValueError(f"Prompt {name} repeats a variable")
+
+    def render(self, **values) -> Tuple[str, str]:
+        """(system_prompt, user_prompt) with the variables filled in"""
+        variables = self._format.format(**{key: values[key] for key, _ in self.variables})
+        user_prompt = f"{self.instructions}\n\n{variables}" if self.instructions else variables
+        return self.system, user_prompt
+
+PROMPTS: Dict[str, PromptTemplate] = {}
+
+def register_prompt(name: str, system: str, instructions: str = "", variables: Optional[List[Tuple[str, str]]] = None) -> PromptTemplate:
+    PROMPTS[name] = PromptTemplate(name, system, instructions, variables)
+    return PROMPTS[name]
+
+def render_prompt(name: str, **values) -> Tuple[str, str]:
+    """(system_prompt, user_prompt) of a registered call site"""
+    return PROMPTS[name].render(**values)
+
+def prompt_site(system_prompt: str) -> str:
+    """Call site a system prompt belongs to (structured calls may append a schema)"""
+    for name, template in PROMPTS.items():
+        if system_prompt.startswith(template.system):
+            return name
+    return "other"
+
+class PromptCacheStats:
+    """Prompt tokens served from the provider's prefix cache, per call site
+
+    The latency saved is estimated from the difference between the average
+    latency of calls without and with a cache hit.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sites: Dict[str, Dict[str, float]] = {}
+
+    def record(self, system_prompt: str, prompt_tokens: int, cached_tokens: int, latency: float):
+        site = prompt_site(system_prompt)
+        with self._lock:
+            stats = self._sites.setdefault(site, {
+                "calls": 0, "prompt_tokens": 0, "cached_tokens": 0,
+                "hit_calls": 0, "hit_latency": 0.0, "miss_calls": 0, "miss_latency": 0.0
+            })
+            stats["calls"] += 1
+            stats["prompt_tokens"] += prompt_tokens
+            stats["cached_tokens"] += cached_tokens
+            outcome = "hit" if cached_tokens else "miss"
+            stats[f"{outcome}_calls"] += 1
+            stats[f"{outcome}_latency"] += latency
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            sites = {site: dict(stats) for site, stats in self._sites.items()}
+        report = {}
+        for site, stats in sites.items():
+            hit_avg = stats["hit_latency"] / stats["hit_calls"] if stats["hit_calls"] else None
+            miss_avg = stats["miss_latency"] / stats["miss_calls"] if stats["miss_calls"] else None
+            saved = max(0.0, miss_avg - hit_avg) * stats["hit_calls"] if hit_avg is not None and miss_avg is not None else 0.0
+            report[site] = {
+                "calls": stats["calls"],
+                "cached_ratio": stats["cached_tokens"] / stats["prompt_tokens"] if stats["prompt_tokens"] else 0.0,
+                "cached_tokens": stats["cached_tokens"],
+                "hit_latency_avg_s": hit_avg,
+                "miss_latency_avg_s": miss_avg,
+                "latency_saved_s": saved
+            }
+        return report
+
+# Global per-process prompt cache statistics
+prompt_cache_stats = PromptCacheStats()
+
+register_prompt(
+    "query_analysis",
+    """
+    You are an expert query analyzer. Analyze the given query and return a JSON object with:
+    - intent: the main purpose (research, analysis, question, etc.)
+    - domain: the subject area (medical, financial, technical, general, etc.)
+    - complexity: low, medium, or high
+    - keywords: up to 10 important keywords
+    - suggested_agents: agent types that should handle this query
+    - estimated_time: rough estimate in minutes
+    """,
+    variables=[("query", "Analyze this query")]
+)
+
+register_prompt(
+    "routing_decision",
+    """
+    You are a supervisor agent coordinator. Based on the current state, decide which agent should handle the next task.
+    Available agents: team1 (research), team2 (repair), team3 (medical), team4 (financial), team5 (summary), team6 (document)
+    Set next_agent to the agent name (e.g., 'team1') or 'end' if workflow is complete.
+    """,
+    variables=[("state", "Current state")]
+)
+
+register_prompt(
+    "supervisor",
+    """
+    You are an intelligent supervisor managing a multi-agent workflow.
+    Based on the current state, decide the next agent to route to:
+
+    Available agents:
+    - team1: Research and initial analysis
+    - team2: Repair and quality assurance
+    - team3: Medical/pharmaceutical specialist
+    - team4: Financial analysis specialist
+    - team5: Summary and synthesis
+    - team6: Document processing and organization
+
+    Rules:
+    1. Start with team1 (research) if no research is done
+    2. Route to team3 for medical queries, team4 for financial queries
+    3. Use team2 for quality checks and repairs
+    4. Use team5 for summarization after main analysis
+    5. Use team6 for final document processing
+    6. Choose 'end' when all necessary tasks are complete
+
+    Set next_agent to the team name or 'end'.
+    """,
+    variables=[("routing_context", "Current workflow state")]
+)
+
+register_prompt(
+    "planner",
+    """
+    You are a workflow planner for a multi-agent analysis system.
+    Choose which teams are needed for the query:
+    - team1: Research and initial analysis (always required)
+    - team2: Repair and quality assurance
+    - team3: Medical/pharmaceutical specialist
+    - team4: Financial analysis specialist
+    - team5: Summary and synthesis (always required)
+    - team6: Document processing (always required)
+
+    Set teams to the list of team names, e.g. ["team1", "team3", "team5", "team6"].
+    """,
+    variables=[("query", "Query"), ("query_analysis", "Query analysis")]
+)
+
+register_prompt(
+    "research",
+    """
+    You are an expert research analyst. Conduct comprehensive research on the given query.
+    Provide detailed findings, identify key areas for investigation, and suggest follow-up actions.
+    Format your response as a structured analysis with clear sections.
+    """,
+    """
+    Research the query below. Provide:
+    1. Key research findings
+    2. Important insights
+    3. Areas requiring specialist attention
+    4. Confidence assessment
+    5. Recommendations for next steps
+    """,
+    [("query", "Query"), ("query_analysis", "Query analysis context")]
+)
+
+register_prompt(
+    "medical",
+    """
+    You are a medical AI specialist with expertise in healthcare, pharmaceuticals, and medical research.
+    Analyze the given query and research context to provide expert medical insights.
+
+    Important: Always include appropriate disclaimers about consulting healthcare professionals.
+    Focus on factual, evidence-based information.
+    """,
+    """
+    Medical Analysis Request. Please provide:
+    1. Medical/pharmaceutical analysis
+    2. Key medical concepts and terminology
+    3. Clinical relevance and implications
+    4. Safety considerations
+    5. Regulatory and compliance aspects
+    6. Recommendations for further medical consultation
+    """,
+    [("query", "Query"), ("research_context", "Research Context")]
+)
+
+register_prompt(
+    "financial",
+    """
+    You are a financial AI analyst with expertise in markets, investments, economic trends, and financial planning.
+    Provide comprehensive financial analysis based on the query and research context.
+
+    Include risk assessments, market insights, and actionable recommendations.
+    """,
+    """
+    Financial Analysis Request. Please provide:
+    1. Financial market analysis
+    2. Economic trends and indicators
+    3. Risk assessment and factors
+    4. Investment implications
+    5. Market opportunities and threats
+    6. Strategic recommendations
+    """,
+    [("query", "Query"), ("research_context", "Research Context")]
+)
+
+register_prompt(
+    "repair",
+    """
+    You are an AI quality assurance specialist. Analyze the current workflow state and results to identify:
+    1. Potential errors or inconsistencies
+    2. Missing information or gaps
+    3. Quality issues in the analysis
+    4. Recommendations for improvements
+    5. Overall confidence assessment
+
+    Provide specific, actionable feedback for each identified issue.
+    """,
+    """
+    Quality Assessment Request. Please assess:
+    1. Are there any logical inconsistencies?
+    2. Is the analysis complete for the given query?
+    3. Are confidence scores reasonable?
+    4. What improvements could be made?
+    5. Overall quality rating (1-10)
+    """,
+    [("analysis_context", "Workflow Context"), ("quality_check_data", "Results Overview")]
+)
+
+register_prompt(
+    "summary",
+    """
+    You are an expert synthesis analyst. Create a comprehensive, well-structured summary
+    that integrates all the specialist analyses into a coherent, actionable report.
+
+    Structure your summary with:
+    1. Executive Summary
+    2. Key Findings by Domain
+    3. Cross-Domain Insights
+    4. Recommendations
+    5. Conclusion
+
+    Make it professional, clear, and actionable.
+    """,
+    "Create a comprehensive summary for the query below from the specialist analyses.",
+    [
+        ("query", "Query"),
+        ("analyses", "Specialist Analyses to Synthesize"),
+        ("total_agents", "Total agents involved"),
+        ("complexity", "Query complexity"),
+        ("domain", "Domain focus")
+    ]
+)
+
+register_prompt(
+    "document_planning",
+    """
+    You are an expert document architect and technical writer.
+    Create a comprehensive document structure and organization plan for the multi-agent analysis results.
+
+    Your task is to:
+    1. Analyze all the results and create a logical document hierarchy
+    2. Suggest appropriate document types and formats
+    3. Recommend content organization strategies
+    4. Provide executive summary recommendations
+    5. Suggest visualization and presentation formats
+
+    Focus on creating professional, well-structured documentation that would be suitable for business or research purposes.
+    """,
+    """
+    Document Organization Request. Please provide:
+    1. Recommended document structure and hierarchy
+    2. Content organization strategy
+    3. Executive summary approach
+    4. Key sections to highlight
+    5. Professional formatting recommendations
+    """,
+    [("document_context", "Analysis Context"), ("sections", "Available Content Sections")]
+)
+
+register_prompt(
+    "executive_summary",
+    """
+    You are an executive summary specialist. Create a concise, high-level executive summary
+    that captures the key insights, findings, and recommendations from the multi-agent analysis.
+
+    Format it for C-level executives and decision-makers. Focus on actionable insights and strategic implications.
+    """,
+    """
+    Create an executive summary for the analysis below. Include:
+    1. Key findings (3-5 bullet points)
+    2. Strategic implications
+    3. Recommended actions
+    4. Risk considerations
+    5. Next steps
+    """,
+    [("query", "Query"), ("results", "Key Results Available"), ("summary", "Comprehensive Summary")]
+)
+
+register_prompt(
+    "document_metadata",
+    "You are a metadata specialist. Generate comprehensive document metadata.",
+    "Generate comprehensive metadata for the document collection below: a title, tags, categories, and search keywords.",
+    [("query", "Query"), ("total_documents", "Total Documents"), ("document_types", "Document Types")]
+)
@@ -0,0 +1,151 @@
+from typing import Dict, Any, Optional
+from config.settings import settings
+from utils.hashing import stable_hash
+from utils.extractive import STOPWORDS
+from utils.endpoint_pool import load_endpoint_configs
+import sqlite3
+import threading
+import json
+import time
+import zlib
+import re
+
+# Bump when the shape of cached final states changes
+CACHE_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS run_cache (
+    key TEXT PRIMARY KEY,
+    query TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    last_access REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0,
+    size INTEGER NOT NULL,
+    state_json BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_run_cache_last_access ON run_cache(last_access);
+"""
+
+def normalize_query(query: str) -> str:
+    """Query with case, punctuation, whitespace and stop words normalized away"""
+    words = re.findall(r"\w+", query.lower())
+    return " ".join(word for word in words if word not in STOPWORDS)
+
+def endpoint_models() -> list:
+    """Model mapping of each configured endpoint, without names or keys"""
+    return sorted((config.get("models") or {} for config in load_endpoint_configs()), key=stable_hash)
+
+def settings_fingerprint(token_budget: Optional[int] = None, mode: Optional[str] = None) -> str:
+    """Hash of the configuration a run's result depends on"""
+    return stable_hash([
+        CACHE_VERSION,
+        settings.OPENAI_MODEL,
+        settings.OPENAI_FAST_MODEL,
+        endpoint_models(),
+        settings.STRUCTURED_OUTPUT_MODE,
+        settings.MAX_TOKENS,
+        settings.TEMPERATURE,
+        mode or settings.ORCHESTRATION_MODE,
+        settings.PLANNER_MODE,
+        settings.RUN_TOKEN_BUDGET if token_budget is None else token_budget,
+        settings.REUSE_POLICY
+    ])
+
+def cache_key(query: str, token_budget: Optional[int] = None, mode: Optional[str] = None) -> str:
+    return stable_hash([normalize_query(query), settings_fingerprint(token_budget, mode)])
+
+def cacheable(final_state: Dict[str, Any]) -> bool:
+    """Runs degraded to meet a deadline are not worth serving again"""
+    deadline = final_state.get("deadline") or {}
+    return not (deadline.get("skipped") or deadline.get("degraded_calls") or deadline.get("wrap_up_forced"))
+
+class RunCache:
+    """SQLite cache of finished runs (final state with documents) with TTL and LRU size bound"""
+
+    def __init__(self, path: Optional[str] = None, ttl_hours: Optional[float] = None, max_mb: Optional[float] = None):
+        self.path = path or settings.RUN_CACHE_DB
+        self.ttl_hours = settings.RUN_CACHE_TTL_HOURS if ttl_hours is None else ttl_hours
+        self.max_bytes = int((settings.RUN_CACHE_MAX_MB if max_mb is None else max_mb) * 1024 * 1024)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Cached final state for a key, None when missing or expired"""
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT created_at, state_json FROM run_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if self.ttl_hours and time.time() - row["created_at"] > self.ttl_hours * 3600:
+                self._conn.execute("DELETE FROM run_cache WHERE key = ?", (key,))
+                return None
+            self._conn.execute("UPDATE run_cache SET last_access = ?, hits = hits + 1 WHERE key = ?", (time.time(), key))
+        return json.loads(zlib.decompress(row["state_json"]).decode("utf-8"))
+
+    def put(self, key: str, query: str, final_state: Dict[str, Any]):
+        """Store a final state and evict down to the size bound"""
+        data = zlib.compress(json.dumps(final_state, default=str).encode("utf-8"))
+        if self.max_bytes and len(data) > self.max_bytes:
+            return
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                """INSERT OR REPLACE INTO run_cache (key, query, created_at, last_access, hits, size, state_json)
+                   VALUES (?, ?, ?, ?, 0, ?, ?)""",
+                (key, query, now, now, len(data), data)
+            )
+            self._evict()
+
+    def _evict(self):
+        """Drop expired entries, then least recently used ones beyond the size bound"""
+        if self.ttl_hours:
+            self._conn.execute("DELETE FROM run_cache WHERE created_at < ?", (time.time() - self.ttl_hours * 3600,))
+        if not self.max_bytes:
+            return
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM run_cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for row in self._conn.execute("SELECT key, size FROM run_cache ORDER BY last_access").fetchall():
+            self._conn.execute("DELETE FROM run_cache WHERE key = ?", (row["key"],))
+            total -= row["size"]
+            if total <= self.max_bytes:
+                break
+
+    def clear(self) -> int:
+        with self._lock, self._conn:
+            return self._conn.execute("DELETE FROM run_cache").rowcount
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COUNT(*) AS entries, COALESCE(SUM(size), 0) AS bytes, COALESCE(SUM(hits), 0) AS hits FROM run_cache"
+            ).fetchone()
+        return dict(row)
+
+def load_cached_run(query: str, token_budget: Optional[int] = None, mode: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """Final state of an earlier identical run, marked with cache_hit"""
+    cache = RunCache()
+    try:
+        final_state = cache.get(cache_key(query, token_budget, mode))
+    finally:
+        cache.close()
+    if final_state is not None:
+        final_state["cache_hit"] = True
+    return final_state
+
+def store_run(query: str, final_state: Dict[str, Any], token_budget: Optional[int] = None, mode: Optional[str] = None) -> bool:
+    """Cache a finished run (materialized); returns whether it was stored"""
+    if not cacheable(final_state):
+        return False
+    cache = RunCache()
+    try:
+        cache.put(cache_key(query, token_budget, mode), query, final_state)
+    finally:
+        cache.close()
+    return True
@@ -0,0 +1,273 @@
+from typing import Dict, Any, List, Optional
+from config.settings import settings
+from utils.blob_store import materialize_state
+from datetime import datetime
+import argparse
+import sqlite3
+import threading
+import json
+import time
+import zlib
+import os
+import re
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    run_id TEXT UNIQUE,
+    created_at REAL NOT NULL,
+    query TEXT NOT NULL,
+    domain TEXT,
+    complexity TEXT,
+    agents TEXT,
+    latency_s REAL,
+    tokens INTEGER,
+    summary TEXT,
+    agent_texts TEXT,
+    state_json BLOB
+);
+CREATE INDEX IF NOT EXISTS idx_runs_created_at ON runs(created_at);
+CREATE INDEX IF NOT EXISTS idx_runs_domain ON runs(domain);
+CREATE VIRTUAL TABLE IF NOT EXISTS runs_fts USING fts5(
+    query, summary, specialist_text, tokenize = 'porter unicode61'
+);
+"""
+
+# Agent texts that are indexed as specialist text
+SPECIALIST_AGENTS = ["research", "medical", "financial", "repair"]
+
+def run_record(final_state: Dict[str, Any], latency_s: Optional[float] = None, created_at: Optional[float] = None) -> Dict[str, Any]:
+    """Row for a finished run (texts must already be materialized); created_at defaults to now"""
+    analysis = final_state.get("query_analysis", {})
+    llm_responses = final_state.get("llm_responses", {})
+    agent_texts = {agent: text for agent, text in llm_responses.items() if agent != "documents"}
+
+    return {
+        "run_id": final_state.get("run_id"),
+        "created_at": time.time() if created_at is None else created_at,
+        "query": final_state.get("query", ""),
+        "domain": str(analysis.get("domain", "general")),
+        "complexity": str(analysis.get("complexity", "medium")),
+        "agents": json.dumps(list(llm_responses.keys())),
+        "latency_s": latency_s,
+        "tokens": final_state.get("token_budget", {}).get("spent", 0),
+        "summary": final_state.get("summary", ""),
+        "agent_texts": json.dumps(agent_texts),
+        "specialist_text": "\n\n".join(str(agent_texts[agent]) for agent in SPECIALIST_AGENTS if agent in agent_texts),
+        "state_json": zlib.compress(json.dumps(final_state, default=str).encode("utf-8"))
+    }
+
+def fts_query(text: str) -> str:
+    """Plain search words as an FTS5 query matching all of them"""
+    terms = re.findall(r"\w+", text.lower())
+    return " ".join(f'"{term}"' for term in terms)
+
+class RunHistory:
+    """SQLite-backed run history with full-text search over query, summary and specialist texts"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or settings.RUN_HISTORY_DB
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def record_run(self, final_state: Dict[str, Any], latency_s: Optional[float] = None) -> int:
+        """Store a finished run"""
+        return self.record_runs([run_record(final_state, latency_s)])
+
+    def record_runs(self, records: List[Dict[str, Any]]) -> int:
+        """Bulk insert run records in a single transaction"""
+        with self._lock, self._conn:
+            for record in records:
+                # Replacing a run drops its old index entry first
+                self._conn.execute(
+                    "DELETE FROM runs_fts WHERE rowid IN (SELECT id FROM runs WHERE run_id = ?)",
+                    (record["run_id"],)
+                )
+                cursor = self._conn.execute(
+                    """INSERT OR REPLACE INTO runs
+                       (run_id, created_at, query, domain, complexity, agents, latency_s, tokens, summary, agent_texts, state_json)
+                       VALUES (:run_id, :created_at, :query, :domain, :complexity, :agents, :latency_s, :tokens, :summary, :agent_texts, :state_json)""",
+                    record
+                )
+                self._conn.execute(
+                    "INSERT INTO runs_fts (rowid, query, summary, specialist_text) VALUES (?, ?, ?, ?)",
+                    (cursor.lastrowid, record["query"], record["summary"], record["specialist_text"])
+                )
+        return len(records)
+
+    def search(self, text: str, limit: int = 10, domain: Optional[str] = None, complexity: Optional[str] = None, raw: bool = False) -> List[Dict[str, Any]]:
+        """Best matching runs, most relevant first
+
+        Plain words must all match; pass raw=True to use FTS5 query syntax.
+        """
+        match = text if raw else fts_query(text)
+        if not match:
+            return []
+
+        sql = """SELECT runs.run_id, runs.created_at, runs.query, runs.domain, runs.complexity,
+                        runs.agents, runs.latency_s, runs.tokens,
+                        snippet(runs_fts, -1, '[', ']', '...', 12) AS snippet,
+                        bm25(runs_fts, 5.0, 2.0, 1.0) AS score
+                 FROM runs_fts JOIN runs ON runs.id = runs_fts.rowid
+                 WHERE runs_fts MATCH ?"""
+        params: List[Any] = [match]
+        if domain:
+            sql += " AND runs.domain LIKE ?"
+            params.append(f"%{domain}%")
+        if complexity:
+            sql += " AND runs.complexity = ?"
+            params.append(complexity)
+        sql += " ORDER BY score LIMIT ?"
+        params.append(limit)
+
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [dict(row, agents=json.loads(row["agents"] or "[]")) for row in rows]
+
+    def recent_runs(self, limit: int = 1000, since: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Latest runs with their query and agent texts"""
+        sql = "SELECT run_id, created_at, query, domain, complexity, summary, agent_texts FROM runs"
+        params: List[Any] = []
+        if since is not None:
+            sql += " WHERE created_at >= ?"
+            params.append(since)
+        sql += " ORDER BY created_at DESC LIMIT ?"
+        params.append(limit)
+
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [dict(row, agent_texts=json.loads(row["agent_texts"] or "{}")) for row in rows]
+
+    def get_run(self, run_id: str) -> Optional[Dict[str, Any]]:
+        """Full final state of a stored run"""
+        with self._lock:
+            row = self._conn.execute("SELECT state_json FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+        if row is None:
+            return None
+        return json.loads(zlib.decompress(row["state_json"]).decode("utf-8"))
+
+    def apply_retention(self, max_age_days: Optional[float] = None, max_runs: Optional[int] = None) -> int:
+        """Delete runs older than max_age_days and beyond the newest max_runs"""
+        conditions = []
+        params: List[Any] = []
+        if max_age_days:
+            conditions.append("created_at < ?")
+            params.append(time.time() - max_age_days * 86400)
+        if max_runs:
+            conditions.append("id NOT IN (SELECT id FROM runs ORDER BY created_at DESC LIMIT ?)")
+            params.append(max_runs)
+        if not conditions:
+            return 0
+
+        where = " OR ".join(conditions)
+        with self._lock, self._conn:
+            self._conn.execute(f"DELETE FROM runs_fts WHERE rowid IN (SELECT id FROM runs WHERE {where})", params)
+            deleted = self._conn.execute(f"DELETE FROM runs WHERE {where}", params).rowcount
+        return deleted
+
+    def compact(self):
+        """Merge FTS segments and reclaim free pages"""
+        with self._lock:
+            with self._conn:
+                self._conn.execute("INSERT INTO runs_fts (runs_fts) VALUES ('optimize')")
+            self._conn.execute("VACUUM")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COUNT(*) AS runs, MIN(created_at) AS oldest, MAX(created_at) AS newest, SUM(tokens) AS tokens FROM runs"
+            ).fetchone()
+        return dict(row)
+
+def record_finished_run(final_state: Dict[str, Any], latency_s: float):
+    """Store a run in the configured history database and apply retention"""
+    history = RunHistory()
+    try:
+        history.record_run(final_state, latency_s)
+        if settings.RUN_HISTORY_MAX_AGE_DAYS or settings.RUN_HISTORY_MAX_RUNS:
+            history.apply_retention(settings.RUN_HISTORY_MAX_AGE_DAYS, settings.RUN_HISTORY_MAX_RUNS)
+    finally:
+        history.close()
+
+def result_file_time(final_state: Dict[str, Any], path: str) -> float:
+    """When a results file's run finished: its timestamp field, else the file's mtime"""
+    timestamp = final_state.get("timestamp")
+    if isinstance(timestamp, (int, float)):
+        return float(timestamp)
+    if isinstance(timestamp, str):
+        try:
+            return datetime.fromisoformat(timestamp).timestamp()
+        except ValueError:
+            pass
+    return os.path.getmtime(path)
+
+def import_result_files(history: RunHistory, paths: List[str]) -> int:
+    """Load ai_multi_agent_results_*.json files into the history"""
+    records = []
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            final_state = json.load(f)
+        blobs = final_state.pop("blobs", {})
+        final_state = materialize_state(final_state, blobs)
+        final_state.setdefault("run_id", path)
+        records.append(run_record(final_state, created_at=result_file_time(final_state, path)))
+    return history.record_runs(records)
+
+def main():
+    parser = argparse.ArgumentParser(description="Search and maintain the run history")
+    parser.add_argument("--db", default=None, help="history database (default: RUN_HISTORY_DB)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    search = commands.add_parser("search", help="full-text search over past runs")
+    search.add_argument("text")
+    search.add_argument("--limit", type=int, default=10)
+    search.add_argument("--domain")
+    search.add_argument("--complexity")
+    search.add_argument("--raw", action="store_true", help="treat text as an FTS5 query")
+
+    show = commands.add_parser("show", help="print the stored final state of a run")
+    show.add_argument("run_id")
+
+    prune = commands.add_parser("prune", help="apply retention limits")
+    prune.add_argument("--max-age-days", type=float)
+    prune.add_argument("--max-runs", type=int)
+
+    commands.add_parser("compact", help="optimize the index and vacuum the database")
+    commands.add_parser("stats", help="show history size")
+
+    load = commands.add_parser("import", help="import ai_multi_agent_results_*.json files")
+    load.add_argument("paths", nargs="+")
+
+    args = parser.parse_args()
+    if not (args.db or settings.RUN_HISTORY_DB):
+        parser.error("no history database: pass --db or set RUN_HISTORY_DB")
+    history = RunHistory(args.db)
+
+    if args.command == "search":
+        for run in history.search(args.text, args.limit, args.domain, args.complexity, args.raw):
+            created = time.strftime("%Y-%m-%d %H:%M", time.localtime(run["created_at"]))
+            print(f"{run['run_id']}  {created}  [{run['domain']}/{run['complexity']}]  {run['query']}")
+            print(f"    {run['snippet']}")
+    elif args.command == "show":
+        print(json.dumps(history.get_run(args.run_id), indent=2))
+    elif args.command == "prune":
+        print(f"Deleted {history.apply_retention(args.max_age_days, args.max_runs)} runs")
+    elif args.command == "compact":
+        history.compact()
+        print("History compacted")
+    elif args.command == "stats":
+        print(json.dumps(history.stats(), indent=2))
+    elif args.command == "import":
+        print(f"Imported {import_result_files(history, args.paths)} runs")
+
+    history.close()
+
+if __name__ == "__main__":
+    main()
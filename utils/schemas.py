@@ -0,0 +1,98 @@
+from typing import Dict, Any
+
+TEAMS = ["team1", "team2", "team3", "team4", "team5", "team6"]
+
+# JSON schemas of the structured-output calls, with the completion tokens each needs
+STRUCTURED_OUTPUTS = {
+    "routing_decision": {
+        "max_tokens": 20,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "next_agent": {"type": "string", "enum": TEAMS + ["end"]}
+            },
+            "required": ["next_agent"],
+            "additionalProperties": False
+        }
+    },
+    "query_analysis": {
+        "max_tokens": 250,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "intent": {"type": "string"},
+                "domain": {"type": "string"},
+                "complexity": {"type": "string", "enum": ["low", "medium", "high"]},
+                "keywords": {"type": "array", "items": {"type": "string"}},
+                "suggested_agents": {
+                    "type": "array",
+                    "items": {"type": "string", "enum": ["research", "repair", "medical", "financial", "summary", "documents"]}
+                },
+                "estimated_time": {"type": "string"}
+            },
+            "required": ["intent", "domain", "complexity", "keywords", "suggested_agents", "estimated_time"],
+            "additionalProperties": False
+        }
+    },
+    "execution_plan": {
+        "max_tokens": 40,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "teams": {"type": "array", "items": {"type": "string", "enum": TEAMS}}
+            },
+            "required": ["teams"],
+            "additionalProperties": False
+        }
+    },
+    "document_metadata": {
+        "max_tokens": 300,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "title": {"type": "string"},
+                "tags": {"type": "array", "items": {"type": "string"}},
+                "categories": {"type": "array", "items": {"type": "string"}},
+                "search_keywords": {"type": "array", "items": {"type": "string"}}
+            },
+            "required": ["title", "tags", "categories", "search_keywords"],
+            "additionalProperties": False
+        }
+    }
+}
+
+class SchemaValidationError(ValueError):
+    """A structured output that does not match its schema"""
+
+_JSON_TYPES = {
+    "object": dict,
+    "array": list,
+    "string": str,
+    "integer": int,
+    "number": (int, float),
+    "boolean": bool
+}
+
+def validate_schema(value: Any, schema: Dict[str, Any], path: str = "$"):
+    """Check a value against the JSON-schema subset used by STRUCTURED_OUTPUTS"""
+    expected = schema.get("type")
+    if expected and (not isinstance(value, _JSON_TYPES[expected]) or (expected != "boolean" and isinstance(value, bool))):
+        raise SchemaValidationError(f"{path}: expected {expected}, got {type(value).__name__}")
+
+    if "enum" in schema and value not in schema["enum"]:
+        raise SchemaValidationError(f"{path}: {value!r} is not one of {schema['enum']}")
+
+    if expected == "object":
+        properties = schema.get("properties", {})
+        for key in schema.get("required", []):
+            if key not in value:
+                raise SchemaValidationError(f"{path}: missing required property '{key}'")
+        for key, item in value.items():
+            if key in properties:
+                validate_schema(item, properties[key], f"{path}.{key}")
+            elif schema.get("additionalProperties") is False:
+                raise SchemaValidationError(f"{path}: unexpected property '{key}'")
+
+    if expected == "array":
+        for index, item in enumerate(value):
+            validate_schema(item, schema.get("items", {}), f"{path}[{index}]")
@@ -0,0 +1,169 @@
+from typing import Dict, Any, List, Optional, Tuple
+from config.settings import settings
+from utils.run_history import RunHistory
+from utils.blob_store import intern_text, resolve_text
+import numpy as np
+import threading
+import time
+import zlib
+import re
+
+N_FEATURES = 2 ** 18
+
+def text_features(text: str) -> Dict[int, float]:
+    """Hashed word unigram, word bigram and character trigram counts"""
+    words = re.findall(r"\w+", text.lower())
+    grams = list(words)
+    grams.extend(f"{a} {b}" for a, b in zip(words, words[1:]))
+    for word in words:
+        padded = f"#{word}#"
+        grams.extend(f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2))
+
+    counts: Dict[int, float] = {}
+    for gram in grams:
+        index = zlib.crc32(gram.encode("utf-8")) % N_FEATURES
+        counts[index] = counts.get(index, 0.0) + 1.0
+    return counts
+
+class SimilarityIndex:
+    """TF-IDF cosine similarity over hashed n-grams of past queries
+
+    Documents are stored sparsely (feature indices and weights per run), so
+    memory grows with the text, not with the hash space.
+    """
+
+    def __init__(self, runs: List[Dict[str, Any]]):
+        featured = [(run, text_features(run["query"])) for run in runs]
+        featured = [(run, counts) for run, counts in featured if counts]
+        self.runs = [run for run, _ in featured]
+        features = [counts for _, counts in featured]
+
+        document_frequency = np.zeros(N_FEATURES, dtype=np.float32)
+        for counts in features:
+            document_frequency[list(counts)] += 1
+        self.idf = np.log((1 + len(features)) / (1 + document_frequency)).astype(np.float32) + 1
+
+        indices, weights, offsets = [], [], []
+        total = 0
+        for counts in features:
+            offsets.append(total)
+            total += len(counts)
+            index = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+            weight = self._weigh(index, np.fromiter(counts.values(), dtype=np.float32, count=len(counts)))
+            indices.append(index)
+            weights.append(weight)
+
+        self._offsets = np.array(offsets, dtype=np.int64)
+        self._indices = np.concatenate(indices) if indices else np.zeros(0, dtype=np.int64)
+        self._weights = np.concatenate(weights) if weights else np.zeros(0, dtype=np.float32)
+
+    def _weigh(self, index: np.ndarray, counts: np.ndarray) -> np.ndarray:
+        """Log-scaled TF times IDF, L2-normalized"""
+        weight = (1 + np.log(counts)) * self.idf[index]
+        norm = np.linalg.norm(weight)
+        return weight / norm if norm else weight
+
+    def query(self, text: str, k: int = 3) -> List[Tuple[float, Dict[str, Any]]]:
+        """Most similar past runs as (cosine similarity, run) pairs"""
+        if not self.runs or not len(self._indices):
+            return []
+
+        counts = text_features(text)
+        if not counts:
+            return []
+        index = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+        dense = np.zeros(N_FEATURES, dtype=np.float32)
+        dense[index] = self._weigh(index, np.fromiter(counts.values(), dtype=np.float32, count=len(counts)))
+
+        # Sparse dot product of every stored run with the dense query vector
+        scores = np.add.reduceat(dense[self._indices] * self._weights, self._offsets)
+        best = np.argsort(-scores)[:k]
+        return [(float(scores[i]), self.runs[i]) for i in best]
+
+_index_lock = threading.Lock()
+_cached_index: Dict[str, Any] = {}
+
+def history_index() -> SimilarityIndex:
+    """Index over runs inside the reuse TTL, rebuilt when the history changes"""
+    history = RunHistory()
+    try:
+        since = time.time() - settings.REUSE_TTL_HOURS * 3600
+        stats = history.stats()
+        key = (settings.RUN_HISTORY_DB, stats["runs"], stats["newest"], int(since // 3600))
+        with _index_lock:
+            if _cached_index.get("key") != key:
+                _cached_index["index"] = SimilarityIndex(history.recent_runs(settings.REUSE_MAX_RUNS, since))
+                _cached_index["key"] = key
+            return _cached_index["index"]
+    finally:
+        history.close()
+
+def reuse_policy() -> Dict[str, str]:
+    """Per-agent reuse mode from REUSE_POLICY ('agent:reuse' or 'agent:context')"""
+    policy = {}
+    for entry in settings.REUSE_POLICY.split(","):
+        if ":" in entry:
+            agent, mode = entry.split(":", 1)
+            if mode.strip() in ["reuse", "context"]:
+                policy[agent.strip()] = mode.strip()
+    return policy
+
+def find_prior_analysis(state: Dict[str, Any]) -> Dict[str, Any]:
+    """Prior run similar enough to the query for its outputs to be reused"""
+    policy = reuse_policy()
+    if not policy or not settings.RUN_HISTORY_DB:
+        return {}
+
+    matches = history_index().query(state.get("query", ""), k=1)
+    if not matches or matches[0][0] < settings.REUSE_SIMILARITY_THRESHOLD:
+        return {}
+
+    similarity, run = matches[0]
+    texts = {
+        agent: intern_text(state, run["agent_texts"][agent])
+        for agent in policy if run["agent_texts"].get(agent)
+    }
+    if not texts:
+        return {}
+
+    return {
+        "run_id": run["run_id"],
+        "query": run["query"],
+        "similarity": round(similarity, 4),
+        "age_hours": round((time.time() - run["created_at"]) / 3600, 2),
+        "modes": {agent: policy[agent] for agent in texts},
+        "texts": texts,
+        "reused": [],
+        "injected": []
+    }
+
+def use_prior_output(state: Dict[str, Any], agent: str, user_prompt: str) -> Tuple[Optional[str], str, str]:
+    """Reuse, or build on, a prior run's output for an agent
+
+    Returns (mode, prior text, user prompt); mode is None when there is no
+    prior output, and in "context" mode the prompt carries the prior text.
+    The agent is recorded as reused or injected once, in copies of the
+    prior analysis lists, so reruns of a node do not repeat it.
+    """
+    prior = state.get("prior_analysis") or {}
+    mode = prior.get("modes", {}).get(agent)
+    if not mode:
+        return None, "", user_prompt
+
+    key = "reused" if mode == "reuse" else "injected"
+    if agent not in prior[key]:
+        state["prior_analysis"] = {**prior, key: prior[key] + [agent]}
+    text = prior["texts"][agent]
+    if mode == "context":
+        user_prompt += prior_context(state, text)
+    return mode, text, user_prompt
+
+def prior_context(state: Dict[str, Any], text: str) -> str:
+    """Prompt block carrying a prior run's output as context"""
+    prior = state["prior_analysis"]
+    return f"""
+
+    Prior analysis of a similar query ("{prior['query']}", {prior['similarity']:.0%} match, {prior['age_hours']:.0f}h old):
+    {resolve_text(state, text)}
+
+    Build on this prior analysis where it still applies; update anything that may have changed."""
@@ -0,0 +1,97 @@
+from concurrent.futures import Future
+from typing import Dict, Any, Callable, Awaitable, Optional, Tuple
+import asyncio
+import threading
+
+class LeaderAbandoned(Exception):
+    """The call a follower waited on was cancelled or interrupted in its leader"""
+
+class SingleFlight:
+    """Coalesces identical in-flight calls so they share one execution
+
+    Threads and asyncio tasks share the same in-flight table: whichever
+    caller arrives first runs the call, later callers with the same key
+    wait for its result (or exception). When the leader is cancelled or
+    interrupted instead, its followers re-issue the call themselves.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._in_flight: Dict[str, Future] = {}
+        self._stats = {"calls": 0, "executed": 0, "coalesced": 0}
+
+    def _join(self, key: str) -> Tuple[Future, bool]:
+        with self._lock:
+            self._stats["calls"] += 1
+            future = self._in_flight.get(key)
+            if future is not None:
+                self._stats["coalesced"] += 1
+                return future, False
+            future = Future()
+            self._in_flight[key] = future
+            self._stats["executed"] += 1
+            return future, True
+
+    def _finish(self, key: str, future: Future, result: Any = None, error: Optional[BaseException] = None):
+        # Leave the table first, so followers re-issuing the call do not rejoin this future
+        with self._lock:
+            if self._in_flight.get(key) is future:
+                del self._in_flight[key]
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Run fn once per key among concurrent callers; returns (result, shared)"""
+        while True:
+            future, leader = self._join(key)
+            if leader:
+                break
+            try:
+                return future.result(), True
+            except LeaderAbandoned:
+                # The leader was cancelled or interrupted; this caller was not
+                continue
+
+        try:
+            result = fn()
+        except Exception as e:
+            self._finish(key, future, error=e)
+            raise
+        except BaseException:
+            self._finish(key, future, error=LeaderAbandoned(key))
+            raise
+        self._finish(key, future, result)
+        return result, False
+
+    async def ado(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Async version of do"""
+        while True:
+            future, leader = self._join(key)
+            if leader:
+                break
+            try:
+                # Shielded: a cancelled follower must not cancel the shared future
+                return await asyncio.shield(asyncio.wrap_future(future)), True
+            except LeaderAbandoned:
+                continue
+
+        try:
+            result = await fn()
+        except Exception as e:
+            self._finish(key, future, error=e)
+            raise
+        except BaseException:
+            self._finish(key, future, error=LeaderAbandoned(key))
+            raise
+        self._finish(key, future, result)
+        return result, False
+
+    def stats(self) -> Dict[str, Any]:
+        """Call counts, including how many calls were coalesced"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["in_flight"] = len(self._in_flight)
+        stats["coalesced_ratio"] = stats["coalesced"] / stats["calls"] if stats["calls"] else 0.0
+        return stats
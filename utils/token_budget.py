@@ -0,0 +1,137 @@
+from typing import Dict, Any, Optional
+from config.settings import settings
+
+# Total tokens a run may spend, by query complexity
+COMPLEXITY_BUDGETS = {
+    "low": 16000,
+    "medium": 30000,
+    "high": 50000
+}
+
+# Completion tokens each agent asks for when the budget is untouched
+AGENT_COMPLETION_TOKENS = {
+    "supervisor": 20,
+    "research": 1500,
+    "medical": 1200,
+    "financial": 1200,
+    "repair": 800,
+    "summary": 1500,
+    "documents": 1000
+}
+
+# Stages that must still run once the budget is spent
+WRAP_UP_AGENTS = ["summary", "documents"]
+
+# Tokens held back so summary and documents can always finish
+WRAP_UP_RESERVE = {
+    "summary": 4000,
+    "documents": 4000
+}
+
+MIN_COMPLETION_TOKENS = 150
+# User prompts are never trimmed below this, even when nothing is left for them
+MIN_PROMPT_TOKENS = 200
+CHARS_PER_TOKEN = 4
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count used when the provider reports no usage"""
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+def create_token_budget(complexity: str = "medium", cap: Optional[int] = None) -> Dict[str, Any]:
+    """Create a per-run token budget seeded from query complexity"""
+    complexity = (complexity or "medium").lower()
+    total = COMPLEXITY_BUDGETS.get(complexity, COMPLEXITY_BUDGETS["medium"])
+
+    cap = settings.RUN_TOKEN_BUDGET if cap is None else cap
+    if cap and cap > 0:
+        total = min(total, cap)
+
+    return {
+        "complexity": complexity,
+        "cap": cap,
+        "total": total,
+        "spent": 0,
+        "prompt_spent": 0,
+        "completion_spent": 0,
+        "calls": 0,
+        "allocations": {},
+        "exhausted": False
+    }
+
+def ensure_token_budget(state: Dict[str, Any]) -> Dict[str, Any]:
+    """Create the budget on first use and re-seed it once query analysis is known"""
+    budget = state.get("token_budget") or {}
+    complexity = state.get("query_analysis", {}).get("complexity")
+
+    if not budget:
+        budget = create_token_budget(complexity or "medium")
+        budget["seeded_from_analysis"] = bool(complexity)
+        state["token_budget"] = budget
+    elif complexity and not budget.get("seeded_from_analysis"):
+        reseeded = create_token_budget(complexity, budget.get("cap"))
+        budget["complexity"] = reseeded["complexity"]
+        budget["total"] = reseeded["total"]
+        budget["seeded_from_analysis"] = True
+
+    return budget
+
+def remaining_tokens(budget: Dict[str, Any]) -> int:
+    """Tokens left in the run budget"""
+    return max(0, budget.get("total", 0) - budget.get("spent", 0))
+
+def wrap_up_reserve(state: Dict[str, Any]) -> int:
+    """Tokens still needed by wrap-up stages that have not run yet"""
+    results = state.get("results", {})
+    return sum(tokens for agent, tokens in WRAP_UP_RESERVE.items() if agent not in results)
+
+def allocate_tokens(state: Dict[str, Any], agent: str) -> Dict[str, int]:
+    """Allocate completion and prompt budgets for the next call made by an agent"""
+    budget = ensure_token_budget(state)
+    remaining = remaining_tokens(budget)
+
+    # Regular agents may not dip into the wrap-up reserve
+    available = remaining
+    if agent not in WRAP_UP_AGENTS:
+        available = max(0, remaining - wrap_up_reserve(state))
+
+    # Shrink allocations as the budget depletes
+    share = remaining / budget["total"] if budget.get("total") else 0
+    base = min(AGENT_COMPLETION_TOKENS.get(agent, settings.MAX_TOKENS), settings.MAX_TOKENS)
+    completion = int(base * max(0.25, min(1.0, share)))
+    floor = min(MIN_COMPLETION_TOKENS, base)
+    completion = max(floor, min(completion, available // 3))
+
+    # Whatever the completion does not need is available for the prompt
+    prompt = max(0, available - completion)
+
+    allocation = {"max_tokens": completion, "prompt_tokens": prompt}
+    budget["allocations"][agent] = allocation
+    return allocation
+
+def record_token_usage(state: Dict[str, Any], agent: str, prompt_tokens: int, completion_tokens: int):
+    """Charge a finished call against the run budget"""
+    budget = ensure_token_budget(state)
+    budget["prompt_spent"] += prompt_tokens
+    budget["completion_spent"] += completion_tokens
+    budget["spent"] += prompt_tokens + completion_tokens
+    budget["calls"] += 1
+
+    per_agent = budget.setdefault("per_agent", {})
+    per_agent[agent] = per_agent.get(agent, 0) + prompt_tokens + completion_tokens
+
+    if budget_exhausted(state):
+        budget["exhausted"] = True
+
+def budget_exhausted(state: Dict[str, Any]) -> bool:
+    """True once only the wrap-up reserve (or less) is left"""
+    budget = state.get("token_budget") or {}
+    if not budget:
+        return False
+    return remaining_tokens(budget) <= wrap_up_reserve(state)
+
+def fit_prompt(text: str, prompt_tokens: int) -> str:
+    """Trim a prompt to its token allocation, or to MIN_PROMPT_TOKENS when that is less"""
+    max_chars = max(prompt_tokens, MIN_PROMPT_TOKENS) * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+    return text[:max_chars] + "\n[...context trimmed to fit token budget]"
@@ -0,0 +1,217 @@
+from typing import Dict, Any, List, Optional, Callable
+from contextvars import ContextVar
+from contextlib import contextmanager
+from config.settings import settings
+import urllib.request
+import functools
+import threading
+import random
+import json
+import time
+import os
+
+# OTLP span kinds
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_CLIENT = 3
+# OTLP status codes
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+SERVICE_NAME = "langgraph-multi-agent"
+SCOPE_NAME = "multi_agent.tracing"
+
+class Span:
+    """One timed operation of a trace; kind is "run", "graph", "node", "llm" or "io" """
+
+    def __init__(self, trace: "Trace", name: str, kind: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.trace = trace
+        self.name = name
+        self.kind = kind
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.attributes = {"span.type": kind, **attributes}
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.error: Optional[str] = None
+
+    def set_attribute(self, key: str, value: Any):
+        if value is not None:
+            self.attributes[key] = value
+
+    def set_attributes(self, attributes: Dict[str, Any]):
+        for key, value in attributes.items():
+            self.set_attribute(key, value)
+
+    def to_otlp(self) -> Dict[str, Any]:
+        span = {
+            "traceId": self.trace.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": SPAN_KIND_CLIENT if self.kind == "llm" else SPAN_KIND_INTERNAL,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns or time.time_ns()),
+            "attributes": [{"key": key, "value": _otlp_value(value)} for key, value in self.attributes.items()],
+            "status": {"code": STATUS_ERROR, "message": self.error} if self.error else {"code": STATUS_OK}
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+class _NoSpan:
+    """Stands in for a span when the run is not traced"""
+
+    def set_attribute(self, key: str, value: Any):
+        pass
+
+    def set_attributes(self, attributes: Dict[str, Any]):
+        pass
+
+NO_SPAN = _NoSpan()
+
+class Trace:
+    """Spans of one run, exported together when its root span ends"""
+
+    def __init__(self):
+        self.trace_id = os.urandom(16).hex()
+        self.root: Optional[Span] = None
+        self.spans: List[Span] = []
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    def add(self, span: Span) -> bool:
+        with self._lock:
+            if len(self.spans) >= settings.TRACE_MAX_SPANS:
+                self.dropped += 1
+                return False
+            self.spans.append(span)
+            return True
+
+    def to_otlp(self) -> Dict[str, Any]:
+        """ExportTraceServiceRequest in OTLP/JSON"""
+        with self._lock:
+            spans = [span.to_otlp() for span in self.spans]
+        return {"resourceSpans": [{
+            "resource": {"attributes": [
+                {"key": "service.name", "value": {"stringValue": SERVICE_NAME}},
+                {"key": "process.pid", "value": {"intValue": str(os.getpid())}}
+            ]},
+            "scopeSpans": [{"scope": {"name": SCOPE_NAME}, "spans": spans}]
+        }]}
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    if isinstance(value, (list, tuple)):
+        return {"arrayValue": {"values": [_otlp_value(item) for item in value]}}
+    return {"stringValue": str(value)}
+
+# Span the current thread or task runs in; None when the run is not traced
+_current_span: ContextVar[Optional[Span]] = ContextVar("trace_span", default=None)
+_file_lock = threading.Lock()
+
+def tracing_enabled() -> bool:
+    return settings.TRACE_EXPORTER not in ("", "none")
+
+def annotate_span(**attributes):
+    """Set attributes on the current span, if the run is traced"""
+    span = _current_span.get()
+    if span is not None:
+        span.set_attributes(attributes)
+
+def annotate_run(**attributes):
+    """Set attributes on the root span of the current trace"""
+    span = _current_span.get()
+    if span is not None and span.trace.root is not None:
+        span.trace.root.set_attributes(attributes)
+
+@contextmanager
+def trace_span(name: str, kind: str = "io", **attributes):
+    """Child span of the current span; a no-op outside a traced run"""
+    parent = _current_span.get()
+    if parent is None:
+        yield NO_SPAN
+        return
+    span = Span(parent.trace, name, kind, parent.span_id, attributes)
+    if not parent.trace.add(span):
+        yield NO_SPAN
+        return
+    token = _current_span.set(span)
+    try:
+        yield span
+    except BaseException as e:
+        span.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        span.end_ns = time.time_ns()
+        _current_span.reset(token)
+
+@contextmanager
+def run_span(**attributes):
+    """Root span of a run, sampled at TRACE_SAMPLE_RATE and exported when it ends
+
+    Inside a run that is already traced (run_ai_multi_agent_system around
+    the streamed graph) this is a "graph" child span instead.
+    """
+    if _current_span.get() is not None:
+        with trace_span("graph", "graph", **attributes) as span:
+            yield span
+        return
+    if not tracing_enabled() or random.random() >= settings.TRACE_SAMPLE_RATE:
+        yield NO_SPAN
+        return
+
+    trace = Trace()
+    span = Span(trace, "run", "run", None, attributes)
+    trace.root = span
+    trace.add(span)
+    token = _current_span.set(span)
+    try:
+        yield span
+    except BaseException as e:
+        span.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        span.end_ns = time.time_ns()
+        _current_span.reset(token)
+        if trace.dropped:
+            span.set_attribute("trace.dropped_spans", trace.dropped)
+        export_trace(trace)
+
+def traced(name: str, kind: str = "io") -> Callable:
+    """Decorator running a function in a span of its own"""
+    def decorate(function: Callable) -> Callable:
+        @functools.wraps(function)
+        def run_traced(*args, **kwargs):
+            with trace_span(name, kind):
+                return function(*args, **kwargs)
+        return run_traced
+    return decorate
+
+def export_trace(trace: Trace):
+    """Append the trace to TRACE_FILE, or POST it to the OTLP/HTTP collector"""
+    payload = trace.to_otlp()
+    try:
+        if settings.TRACE_EXPORTER == "file":
+            directory = os.path.dirname(settings.TRACE_FILE)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with _file_lock, open(settings.TRACE_FILE, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(payload) + "\n")
+        elif settings.TRACE_EXPORTER == "otlp":
+            request = urllib.request.Request(
+                settings.TRACE_OTLP_ENDPOINT,
+                data=json.dumps(payload).encode("utf-8"),
+                headers={"Content-Type": "application/json"},
+                method="POST"
+            )
+            with urllib.request.urlopen(request, timeout=settings.TRACE_EXPORT_TIMEOUT_SECONDS):
+                pass
+        else:
+            raise ValueError(f"Unknown trace exporter: {settings.TRACE_EXPORTER}")
+    except Exception as e:
+        # Tracing never fails a run
+        print(f"⚠️ Trace export failed ({e})")
@@ -0,0 +1,124 @@
+from typing import Dict, Any, List, Optional
+from utils.hashing import stable_hash
+
+# Result key each team writes when it completes
+TEAM_RESULT_KEYS = {
+    "team1": "research",
+    "team2": "repair",
+    "team3": "medical",
+    "team4": "financial",
+    "team5": "summary",
+    "team6": "documents"
+}
+
+# LLM calls a visit to each team costs
+TEAM_LLM_CALLS = {
+    "team1": 1,
+    "team2": 1,
+    "team3": 1,
+    "team4": 1,
+    "team5": 1,
+    "team6": 3
+}
+
+# Longest route cycle the ledger looks for
+MAX_CYCLE_LENGTH = 4
+
+def create_visit_ledger() -> Dict[str, Any]:
+    """Empty visit ledger for a new run"""
+    return {
+        "route": [],
+        "input_hashes": {},
+        "blocked": [],
+        "iterations_avoided": 0,
+        "llm_calls_avoided": 0,
+        "handoffs": 0,
+        "supervisor_hops_avoided": 0
+    }
+
+def _without(mapping: Dict[str, Any], *keys: str) -> Dict[str, Any]:
+    return {key: value for key, value in mapping.items() if key not in keys}
+
+def team_inputs(state: Dict[str, Any], team: str) -> Dict[str, Any]:
+    """State fields a team reads, excluding anything the team writes itself"""
+    results = state.get("results", {})
+    llm_responses = state.get("llm_responses", {})
+
+    if team == "team1":
+        return {"query": state.get("query", "")}
+    if team in ["team3", "team4"]:
+        return {
+            "query": state.get("query", ""),
+            "research": state.get("research_data", {}).get("ai_research", "")
+        }
+    if team == "team2":
+        return {
+            "query": state.get("query", ""),
+            "results": _without(results, "repair"),
+            "responses": sorted(_without(llm_responses, "repair").keys())
+        }
+    if team == "team5":
+        return {
+            "query": state.get("query", ""),
+            "results": sorted(_without(results, "summary", "documents").keys()),
+            "responses": _without(llm_responses, "summary", "documents")
+        }
+    if team == "team6":
+        return {
+            "query": state.get("query", ""),
+            "results": _without(results, "documents"),
+            "summary": state.get("summary", ""),
+            "responses": _without(llm_responses, "documents")
+        }
+    return {}
+
+def hash_team_inputs(state: Dict[str, Any], team: str) -> str:
+    """Hash of the inputs a team would see if it ran now"""
+    return stable_hash(team_inputs(state, team))
+
+def _ledger(state: Dict[str, Any]) -> Dict[str, Any]:
+    if not state.get("visit_ledger"):
+        state["visit_ledger"] = create_visit_ledger()
+    return state["visit_ledger"]
+
+def _forms_cycle(route: List[str], team: str) -> bool:
+    """True when routing to team repeats the previous stretch of the route"""
+    sequence = route + [team]
+    for length in range(2, MAX_CYCLE_LENGTH + 1):
+        if len(sequence) < length * 2:
+            break
+        if sequence[-length:] == sequence[-2 * length:-length]:
+            return True
+    return False
+
+def check_route(state: Dict[str, Any], team: str) -> Optional[str]:
+    """Reason a route is redundant, or None when the team should run"""
+    if team not in TEAM_RESULT_KEYS:
+        return None
+
+    ledger = _ledger(state)
+    completed = TEAM_RESULT_KEYS[team] in state.get("results", {})
+
+    if completed and ledger["input_hashes"].get(team) == hash_team_inputs(state, team):
+        return "inputs_unchanged"
+    if _forms_cycle(ledger["route"], team):
+        return "route_cycle"
+    return None
+
+def record_visit(state: Dict[str, Any], team: str):
+    """Record that a team is about to run with its current inputs"""
+    ledger = _ledger(state)
+    ledger["route"].append(team)
+    ledger["input_hashes"][team] = hash_team_inputs(state, team)
+
+def record_blocked(state: Dict[str, Any], team: str, reason: str):
+    """Record a refused route and the work it saved"""
+    ledger = _ledger(state)
+    ledger["blocked"].append({
+        "team": team,
+        "reason": reason,
+        "iteration": state.get("iteration_count", 0)
+    })
+    # One team iteration saved; its LLM calls plus the supervisor call that would follow
+    ledger["iterations_avoided"] += 1
+    ledger["llm_calls_avoided"] += TEAM_LLM_CALLS.get(team, 1) + 1